@@ -0,0 +1,436 @@
+'''
+Performance benchmarks for rforecast. This times conversions between
+Pandas and R, each wrapper, the extraction of results from R objects, the
+batch paths and the rendering of plots to files, on synthetic series over
+a grid of series lengths, frequencies and panel sizes. Results are
+appended to a history file in JSON lines format, by default
+bench_history.jsonl in the current directory, and each result is compared
+with the last one recorded for the same case, so that slowdowns from new
+versions of rpy2, R or R Forecast show up as regressions.
+
+Usage:
+  python bench.py [--profile quick|full] [--only PATTERN] [--repeat N]
+                  [--history FILE] [--threshold RATIO] [--fail]
+
+Each line of the history file is one result, with the case name and
+parameters, the minimum and median wall time in seconds over the repeats,
+a timestamp, the git commit and the versions of Python, rpy2, R and
+R Forecast. Cases that handle many items, like rendering plots, also
+record their rate in items per second.
+'''
+from __future__ import print_function
+# Not needed if the package is installed
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import fnmatch
+import functools
+import io
+import json
+import platform
+import subprocess
+import time
+import numpy
+import rpy2
+from rpy2 import robjects
+from rpy2.robjects.packages import importr
+import shutil
+import tempfile
+from rforecast import converters, wrappers, panel, batch, plots, search, clean
+import generators
+
+fc = importr('forecast')
+
+PROFILES = {
+  'quick' : {'lengths' : [20, 1000],
+             'freqs' : [1, 12],
+             'panel_sizes' : [1, 100]},
+  'full' : {'lengths' : [20, 100, 1000, 10000, 100000],
+            'freqs' : [1, 4, 12, 24, 168],
+            'panel_sizes' : [1, 100, 1000, 10000, 100000]}
+}
+
+# Panel cases use series of this length
+PANEL_LENGTH = 60
+
+# Number of plots rendered in each plot case
+NUM_PLOTS = {'quick' : 20, 'full' : 200}
+
+# The most panels in a plot_grid case
+MAX_GRID_PANELS = 100
+
+# (frequency, length) of the monthly and hourly series used in the model
+# search cases, and the time budget in seconds for budgeted searches
+SEARCH_SERIES = [(12, 120), (24, 336)]
+SEARCH_BUDGET = 10
+
+# The longest series and largest panel used for each kind of case,
+# so that the full profile finishes in a reasonable time.
+MAX_WRAPPER_LENGTH = 10000
+MAX_SLOW_WRAPPER_LENGTH = 1000
+MAX_LOOP_PANEL_SIZE = 1000
+
+
+class Case(object):
+  '''
+  A single benchmark: a name, the parameters of the case, and a setup
+  function that makes the data and returns the function to time. If count
+  is given, the rate in items per second is also reported.
+  '''
+
+  def __init__(self, name, params, setup, count=None):
+    self.name = name
+    self.params = params
+    self.setup = setup
+    self.count = count
+
+  @property
+  def key(self):
+    return self.name + ' ' + json.dumps(self.params, sort_keys=True)
+
+
+def _horizon(freq):
+  return 2 * freq if freq > 1 else 10
+
+
+def _call(func, *args, **kwargs):
+  '''
+  Setup helper for cases whose data is made up front.
+  '''
+  return functools.partial(func, *args, **kwargs)
+
+
+def conversion_cases(profile):
+  for n in profile['lengths']:
+    for freq in profile['freqs']:
+      params = {'n' : n, 'freq' : freq}
+
+      def series_as_ts(n=n, freq=freq):
+        x = generators.series(n, freq)
+        return _call(converters.series_as_ts, x)
+
+      def ts_as_series(n=n, freq=freq):
+        x = converters.series_as_ts(generators.series(n, freq))
+        return _call(converters.ts_as_series, x)
+
+      def sequence_as_series(n=n, freq=freq):
+        x = list(generators.values(n, freq)[0])
+        return _call(converters.sequence_as_series, x, start=2000, freq=freq)
+
+      def time_index(n=n, freq=freq):
+        return _call(converters.time_index, n, start=2000, freq=freq)
+
+      yield Case('converters.series_as_ts', params, series_as_ts)
+      yield Case('converters.ts_as_series', params, ts_as_series)
+      yield Case('converters.sequence_as_series', params, sequence_as_series)
+      yield Case('converters.time_index', params, time_index)
+
+
+def extraction_cases(profile):
+  for n in profile['lengths']:
+    for freq in profile['freqs']:
+      params = {'n' : n, 'freq' : freq}
+
+      def prediction_intervals(n=n, freq=freq):
+        x = converters.series_as_ts(generators.series(n, freq))
+        out = fc.naive(x, h=_horizon(freq))
+        return _call(converters.prediction_intervals, out)
+
+      def decomposition(n=n, freq=freq):
+        x = converters.series_as_ts(generators.series(n, freq))
+        return _call(converters.decomposition, wrappers.stl(x, 'periodic'))
+
+      yield Case('converters.prediction_intervals', params,
+                 prediction_intervals)
+      if freq > 1 and n >= 2 * freq:
+        yield Case('converters.decomposition', params, decomposition)
+
+
+def _wrapper_specs():
+  '''
+  The wrappers to time, as (name, function, needs_seasonal, max_freq,
+  max_length). R's ets and hw do not allow frequencies above 24.
+  '''
+  return [('meanf', wrappers.meanf, False, None, MAX_WRAPPER_LENGTH),
+          ('naive', wrappers.naive, False, None, MAX_WRAPPER_LENGTH),
+          ('rwf', wrappers.rwf, False, None, MAX_WRAPPER_LENGTH),
+          ('snaive', wrappers.snaive, True, None, MAX_WRAPPER_LENGTH),
+          ('thetaf', wrappers.thetaf, False, None, MAX_WRAPPER_LENGTH),
+          ('ses', wrappers.ses, False, None, MAX_WRAPPER_LENGTH),
+          ('holt', wrappers.holt, False, None, MAX_WRAPPER_LENGTH),
+          ('hw', wrappers.hw, True, 24, MAX_WRAPPER_LENGTH),
+          ('ets', wrappers.ets, False, 24, MAX_SLOW_WRAPPER_LENGTH),
+          ('auto_arima', wrappers.auto_arima, False, None,
+           MAX_SLOW_WRAPPER_LENGTH),
+          ('stlf', wrappers.stlf, True, None, MAX_WRAPPER_LENGTH),
+          ('forecast', wrappers.forecast, False, None,
+           MAX_SLOW_WRAPPER_LENGTH),
+          ('tsclean', wrappers.tsclean, False, None, MAX_WRAPPER_LENGTH),
+          ('na_interp', wrappers.na_interp, False, None, MAX_WRAPPER_LENGTH),
+          ('decompose', wrappers.decompose, True, None, MAX_WRAPPER_LENGTH),
+          ('acf', wrappers.acf, False, None, MAX_WRAPPER_LENGTH)]
+
+
+def wrapper_cases(profile):
+  for (name, func, needs_seasonal, max_freq, max_length) in _wrapper_specs():
+    for n in profile['lengths']:
+      for freq in profile['freqs']:
+        if n > max_length or (max_freq is not None and freq > max_freq):
+          continue
+        if needs_seasonal and (freq == 1 or n < 2 * freq + 1):
+          continue
+        for input_type in ['pandas', 'r']:
+          params = {'n' : n, 'freq' : freq, 'input' : input_type}
+
+          def setup(func=func, n=n, freq=freq, input_type=input_type):
+            x = generators.series(n, freq)
+            if input_type == 'r':
+              x = converters.series_as_ts(x)
+            return _call(func, x)
+
+          yield Case('wrappers.' + name, params, setup)
+
+
+def batch_cases(profile):
+  for nseries in profile['panel_sizes']:
+    for freq in profile['freqs']:
+      n = max(PANEL_LENGTH, 2 * freq + 1)
+      params = {'nseries' : nseries, 'n' : n, 'freq' : freq}
+
+      def panel_thetaf(nseries=nseries, n=n, freq=freq):
+        return _call(panel.thetaf, generators.panel(nseries, n, freq))
+
+      def loop_thetaf(nseries=nseries, n=n, freq=freq):
+        df = generators.panel(nseries, n, freq)
+        return lambda: [wrappers.thetaf(df[k]) for k in df.columns]
+
+      def panel_decompose(nseries=nseries, n=n, freq=freq):
+        return _call(panel.decompose, generators.panel(nseries, n, freq))
+
+      def panel_as_ts_list(nseries=nseries, n=n, freq=freq):
+        return _call(converters.panel_as_ts_list,
+                     generators.panel(nseries, n, freq))
+
+      def long_as_ts_list(nseries=nseries, n=n, freq=freq):
+        return _call(converters.panel_as_ts_list,
+                     generators.long_frame(nseries, n, freq), long=True)
+
+      def forecast_list_as_frame(nseries=nseries, n=n, freq=freq):
+        ts_list = converters.panel_as_ts_list(
+          generators.panel(nseries, n, freq))
+        fcs = robjects.r('lapply')(ts_list, fc.naive, h=_horizon(freq))
+        return _call(converters.forecast_list_as_frame, fcs)
+
+      def forecast_batch(nseries=nseries, n=n, freq=freq):
+        out = panel.thetaf(generators.panel(nseries, n, freq),
+                           h=_horizon(freq))
+        frames = [(k, out[k]) for k in out.columns.levels[0]]
+        return _call(batch.ForecastBatch.from_forecasts, frames)
+
+      def batch_accuracy(nseries=nseries, n=n, freq=freq):
+        out = panel.thetaf(generators.panel(nseries, n, freq),
+                           h=_horizon(freq))
+        fb = batch.ForecastBatch.from_frame(out)
+        test = generators.values(_horizon(freq), freq, nseries, seed=1)
+        return _call(fb.accuracy, test)
+
+      def panel_tsclean(nseries=nseries, n=n, freq=freq):
+        return _call(clean.tsclean, generators.panel(nseries, n, freq))
+
+      def loop_tsclean(nseries=nseries, n=n, freq=freq):
+        df = generators.panel(nseries, n, freq)
+        return lambda: [wrappers.tsclean(df[k]) for k in df.columns]
+
+      yield Case('panel.thetaf', params, panel_thetaf)
+      yield Case('clean.tsclean', params, panel_tsclean)
+      if nseries <= MAX_LOOP_PANEL_SIZE:
+        yield Case('wrappers.thetaf loop', params, loop_thetaf)
+        yield Case('wrappers.tsclean loop', params, loop_tsclean)
+        yield Case('ForecastBatch.from_forecasts', params, forecast_batch)
+      if freq > 1:
+        yield Case('panel.decompose', params, panel_decompose)
+      yield Case('converters.panel_as_ts_list wide', params, panel_as_ts_list)
+      yield Case('converters.panel_as_ts_list long', params, long_as_ts_list)
+      yield Case('converters.forecast_list_as_frame', params,
+                 forecast_list_as_frame)
+      yield Case('ForecastBatch.accuracy', params, batch_accuracy)
+
+
+def plot_cases(profile):
+  nplots = NUM_PLOTS[profile['name']]
+  for freq in profile['freqs']:
+    n = max(PANEL_LENGTH, 2 * freq + 1)
+    for fmt in ['png', 'svg']:
+      for processes in [1, None]:
+        params = {'nplots' : nplots, 'n' : n, 'freq' : freq, 'format' : fmt,
+                  'processes' : processes}
+
+        def render_many(n=n, freq=freq, fmt=fmt, processes=processes):
+          x = generators.series(n, freq)
+          fcast = converters.prediction_intervals(fc.naive(
+            converters.series_as_ts(x), h=_horizon(freq)))
+          items = [(k, (fcast, x)) for k in range(nplots)]
+          directory = tempfile.mkdtemp()
+
+          def run():
+            plots.render_many(items, directory, format=fmt,
+                              processes=processes)
+            shutil.rmtree(directory)
+          return run
+
+        yield Case('plots.render_many', params, render_many, count=nplots)
+
+    npanels = min(nplots, MAX_GRID_PANELS)
+    params = {'npanels' : npanels, 'n' : n, 'freq' : freq}
+
+    def save_grid(n=n, freq=freq, npanels=npanels):
+      df = generators.panel(npanels, n, freq)
+      ts_list = converters.panel_as_ts_list(df)
+      fcs = robjects.r('lapply')(ts_list, fc.naive, h=_horizon(freq))
+      items = [(k, fcs[i]) for (i, k) in enumerate(df.columns)]
+      return lambda: plots.save_grid(items, io.BytesIO(), format='png')
+
+    yield Case('plots.save_grid', params, save_grid, count=npanels)
+
+
+def search_cases(profile):
+  for (freq, n) in SEARCH_SERIES:
+    params = {'n' : n, 'freq' : freq}
+    x = lambda n=n, freq=freq: converters.series_as_ts(
+      generators.series(n, freq))
+
+    def auto_arima(x=x):
+      return _call(wrappers.auto_arima, x())
+
+    def auto_arima_exhaustive(x=x):
+      return _call(wrappers.auto_arima, x(), stepwise=False)
+
+    def search_arima(x=x):
+      return _call(search.arima, x())
+
+    def search_arima_budget(x=x):
+      return _call(search.arima, x(), time_budget=SEARCH_BUDGET)
+
+    def warm_arima(n=n, freq=freq):
+      x = generators.series(n, freq)
+      _, previous = search.warm_arima(x[:-freq])
+      return _call(search.warm_arima, x, previous=previous)
+
+    yield Case('wrappers.auto_arima stepwise', params, auto_arima)
+    yield Case('search.warm_arima', params, warm_arima)
+    yield Case('wrappers.auto_arima exhaustive', params, auto_arima_exhaustive)
+    yield Case('search.arima', params, search_arima)
+    yield Case('search.arima budget', params, search_arima_budget)
+    if freq <= 24:
+      yield Case('wrappers.ets', params, lambda x=x: _call(wrappers.ets, x()))
+      yield Case('search.ets', params, lambda x=x: _call(search.ets, x()))
+
+
+SUITES = [conversion_cases, extraction_cases, wrapper_cases, batch_cases,
+          plot_cases, search_cases]
+
+
+def all_cases(profile):
+  for suite in SUITES:
+    for case in suite(profile):
+      yield case
+
+
+def time_case(case, repeat):
+  '''
+  Runs a case repeat times after one warm-up call.
+
+  Returns:
+    a list of wall times in seconds
+  '''
+  func = case.setup()
+  func()
+  times = []
+  for _ in range(repeat):
+    start = time.time()
+    func()
+    times.append(time.time() - start)
+  return times
+
+
+def environment():
+  '''
+  The versions and commit that a result was recorded with.
+  '''
+  r_version = robjects.r('R.version.string')[0]
+  fc_version = robjects.r('as.character(packageVersion("forecast"))')[0]
+  try:
+    commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+      cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    commit = None
+  return {'python' : platform.python_version(), 'rpy2' : rpy2.__version__,
+          'R' : r_version, 'forecast' : fc_version, 'commit' : commit}
+
+
+def load_history(path):
+  '''
+  Reads the history file, and returns the last result for each case key.
+  '''
+  last = {}
+  if not os.path.exists(path):
+    return last
+  with open(path) as f:
+    for line in f:
+      if line.strip():
+        rec = json.loads(line)
+        last[rec['case'] + ' ' + json.dumps(rec['params'],
+                                            sort_keys=True)] = rec
+  return last
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Benchmarks for rforecast')
+  parser.add_argument('--profile', default='quick', choices=sorted(PROFILES))
+  parser.add_argument('--only', default='*',
+                      help='glob pattern for the case names to run')
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--history', default='bench_history.jsonl',
+                      help='the history file to read and append to')
+  parser.add_argument('--threshold', type=float, default=1.25,
+                      help='a median time this many times the last recorded '
+                           'time is reported as a regression')
+  parser.add_argument('--fail', action='store_true',
+                      help='exit with status 1 if there are regressions')
+  args = parser.parse_args(argv)
+  profile = dict(PROFILES[args.profile], name=args.profile)
+  previous = load_history(args.history)
+  env = environment()
+  regressions = []
+  with open(args.history, 'a') as out:
+    for case in all_cases(profile):
+      if not fnmatch.fnmatch(case.name, args.only):
+        continue
+      times = time_case(case, args.repeat)
+      rec = {'case' : case.name, 'params' : case.params,
+             'min' : min(times), 'median' : float(numpy.median(times)),
+             'repeat' : args.repeat, 'profile' : args.profile,
+             'timestamp' : time.strftime('%Y-%m-%dT%H:%M:%S'), 'env' : env}
+      if case.count is not None:
+        rec['per_second'] = case.count / rec['median']
+      out.write(json.dumps(rec, sort_keys=True) + '\n')
+      out.flush()
+      flag = ''
+      last = previous.get(case.key)
+      if last is not None and rec['median'] > args.threshold * last['median']:
+        regressions.append((case.key, last['median'], rec['median']))
+        flag = '  REGRESSION (was %.6f)' % last['median']
+      if case.count is not None:
+        flag += '  (%.1f/s)' % rec['per_second']
+      print('%-45s %-50s %.6f%s' % (case.name, json.dumps(case.params,
+            sort_keys=True), rec['median'], flag))
+  if regressions:
+    print('%d regression(s) over %.2fx:' % (len(regressions), args.threshold))
+    for (key, before, after) in regressions:
+      print('  %s: %.6f -> %.6f' % (key, before, after))
+  return 1 if (regressions and args.fail) else 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,104 @@
+'''
+Generators of synthetic time series for the benchmarks. All series are 
+positive, with a level, a linear trend, an optional seasonal cycle and 
+noise, so they are valid input for every wrapper, including ones that use 
+multiplicative models or a BoxCox transformation.
+'''
+# Not needed if the package is installed
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy
+import pandas
+from rforecast import converters
+
+
+def values(n, freq=1, nseries=1, seed=0):
+  '''
+  Makes the values of synthetic time series.
+  
+  Args:
+    n: length of each series
+    freq: default 1; number of points in each time period
+    nseries: default 1; the number of series
+    seed: default 0; seed for the random number generator
+    
+  Returns:
+    numpy array (series x time)
+  '''
+  rng = numpy.random.RandomState(seed)
+  t = numpy.arange(n)
+  level = rng.uniform(50, 150, size=(nseries, 1))
+  trend = rng.uniform(-0.01, 0.03, size=(nseries, 1)) * t
+  out = level + trend
+  if freq > 1:
+    amplitude = rng.uniform(0.05, 0.2, size=(nseries, 1)) * level
+    out += amplitude * numpy.sin(2 * numpy.pi * t / freq)
+  out += rng.normal(scale=2.0, size=(nseries, n))
+  return numpy.maximum(out, 1.0)
+
+
+def series(n, freq=1, seed=0):
+  '''
+  Makes a synthetic Pandas Series with the index used in converters.
+  
+  Args:
+    n: length of the series
+    freq: default 1; number of points in each time period
+    seed: default 0; seed for the random number generator
+    
+  Returns:
+    a Pandas Series
+  '''
+  start = (2000, 1) if freq > 1 else 2000
+  idx = converters.time_index(n, start=start, freq=freq)
+  return pandas.Series(values(n, freq, 1, seed)[0], index=idx)
+
+
+def panel(nseries, n, freq=1, seed=0):
+  '''
+  Makes a panel of synthetic series with one column per series, 
+  as used in the panel module.
+  
+  Args:
+    nseries: the number of series
+    n: length of each series
+    freq: default 1; number of points in each time period
+    seed: default 0; seed for the random number generator
+    
+  Returns:
+    a Pandas DataFrame
+  '''
+  start = (2000, 1) if freq > 1 else 2000
+  idx = converters.time_index(n, start=start, freq=freq)
+  data = values(n, freq, nseries, seed)
+  cols = ['s%d' % k for k in range(nseries)]
+  return pandas.DataFrame(data.T, index=idx, columns=cols)
+
+
+def long_frame(nseries, n, freq=1, seed=0):
+  '''
+  Makes a panel of synthetic series in long format, with columns 
+  id, period, step, data (or id, time, data if freq is 1), like the 
+  files read by ts_io.iter_series.
+  
+  Args:
+    nseries: the number of series
+    n: length of each series
+    freq: default 1; number of points in each time period
+    seed: default 0; seed for the random number generator
+    
+  Returns:
+    a Pandas DataFrame
+  '''
+  wide = panel(nseries, n, freq, seed)
+  ids = numpy.repeat(numpy.array(wide.columns, dtype=object), n)
+  cols = {'id' : ids, 'data' : wide.values.T.ravel()}
+  if freq > 1:
+    cols['period'] = numpy.tile(wide.index.get_level_values(0), nseries)
+    cols['step'] = numpy.tile(wide.index.get_level_values(1), nseries)
+    order = ['id', 'period', 'step', 'data']
+  else:
+    cols['time'] = numpy.tile(numpy.asarray(wide.index), nseries)
+    order = ['id', 'time', 'data']
+  return pandas.DataFrame(cols)[order]
@@ -0,0 +1,133 @@
+'''
+Soak benchmark for memory use in long-running processes. This calls one
+wrapper many times, by default a million times, with a garbage collection
+policy from rforecast.memory installed, and samples the R heap and the
+process resident set size as it goes. Memory is stable if the heap and
+resident size late in the run are no more than the tolerance above their
+size early in the run, after warm-up.
+
+Usage:
+  python soak.py [--calls N] [--sample N] [--wrapper NAME] [--every N]
+                 [--max-bytes N] [--no-policy] [--tolerance RATIO]
+                 [--output FILE] [--fail]
+
+With --output, each sample is written to the file as a line of JSON, with
+the number of calls made, the elapsed time, the R heap usage and the
+resident set size in bytes.
+'''
+from __future__ import print_function
+# Not needed if the package is installed
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import resource
+import time
+import numpy
+from rforecast import wrappers, memory
+import generators
+
+# Number of distinct input series cycled through in the run
+NUM_INPUTS = 10
+
+
+def rss_bytes():
+  '''
+  The resident set size of this process in bytes. This is the current size
+  on Linux, and the peak size elsewhere.
+  '''
+  try:
+    with open('/proc/self/statm') as f:
+      pages = int(f.read().split()[1])
+    return pages * resource.getpagesize()
+  except (IOError, OSError):
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on Mac OS, and in kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def sample(calls, start):
+  heap = memory.heap_usage()
+  return {'calls' : calls, 'seconds' : time.time() - start,
+          'r_heap_bytes' : heap['bytes'], 'ncells' : heap['ncells'],
+          'vcells' : heap['vcells'], 'rss_bytes' : rss_bytes()}
+
+
+def growth(samples, field):
+  '''
+  The ratio of the median of a field over the last quarter of the samples
+  to its median over the first quarter, skipping the first sample as
+  warm-up.
+  '''
+  values = [s[field] for s in samples[1:]]
+  k = max(len(values) // 4, 1)
+  return float(numpy.median(values[-k:])) / numpy.median(values[:k])
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Memory soak test for rforecast')
+  parser.add_argument('--calls', type=int, default=1000000)
+  parser.add_argument('--sample', type=int, default=10000,
+                      help='calls between samples of memory use')
+  parser.add_argument('--wrapper', default='naive',
+                      help='name of the function in wrappers to call')
+  parser.add_argument('--length', type=int, default=48)
+  parser.add_argument('--freq', type=int, default=4)
+  parser.add_argument('--every', type=int, default=1000,
+                      help='collect after this many calls')
+  parser.add_argument('--max-bytes', type=int, default=None,
+                      help='also collect when the R heap exceeds this size')
+  parser.add_argument('--no-policy', action='store_true',
+                      help='run without a garbage collection policy')
+  parser.add_argument('--tolerance', type=float, default=1.1,
+                      help='largest growth ratio counted as stable')
+  parser.add_argument('--output', default=None)
+  parser.add_argument('--fail', action='store_true',
+                      help='exit with status 1 if memory is not stable')
+  args = parser.parse_args(argv)
+  func = getattr(wrappers, args.wrapper)
+  inputs = [generators.series(args.length, args.freq, seed=k)
+            for k in range(NUM_INPUTS)]
+  policy = None
+  if not args.no_policy:
+    policy = memory.GCPolicy(every=args.every, max_bytes=args.max_bytes)
+  memory.set_policy(policy)
+  memory.collect()
+  out = open(args.output, 'w') if args.output else None
+  samples = []
+  start = time.time()
+  try:
+    for k in range(1, args.calls + 1):
+      func(inputs[k % NUM_INPUTS])
+      if k % args.sample == 0 or k == args.calls:
+        rec = sample(k, start)
+        samples.append(rec)
+        if out is not None:
+          out.write(json.dumps(rec, sort_keys=True) + '\n')
+          out.flush()
+        print('%10d calls %8.1fs  R heap %8.1f MB  RSS %8.1f MB' % (
+              k, rec['seconds'], rec['r_heap_bytes'] / 2.0 ** 20,
+              rec['rss_bytes'] / 2.0 ** 20))
+  finally:
+    memory.set_policy(None)
+    if out is not None:
+      out.close()
+  if len(samples) < 3:
+    print('Too few samples to judge stability; lower --sample')
+    return 0
+  elapsed = samples[-1]['seconds']
+  print('%d calls in %.1fs (%.0f calls/s), %d collections by the policy' % (
+        args.calls, elapsed, args.calls / elapsed,
+        policy.collections if policy is not None else 0))
+  stable = True
+  for field in ['r_heap_bytes', 'rss_bytes']:
+    ratio = growth(samples, field)
+    ok = ratio <= args.tolerance
+    stable = stable and ok
+    print('%-14s growth %.3fx  %s' % (field, ratio, 'ok' if ok else 'GROWING'))
+  return 1 if (args.fail and not stable) else 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,327 @@
+'''
+The batch module holds forecasts for many series in compact, array-backed
+containers, instead of one Pandas Data Frame per series.
+'''
+import numpy
+import pandas
+import converters
+import validate
+
+
+class ForecastBatch(object):
+  '''
+  A batch of forecasts with the same horizon and prediction interval levels.
+  The forecasts are stored in a single float array with shape
+  (series x horizon x columns), where the columns are laid out as in
+  converters.prediction_intervals: point_fc, then lower and upper bounds
+  for each level. The index of each series is kept as its start and
+  frequency, and a Data Frame for one series is only made when asked for.
+
+  Attributes:
+    ids: list of the series ids
+    level: numpy array of the prediction interval levels
+    data: numpy array (series x horizon x columns) of forecasts
+    start_period: numpy array of the period of the first forecast step
+    start_step: numpy array of the step (season) of the first forecast step
+    frequency: numpy array of the frequency of each series
+  '''
+
+  def __init__(self, ids, level, data, start_period, start_step, frequency):
+    data = numpy.asarray(data, dtype=float)
+    if data.ndim != 3 or data.shape[2] != 1 + 2 * len(level):
+      raise ValueError('data must be series x horizon x (1 + 2 * levels)')
+    if len(ids) != data.shape[0]:
+      raise ValueError('There must be one id for each series')
+    self.ids = list(ids)
+    self.level = numpy.asarray(level)
+    self.data = data
+    self.start_period = numpy.asarray(start_period, dtype=int)
+    self.start_step = numpy.asarray(start_step, dtype=int)
+    self.frequency = numpy.asarray(frequency, dtype=int)
+    self._positions = None
+
+  @classmethod
+  def from_forecasts(cls, forecasts):
+    '''
+    Makes a ForecastBatch from the forecasts for many series.
+
+    Args:
+      forecasts: a dict, or an iterable of (id, forecast) pairs, where
+        each forecast is an R forecast object or a Pandas Data Frame from
+        converters.prediction_intervals. All forecasts must have the same
+        horizon and levels.
+
+    Returns:
+      a ForecastBatch
+    '''
+    if isinstance(forecasts, dict):
+      forecasts = forecasts.items()
+    ids, blocks, starts = [], [], []
+    columns = None
+    for (series_id, fc) in forecasts:
+      if validate.is_R_forecast(fc):
+        fc = converters.prediction_intervals(fc)
+      elif not validate.is_Pandas_forecast(fc):
+        raise TypeError(
+          'Forecast must be R forecast object or Pandas DataFrame')
+      if columns is None:
+        columns = list(fc.columns)
+      elif list(fc.columns) != columns:
+        raise ValueError('All forecasts must have the same levels')
+      ids.append(series_id)
+      blocks.append(fc.values)
+      starts.append(_start_fields(fc.index))
+    if columns is None:
+      raise ValueError('No forecasts provided')
+    level = [int(col[5:]) for col in columns[1::2]]
+    period, step, freq = zip(*starts)
+    return cls(ids, level, numpy.array(blocks), period, step, freq)
+
+  @classmethod
+  def from_frame(cls, df):
+    '''
+    Makes a ForecastBatch from a Data Frame with two levels of columns,
+    the first for series and the second with the columns of
+    converters.prediction_intervals, as returned by panel.thetaf. The
+    columns are found by name, so they may be in any order.
+
+    Args:
+      df: a Pandas Data Frame of panel forecasts
+
+    Returns:
+      a ForecastBatch
+    '''
+    ids = list(df.columns.get_level_values(0).unique())
+    level = sorted(set(int(col[5:]) for col in df.columns.get_level_values(1)
+                       if col.startswith('lower')))
+    names = ['point_fc']
+    for lev in level:
+      names.extend(['lower%d' % lev, 'upper%d' % lev])
+    data = df[pandas.MultiIndex.from_product([ids, names])].values
+    data = data.reshape(df.shape[0], len(ids), len(names)).transpose(1, 0, 2)
+    period, step, freq = _start_fields(df.index)
+    n = len(ids)
+    return cls(ids, level, data, [period] * n, [step] * n, [freq] * n)
+
+  def __len__(self):
+    return len(self.ids)
+
+  def __getitem__(self, series_id):
+    return self.frame(series_id)
+
+  def __repr__(self):
+    return '<ForecastBatch: %d series, horizon %d, levels %s>' % (
+      len(self), self.horizon, [int(lev) for lev in self.level])
+
+  @property
+  def horizon(self):
+    return self.data.shape[1]
+
+  @property
+  def columns(self):
+    cols = ['point_fc']
+    for lev in self.level:
+      cols.extend(['lower%d' % lev, 'upper%d' % lev])
+    return cols
+
+  @property
+  def mean(self):
+    '''numpy array (series x horizon) of mean forecasts'''
+    return self.data[:, :, 0]
+
+  @property
+  def lower(self):
+    '''numpy array (series x horizon x level) of lower bounds'''
+    return self.data[:, :, 1::2]
+
+  @property
+  def upper(self):
+    '''numpy array (series x horizon x level) of upper bounds'''
+    return self.data[:, :, 2::2]
+
+  def _position(self, series_id):
+    if self._positions is None:
+      self._positions = dict((k, i) for (i, k) in enumerate(self.ids))
+    if series_id not in self._positions:
+      raise KeyError('Series %s is not in the batch' % series_id)
+    return self._positions[series_id]
+
+  def frame(self, series_id):
+    '''
+    Makes the Data Frame for one series, laid out like the output of
+    converters.prediction_intervals.
+
+    Args:
+      series_id: the id of the series
+
+    Returns:
+      a Pandas Data Frame with the mean forecast and prediction intervals
+    '''
+    i = self._position(series_id)
+    freq = self.frequency[i]
+    if freq > 1:
+      start = (self.start_period[i], self.start_step[i])
+    else:
+      start = self.start_period[i]
+    idx = converters.time_index(self.horizon, start=start, freq=freq)
+    return pandas.DataFrame(self.data[i], index=idx, columns=self.columns)
+
+  def items(self):
+    '''
+    Iterates over the series in the batch.
+
+    Returns:
+      a generator of 2-tuples of the series id and its forecast Data Frame
+    '''
+    for series_id in self.ids:
+      yield series_id, self.frame(series_id)
+
+  def select(self, ids):
+    '''
+    Makes a new ForecastBatch with a subset of the series.
+
+    Args:
+      ids: a list of series ids, or a boolean numpy array with one
+        element per series
+
+    Returns:
+      a ForecastBatch
+    '''
+    if isinstance(ids, numpy.ndarray) and ids.dtype == bool:
+      rows = numpy.flatnonzero(ids)
+    else:
+      rows = numpy.array([self._position(k) for k in ids], dtype=int)
+    return ForecastBatch([self.ids[r] for r in rows], self.level,
+                         self.data[rows], self.start_period[rows],
+                         self.start_step[rows], self.frequency[rows])
+
+  def head(self, h):
+    '''
+    Makes a new ForecastBatch with only the first h steps of the horizon.
+
+    Args:
+      h: the new forecast horizon
+
+    Returns:
+      a ForecastBatch
+    '''
+    return ForecastBatch(self.ids, self.level, self.data[:, :h],
+                         self.start_period, self.start_step, self.frequency)
+
+  def point_fc(self):
+    '''
+    Returns:
+      a Pandas Data Frame of mean forecasts, with one row per series and
+      one column per horizon step
+    '''
+    return pandas.DataFrame(self.mean, index=self.ids,
+                            columns=numpy.arange(1, self.horizon + 1))
+
+  def total(self, over='horizon'):
+    '''
+    Sums the mean forecasts over the horizon or over the series.
+
+    Args:
+      over: Default 'horizon', for the total forecast of each series
+        over the horizon. The other option is 'series', for the total
+        of all series at each horizon step.
+
+    Returns:
+      a Pandas Series of totals
+    '''
+    if over == 'horizon':
+      return pandas.Series(self.mean.sum(axis=1), index=self.ids)
+    elif over == 'series':
+      return pandas.Series(self.mean.sum(axis=0),
+                           index=numpy.arange(1, self.horizon + 1))
+    else:
+      raise ValueError("over must be 'horizon' or 'series'")
+
+  def to_frame(self):
+    '''
+    Returns:
+      a Pandas Data Frame with two levels of columns, for series and then
+      the columns of converters.prediction_intervals, like the output of
+      panel.thetaf. The index is the horizon step.
+    '''
+    nseries, h, ncols = self.data.shape
+    values = self.data.transpose(1, 0, 2).reshape(h, nseries * ncols)
+    cols = pandas.MultiIndex.from_product([self.ids, self.columns])
+    return pandas.DataFrame(values, index=numpy.arange(1, h + 1),
+                            columns=cols)
+
+  def accuracy(self, test, train=None):
+    '''
+    Computes forecast accuracy measures for every series at once. The
+    measures are those of wrappers.accuracy on test data: ME, RMSE, MAE,
+    MPE and MAPE, plus MASE if the training data is provided. Test data
+    shorter than the horizon are scored over the steps provided.
+
+    Args:
+      test: the data for the forecast period, as a dict of Pandas Series
+        or sequences keyed by series id, or an array (series x horizon)
+        in the order of ids.
+      train: optional training data, as a dict of Pandas Series or
+        sequences keyed by series id. This is used to scale the MASE by
+        the in-sample error of a (seasonal) naive forecast.
+
+    Returns:
+      a Pandas Data Frame of accuracy measures, with one row per series
+    '''
+    actual = self._align(test)
+    err = actual - self.mean
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+      pct = 100 * err / actual
+      out = pandas.DataFrame({'ME' : numpy.nanmean(err, axis=1),
+                              'RMSE' : numpy.sqrt(numpy.nanmean(err ** 2,
+                                                                axis=1)),
+                              'MAE' : numpy.nanmean(numpy.abs(err), axis=1),
+                              'MPE' : numpy.nanmean(pct, axis=1),
+                              'MAPE' : numpy.nanmean(numpy.abs(pct), axis=1)},
+                             index=self.ids)
+      cols = ['ME', 'RMSE', 'MAE', 'MPE', 'MAPE']
+      if train is not None:
+        scale = numpy.array([_naive_scale(train[k], self.frequency[i])
+                             for (i, k) in enumerate(self.ids)])
+        out['MASE'] = out['MAE'] / scale
+        cols.append('MASE')
+    return out[cols]
+
+  def _align(self, test):
+    '''
+    Utility method that puts test data into an array (series x horizon),
+    padded with NaN.
+    '''
+    if isinstance(test, dict):
+      actual = numpy.empty(self.mean.shape)
+      actual.fill(numpy.nan)
+      for (i, series_id) in enumerate(self.ids):
+        values = numpy.asarray(test[series_id], dtype=float)[:self.horizon]
+        actual[i, :len(values)] = values
+      return actual
+    actual = numpy.asarray(test, dtype=float)
+    if actual.shape != self.mean.shape:
+      raise ValueError('test data must be series x horizon')
+    return actual
+
+
+def _start_fields(idx):
+  '''
+  Utility function for the start of a forecast index, as
+  (period, step, frequency), with step 1 for a non-seasonal index.
+  '''
+  start, freq = converters.index_start(idx)
+  if freq > 1:
+    return int(start[0]), int(start[1]), freq
+  else:
+    return int(start), 1, 1
+
+
+def _naive_scale(x, freq):
+  '''
+  Utility function for the MASE scale: the mean absolute in-sample error
+  of a seasonal naive forecast, or a naive forecast for freq 1.
+  '''
+  x = numpy.asarray(x, dtype=float)
+  lag = freq if freq > 1 and len(x) > freq else 1
+  return numpy.nanmean(numpy.abs(x[lag:] - x[:-lag]))
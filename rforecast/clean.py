@@ -0,0 +1,138 @@
+'''
+The clean module replaces outliers and fills missing values in a whole
+panel of series at once. wrappers.tsclean and wrappers.na_interp convert
+one series to R and back per call, which is a large share of the cost for
+short series. Here the panel is sent to R in one transfer, cleaned with a
+single lapply, and returned as one vector. With processes, the series are
+split across worker processes, each with its own R session.
+
+Each function returns the cleaned panel and the positions of the points
+that changed, for only the series that changed, so that series the
+cleaning left alone can be skipped later without scanning the panel:
+
+  out, changes = clean.tsclean(df)
+  dirty = list(changes)
+'''
+import multiprocessing
+import numpy
+import pandas
+from rpy2 import robjects
+import converters
+import panel
+
+NULL = robjects.NULL
+
+_clean_list = robjects.r('''
+  function(xs, outliers, replace_missing, lambda) {
+    f <- if (outliers) {
+      function(x) forecast::tsclean(x, replace.missing=replace_missing,
+                                    lambda=lambda)
+    } else {
+      function(x) forecast::na.interp(x, lambda=lambda)
+    }
+    unlist(lapply(xs, function(x) as.numeric(f(x))), use.names=FALSE)
+  }
+''')
+
+
+def _clean_values(df, outliers, replace_missing, lam):
+  '''
+  Utility function that cleans every series in a wide panel in one R call.
+
+  Returns:
+    numpy array (series x time) of cleaned values
+  '''
+  xs = converters.panel_as_ts_list(df)
+  out = _clean_list(xs, outliers, replace_missing,
+                    NULL if lam is None else lam)
+  return numpy.array(out, dtype=float).reshape(df.shape[1], df.shape[0])
+
+
+def _clean_task(task):
+  return _clean_values(*task)
+
+
+def _clean(x, outliers, replace_missing, lam, columns, processes):
+  '''
+  Utility function that implements tsclean and na_interp.
+  '''
+  df = panel.as_panel(x)
+  y = df.values.T.astype(float)
+  out = y.copy()
+  if columns is None:
+    rows = numpy.arange(df.shape[1])
+  else:
+    rows = numpy.flatnonzero(df.columns.isin(list(columns)))
+  if len(rows) > 0:
+    sub = df.iloc[:, rows]
+    if processes is None or processes <= 1 or len(rows) < 2:
+      out[rows] = _clean_values(sub, outliers, replace_missing, lam)
+    else:
+      chunks = numpy.array_split(numpy.arange(len(rows)),
+                                 min(processes, len(rows)))
+      tasks = [(sub.iloc[:, c], outliers, replace_missing, lam)
+               for c in chunks]
+      pool = multiprocessing.Pool(processes)
+      try:
+        parts = pool.map(_clean_task, tasks)
+      finally:
+        pool.terminate()
+        pool.join()
+      out[rows] = numpy.concatenate(parts, axis=0)
+  new, old = out[rows], y[rows]
+  diff = (new != old) & ~(numpy.isnan(new) & numpy.isnan(old))
+  changes = dict((df.columns[rows[k]], numpy.flatnonzero(diff[k]))
+                 for k in numpy.flatnonzero(diff.any(axis=1)))
+  cleaned = pandas.DataFrame(out.T, index=df.index, columns=df.columns)
+  return cleaned, changes
+
+
+def tsclean(x, replace_missing=True, lam=None, columns=None, processes=None):
+  '''
+  Identifies and replaces outliers in every series in a panel, as
+  wrappers.tsclean does for one series: with loess for non-seasonal
+  series and an STL decomposition for seasonal series. Optionally fills
+  missing values.
+
+  Args:
+    x: a panel, as accepted by panel.as_panel. All series share the
+      length and index of the panel.
+    replace_missing: Default True.
+      If True, use na_interp to fill missing values.
+    lam: BoxCox transformation parameter. The default is None, for no
+      transformation.
+    columns: Default None, which cleans every series. Otherwise, a list
+      of the series to clean. The other series are returned unchanged.
+    processes: Default None, which cleans the series in this process.
+      Otherwise, the number of worker processes to split the series over.
+
+  Returns:
+    2-tuple of a panel with outliers replaced, and a dict from the
+    name of each series that changed to a numpy array of the positions
+    of its changed values. Series that are not in the dict are unchanged.
+  '''
+  return _clean(x, True, replace_missing, lam, columns, processes)
+
+
+def na_interp(x, lam=None, columns=None, processes=None):
+  '''
+  Fills missing values in every series in a panel, as wrappers.na_interp
+  does for one series: with linear interpolation for non-seasonal series,
+  and an STL decomposition for seasonal series.
+
+  Args:
+    x: a panel, as accepted by panel.as_panel. All series share the
+      length and index of the panel.
+    lam: BoxCox transformation parameter. The default is None, for no
+      transformation.
+    columns: Default None, which fills every series. Otherwise, a list
+      of the series to fill. The other series are returned unchanged.
+    processes: Default None, which fills the series in this process.
+      Otherwise, the number of worker processes to split the series over.
+
+  Returns:
+    2-tuple of a panel with missing values filled, and a dict from the
+    name of each series that changed to a numpy array of the positions
+    of its changed values. Series that are not in the dict are unchanged.
+  '''
+  return _clean(x, False, True, lam, columns, processes)
@@ -11,10 +11,12 @@ from rpy2.robjects.packages import importr
 from rpy2 import robjects
 from math import floor
 import validate
+import instrument
 
 stats = importr('stats')
 
 
+@instrument.stage('conversion', instrument.input_nbytes)
 def to_ts(x):
   '''
   Takes in a time series as either a Pandas Series or an R time series. 
@@ -36,6 +38,7 @@ def to_ts(x):
     raise TypeError('Must be a Pandas series or R ts object.')
   
 
+@instrument.stage('extraction', instrument.output_nbytes)
 def acf_out(x, is_pandas):
   '''
   Accepts an R 'acf' object and returns either that object, or a Pandas 
@@ -53,6 +56,7 @@ def acf_out(x, is_pandas):
   else:
     return x
 
+@instrument.stage('extraction', instrument.output_nbytes)
 def series_out(x, is_pandas):
   '''
   Accepts an R time series and returns the input as-is if is_pandas is False, 
@@ -71,6 +75,7 @@ def series_out(x, is_pandas):
     return x
     
     
+@instrument.stage('extraction', instrument.output_nbytes)
 def forecast_out(fc, is_pandas):
   '''
   Accepts an R forecast object and returns either the object as-is, 
@@ -91,6 +96,7 @@ def forecast_out(fc, is_pandas):
     return fc
     
     
+@instrument.stage('extraction', instrument.output_nbytes)
 def decomposition_out(dc, is_pandas):
   '''
   Accepts an R decomposition and returns either the object, or a Pandas 
@@ -182,6 +188,7 @@ def to_forecast(fc, data, test):
     raise TypeError('Forecast must be R forecast object or Pandas DataFrame')
 
 
+@instrument.stage('conversion', instrument.input_nbytes)
 def as_matrix(x):
   '''
   Converts any legal input into an R matrix. Sequences are converted to one 
@@ -328,7 +335,10 @@ def ts_as_series(ts):
   Returns:
     a Pandas Series with the same data and index as ts
   '''
-  idx = _get_index(ts)
+  if validate.is_R_msts(ts):
+    idx = _msts_index(ts)
+  else:
+    idx = _get_index(ts)
   return pandas.Series(ts, index=idx)
 
 
@@ -383,6 +393,71 @@ def series_as_ts(x):
     return _regular_series_as_ts(x)
 
 
+_as_msts = robjects.r('''
+  function(x, periods) {
+    freq <- floor(max(periods))
+    start <- if (frequency(x) == freq) start(x) else 1
+    forecast::msts(as.numeric(x), seasonal.periods=periods,
+                   ts.frequency=freq, start=start)
+  }
+''')
+
+
+def as_msts(x, seasonal_periods):
+  '''
+  Converts a time series with more than one seasonal period, such as
+  hourly data with daily and weekly cycles, into an R multi-seasonal time
+  series (class 'msts'). In Pandas, such a series is indexed like a
+  seasonal series with the longest period as its frequency, e.g. by
+  (week, hour of week) for seasonal_periods=(24, 168), as made by
+  time_index(n, freq=168). The shorter periods are not kept in the index,
+  which stays two levels deep however many periods there are.
+  
+  Args:
+    x: an R time series, or a Pandas Series indexed as above, or with an
+      ordinary index, in which case it starts at (1, 1).
+    seasonal_periods: a sequence of the seasonal periods, e.g. (24, 168)
+    
+  Returns:
+    an R multi-seasonal time series, with frequency equal to the largest 
+    seasonal period, rounded down
+  '''
+  if validate.is_R_ts(x):
+    data = x
+  elif isinstance(x, pandas.Series):
+    data = series_as_ts(x)
+  else:
+    raise TypeError('x must be an R time series or a Pandas Series')
+  return _as_msts(data, robjects.FloatVector(seasonal_periods))
+
+
+def msts_periods(x):
+  '''
+  Gets the seasonal periods of an R multi-seasonal time series.
+  
+  Args:
+    x: an R time series
+    
+  Returns:
+    a list of the seasonal periods, or None if x is not of class 'msts'
+  '''
+  if not validate.is_R_msts(x):
+    return None
+  return list(robjects.r('attr')(x, 'msts'))
+
+
+def _msts_index(x):
+  '''
+  Utility function that makes the index of an R multi-seasonal time series
+  with array operations, since these series are often long.
+  '''
+  start = [int(k) for k in robjects.r('start')(x)]
+  freq = int(robjects.r('frequency')(x)[0])
+  if freq <= 1:
+    return time_index(len(x), start=start[0])
+  return time_index(len(x), start=tuple(start), freq=freq)
+
+
 # TODO: this need some arg-checking
 def sequence_as_series(x, start=1, freq=1):
   '''
@@ -418,6 +493,49 @@ def sequence_as_series(x, start=1, freq=1):
     return pandas.Series(data=list(x), index=[outer, inner])
 
 
+def time_index(n, start=1, freq=1):
+  '''
+  Makes the index for a time series of length n. The index is the same as 
+  the one made by sequence_as_series, but it is built with array 
+  operations, so it is fast for long series.
+  
+  Args:
+    n: the length of the time series
+    start: default 1; a number or 2-tuple to use as start index of sequence.
+      If 2-tuple, it is (period, step), e.g. March 2010 is (2010, 3).
+    freq: default 1; number of points in each time period
+      e.g. 12 for monthly data with an annual period
+      
+  Returns:
+    a Pandas Index, or a MultiIndex if freq > 1
+  '''
+  if freq <= 1:
+    return pandas.Index(numpy.arange(start, start + n))
+  if type(start) not in (list, tuple):
+    start = (start, 1)
+  i, j = start
+  steps = (j - 1) + numpy.arange(n)
+  return pandas.MultiIndex.from_arrays([i + steps // freq, steps % freq + 1])
+
+
+def index_start(idx):
+  '''
+  Finds the start and frequency of a time series from its index. 
+  This is the inverse of time_index.
+  
+  Args:
+    idx: the index of a Pandas Series representing a time series
+    
+  Returns:
+    2-tuple of the start, as a number or 2-tuple (period, step), and the 
+    frequency
+  '''
+  if idx.nlevels == 2:
+    return tuple(idx[0]), len(idx.levels[1])
+  else:
+    return idx[0], 1
+
+
 def prediction_intervals(fc):
   '''
   Function creates a Pandas DataFrame with the upper and lower prediction 
@@ -437,7 +555,11 @@ def prediction_intervals(fc):
   colnames = ['point_fc']
   lower = fc.rx2('lower')
   upper = fc.rx2('upper')
-  for (k, level) in enumerate(fc.rx2('level'), 1):
+  levels = fc.rx2('level')
+  # Some methods, such as croston, make no prediction intervals
+  if levels is robjects.NULL:
+    levels = []
+  for (k, level) in enumerate(levels, 1):
     lower_colname = 'lower%d' % level
     df[lower_colname] = lower.rx(True, k)
     colnames.append(lower_colname)
@@ -447,6 +569,146 @@ def prediction_intervals(fc):
   return df[colnames]
 
 
+_split_ts = robjects.r('''
+  function(values, lengths, start_period, start_step, freq, ids) {
+    ends <- cumsum(lengths)
+    begins <- ends - lengths + 1
+    out <- mapply(function(b, e, p, s, f) {
+                    ts(values[seq.int(b, length.out=e - b + 1)], 
+                       start=c(p, s), frequency=f)
+                  }, begins, ends, start_period, start_step, freq, 
+                  SIMPLIFY=FALSE)
+    names(out) <- ids
+    out
+  }
+''')
+
+
+def panel_as_ts_list(df, long=False, freq=None):
+  '''
+  Converts a whole panel of time series to a named R list of time series 
+  (class 'ts') in one transfer. The values of all series are sent to R as 
+  a single vector, along with the length, start and frequency of each 
+  series, and split into 'ts' objects on the R side.
+  
+  Args:
+    df: a Pandas DataFrame that is either wide, with one column per series 
+      and the index used for a single series (as in panel.as_panel), or 
+      long, with columns id, time, data or id, period, step, data and 
+      a default integer index. The rows for each id in a long frame must 
+      be contiguous and in time order.
+    long: Default False. Set to True if df is a long frame.
+    freq: Only used for long frames with 4 columns. The frequency of the 
+      series. Default None uses the largest step in the frame.
+    
+  Returns:
+    an R list of time series, named by the series ids
+  '''
+  if long:
+    if df.shape[1] not in (3, 4):
+      raise ValueError('A long frame must have 3 or 4 columns')
+    ids = df.iloc[:, 0].astype(str).values
+    begins = numpy.concatenate(
+      [[0], numpy.flatnonzero(ids[1:] != ids[:-1]) + 1])
+    lengths = numpy.diff(numpy.concatenate([begins, [len(ids)]]))
+    values = df.iloc[:, -1].values
+    start_period = df.iloc[:, 1].values[begins]
+    if df.shape[1] == 4:
+      start_step = df.iloc[:, 2].values[begins]
+      if freq is None:
+        freq = df.iloc[:, 2].max()
+    else:
+      start_step = numpy.ones(len(begins), dtype=int)
+      freq = 1
+    ids = ids[begins]
+    freqs = numpy.repeat(int(freq), len(begins))
+  else:
+    start, freq = index_start(df.index)
+    n, nseries = df.shape
+    values = df.values.T.ravel()
+    lengths = numpy.repeat(n, nseries)
+    if freq > 1:
+      start_period = numpy.repeat(start[0], nseries)
+      start_step = numpy.repeat(start[1], nseries)
+    else:
+      start_period = numpy.repeat(start, nseries)
+      start_step = numpy.ones(nseries, dtype=int)
+    freqs = numpy.repeat(freq, nseries)
+    ids = numpy.array([str(k) for k in df.columns])
+  return _split_ts(robjects.FloatVector(numpy.asarray(values, dtype=float)), 
+                   robjects.IntVector(lengths.astype(int)),
+                   robjects.FloatVector(start_period.astype(float)), 
+                   robjects.FloatVector(start_step.astype(float)),
+                   robjects.FloatVector(freqs.astype(float)), 
+                   robjects.StrVector(ids))
+
+
+_stack_forecasts = robjects.r('''
+  function(fcs) {
+    h <- vapply(fcs, function(f) length(f$mean), 1L)
+    mean <- unlist(lapply(fcs, function(f) as.numeric(f$mean)))
+    level <- fcs[[1]]$level
+    bounds <- function(name) {
+      if (is.null(level)) return(numeric(0))
+      do.call(rbind, lapply(fcs, function(f) as.matrix(f[[name]])))
+    }
+    tsp <- vapply(fcs, function(f) tsp(f$mean), numeric(3))
+    ids <- names(fcs)
+    if (is.null(ids)) ids <- as.character(seq_along(fcs))
+    list(h=h, mean=mean, lower=bounds('lower'), upper=bounds('upper'),
+         tsp=tsp, level=if (is.null(level)) numeric(0) else level, ids=ids)
+  }
+''')
+
+
+def forecast_list_as_frame(fcs):
+  '''
+  Converts an R list of forecast objects, such as the result of calling 
+  a forecast function on each element of the output of panel_as_ts_list, 
+  into one Pandas DataFrame. The forecasts are stacked in R, so the data 
+  comes back in a few column vectors rather than one forecast at a time. 
+  All forecasts must have the same prediction interval levels. Forecasts
+  without prediction intervals, such as from croston, give only point_fc.
+  
+  Args:
+    fcs: an R list of objects of class 'forecast', optionally named
+    
+  Returns:
+    a Pandas DataFrame in long format, with one row per series and 
+    horizon step, and columns series_id, horizon, period, season 
+    (1 for non-seasonal series), point_fc and the lower/upper columns 
+    from prediction_intervals
+  '''
+  out = _stack_forecasts(fcs)
+  h = numpy.fromiter(out.rx2('h'), dtype=int)
+  # R matrices come back flattened in column-major order
+  tsp = numpy.fromiter(out.rx2('tsp'), dtype=float).reshape(len(h), 3)
+  level = list(out.rx2('level'))
+  nrows = h.sum()
+  lower = numpy.fromiter(out.rx2('lower'), dtype=float)
+  lower = lower.reshape(len(level), nrows).T
+  upper = numpy.fromiter(out.rx2('upper'), dtype=float)
+  upper = upper.reshape(len(level), nrows).T
+  series_start = numpy.concatenate([[0], numpy.cumsum(h)[:-1]])
+  horizon = numpy.arange(nrows) - numpy.repeat(series_start, h)
+  freq = numpy.repeat(tsp[:, 2], h)
+  times = numpy.repeat(tsp[:, 0], h) + horizon / freq
+  period = numpy.floor(times + 1e-8)
+  season = numpy.round((times - period) * freq).astype(int) + 1
+  df = pandas.DataFrame({'series_id' : numpy.repeat(list(out.rx2('ids')), h), 
+                         'horizon' : horizon + 1, 
+                         'period' : period.astype(int),
+                         'season' : season,
+                         'point_fc' : numpy.fromiter(out.rx2('mean'), 
+                                                     dtype=float)})
+  cols = ['series_id', 'horizon', 'period', 'season', 'point_fc']
+  for (k, lev) in enumerate(level):
+    df['lower%d' % lev] = lower[:, k]
+    df['upper%d' % lev] = upper[:, k]
+    cols.extend(['lower%d' % lev, 'upper%d' % lev])
+  return df[cols]
+
+
 def accuracy(acc):
   '''
   Convert the R matrix of forecast accuracy measures returned from 
@@ -504,6 +766,32 @@ def decomposition(decomp):
     raise ValueError('Argument must map to an R seasonal decomposition.')
 
 
+_as_stl = robjects.r('''
+  function(s, t, r) {
+    structure(list(time.series=cbind(seasonal=s, trend=t, remainder=r)),
+              class='stl')
+  }''')
+
+
+def decomposition_as_stl(decomp):
+  '''
+  Makes an R object of class 'stl' from a Pandas Data Frame with an STL
+  decomposition, as from decomposition. The object has only the
+  time.series component, which is all that R Forecast needs to forecast
+  from it.
+
+  Args:
+    decomp: a Pandas Data Frame with an STL decomposition
+
+  Returns:
+    an object that maps to an R stl decomposition
+  '''
+  if not validate.is_Pandas_decomposition(decomp):
+    raise ValueError('Argument must be a Pandas seasonal decomposition.')
+  return _as_stl(series_as_ts(decomp.seasonal), series_as_ts(decomp.trend),
+                 series_as_ts(decomp.remainder))
+
+
 def Acf(acf):
   '''
   Function to extract a Pandas Series based on the provided R acf object.
@@ -544,6 +832,7 @@ def flatten_index(idx):
     inner = idx.labels[1] / freq
     return outer + inner
   else:
-    raise ValueError('rforecast only supports single seasonality')
+    raise ValueError('Seasonal indexes have 2 levels, even for series '
+                     'with several seasonal periods (see as_msts)')
 
 
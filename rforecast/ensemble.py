@@ -0,0 +1,201 @@
+'''
+The ensemble module makes combination forecasts: several forecast methods
+are run on the same series, and their point forecasts and prediction
+intervals are averaged with weights. The series is converted to R once
+and shared by all of the methods, and the forecasts are combined in NumPy.
+
+  fc = ensemble.combine(x, methods=['ets', 'auto_arima', 'thetaf'],
+                        weights='inverse_mse')
+'''
+import numpy
+from rpy2 import robjects
+import batch
+import converters
+import instrument
+import validate
+import wrappers
+
+DEFAULT_METHODS = ('ets', 'auto_arima', 'thetaf')
+WEIGHTS = ('equal', 'inverse_mse')
+
+_combined = robjects.r('''
+  function(f, mean, lower, upper, fitted, method) {
+    f$mean[] <- mean
+    f$lower[] <- lower
+    f$upper[] <- upper
+    if (!is.null(f$fitted)) {
+      f$fitted[] <- fitted
+      f$residuals <- f$x - f$fitted
+    }
+    f$method <- method
+    f$model <- NULL
+    f
+  }
+''')
+
+
+def _method_specs(methods):
+  '''
+  Utility function that turns the methods argument of combine into a list
+  of (name, kwargs) pairs.
+  '''
+  if isinstance(methods, dict):
+    methods = sorted(methods.items())
+  specs = []
+  for spec in methods:
+    if isinstance(spec, tuple):
+      name, kwargs = spec
+    else:
+      name, kwargs = spec, {}
+    if name not in wrappers.INTERVAL_METHODS:
+      raise ValueError('Forecast methods must be from %s' %
+                       (wrappers.INTERVAL_METHODS,))
+    specs.append((name, dict(kwargs or {})))
+  if not specs:
+    raise ValueError('Provide at least one forecast method')
+  return specs
+
+
+def _forecast_arrays(f):
+  '''
+  Utility function that extracts the mean, bounds and fitted values of
+  an R forecast object as NumPy arrays.
+
+  Returns:
+    4-tuple of arrays: mean (horizon), lower and upper (horizon x level),
+    and fitted (the length of the series)
+  '''
+  mean = numpy.array(f.rx2('mean'), dtype=float)
+  h = len(mean)
+  # R matrices come back flattened in column-major order
+  lower = numpy.array(f.rx2('lower'), dtype=float).reshape(-1, h).T
+  upper = numpy.array(f.rx2('upper'), dtype=float).reshape(-1, h).T
+  fitted = f.rx2('fitted')
+  if fitted is robjects.NULL:
+    fitted = numpy.empty(len(f.rx2('x')))
+    fitted.fill(numpy.nan)
+  else:
+    fitted = numpy.array(fitted, dtype=float)
+  return mean, lower, upper, fitted
+
+
+def inverse_mse_weights(x, fitted):
+  '''
+  Computes combination weights in inverse proportion to the in-sample
+  mean squared error of each method. Points where any method has no
+  fitted value are left out, so that all methods are scored on the same
+  points.
+
+  Args:
+    x: the series, as a sequence of its values
+    fitted: numpy array (methods x time) of fitted values
+
+  Returns:
+    numpy array of weights that sum to 1
+  '''
+  x = numpy.asarray(x, dtype=float)
+  fitted = numpy.atleast_2d(fitted)
+  ok = ~numpy.isnan(fitted).any(axis=0) & ~numpy.isnan(x)
+  if not ok.any():
+    raise ValueError('No in-sample fitted values to compute weights from')
+  mse = ((fitted[:, ok] - x[ok]) ** 2).mean(axis=1)
+  if (mse == 0).any():
+    w = (mse == 0).astype(float)
+  else:
+    w = 1 / mse
+  return w / w.sum()
+
+
+def _weights(weights, names, x, fitted):
+  '''
+  Utility function that turns the weights argument of combine into an
+  array of weights that sum to 1, in the order of the methods.
+  '''
+  if weights is None:
+    weights = 'equal'
+  if validate.is_string(weights):
+    if weights not in WEIGHTS:
+      raise ValueError('weights must be one of %s, or a list' % (WEIGHTS,))
+    if weights == 'equal':
+      return numpy.repeat(1.0 / len(names), len(names))
+    return inverse_mse_weights(x, fitted)
+  if isinstance(weights, dict):
+    weights = [weights[name] for name in names]
+  w = numpy.asarray(weights, dtype=float)
+  if w.shape != (len(names),) or (w < 0).any() or w.sum() <= 0:
+    raise ValueError('weights must be non-negative, one for each method')
+  return w / w.sum()
+
+
+@instrument.wrapper
+def combine(x, methods=DEFAULT_METHODS, h=None, level=(80, 95),
+            weights=None):
+  '''
+  Makes a combination forecast by running several forecast methods on
+  a series and taking the weighted average of their point forecasts and
+  prediction interval bounds. The fitted values are combined in the same
+  way, so the result can be passed to wrappers.accuracy.
+
+  Args:
+    x: an R time series, obtained from converters.ts(), or a Pandas Series
+      with the correct index (e.g. from converters.sequence_as_series().
+    methods: Default ('ets', 'auto_arima', 'thetaf'). A list of the names
+      of forecast functions in wrappers.INTERVAL_METHODS, or of (name,
+      kwargs) pairs to pass extra arguments, or a dict of name: kwargs.
+    h: Forecast horizon; default is 2 full periods of a periodic series,
+      or 10 steps for non-seasonal series.
+    level: A number or list/tuple of prediction interval confidence values.
+      Default is 80% and 95% intervals.
+    weights: Default None, for equal weights. 'inverse_mse' weights each
+      method by the inverse of its in-sample mean squared error. Otherwise,
+      a list of weights in the order of methods, or a dict keyed by method
+      name. Weights are scaled to sum to 1.
+
+  Returns:
+    If x is an R ts object, an R forecast is returned. If x is a Pandas
+    Series, a Pandas Data Frame is returned.
+  '''
+  specs = _method_specs(methods)
+  x, is_pandas = converters.to_ts(x)
+  h = wrappers._get_horizon(x, h)
+  forecasts = []
+  for (name, kwargs) in specs:
+    func = getattr(wrappers, name)
+    forecasts.append(func(x, h=h, level=level, **kwargs))
+  arrays = [_forecast_arrays(f) for f in forecasts]
+  if len(set(a[1].shape for a in arrays)) > 1:
+    raise ValueError('All methods must forecast the same horizon and levels')
+  means, lowers, uppers, fitted = [numpy.array(a) for a in zip(*arrays)]
+  names = [name for (name, _) in specs]
+  w = _weights(weights, names, numpy.array(x, dtype=float), fitted)
+  mean = numpy.tensordot(w, means, axes=1)
+  lower = numpy.tensordot(w, lowers, axes=1)
+  upper = numpy.tensordot(w, uppers, axes=1)
+  fit = numpy.tensordot(w, fitted, axes=1)
+  method = 'Combination of %s' % ', '.join(names)
+  out = _combined(forecasts[0], robjects.FloatVector(mean),
+                  robjects.FloatVector(lower.ravel(order='F')),
+                  robjects.FloatVector(upper.ravel(order='F')),
+                  robjects.FloatVector(fit), method)
+  return converters.forecast_out(out, is_pandas)
+
+
+def combine_many(series, methods=DEFAULT_METHODS, h=None, level=(80, 95),
+                 weights=None):
+  '''
+  Makes a combination forecast for each of many series, with combine.
+
+  Args:
+    series: a dict, or an iterable of (id, series) pairs, where each series
+      is an R time series or a Pandas Series. A panel DataFrame may be
+      passed as panel.items().
+    methods, h, level, weights: as for combine. All forecasts must have the
+      same horizon, so set h if the series have different frequencies.
+
+  Returns:
+    a batch.ForecastBatch of the combined forecasts
+  '''
+  if isinstance(series, dict):
+    series = series.items()
+  out = [(k, combine(x, methods, h, level, weights)) for (k, x) in series]
+  return batch.ForecastBatch.from_forecasts(out)
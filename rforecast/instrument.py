@@ -0,0 +1,279 @@
+'''
+The instrument module records where the time goes in calls to the
+functions in wrappers: converting the input to R (conversion), running
+R (r), and extracting the result back into Pandas (extraction). It is off
+by default, and when it is off, each instrumented function only checks a
+flag. Turn it on with the profiling context manager:
+
+  with instrument.profiling() as stats:
+    wrappers.thetaf(x)
+  print stats.to_prometheus()
+
+Times are wall-clock seconds. The r stage of a wrapper is its total time
+less the time spent in conversion and extraction.
+'''
+import functools
+import json
+import threading
+from contextlib import contextmanager
+from timeit import default_timer
+
+_enabled = False
+_local = threading.local()
+_hooks = []
+
+
+class Registry(object):
+  '''
+  Accumulates call counts, wall time and bytes converted, keyed by
+  (wrapper, stage). Converter calls made outside of any wrapper are
+  recorded under the wrapper name '(direct)'.
+  '''
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._records = {}
+
+  def record(self, wrapper, stage, seconds, nbytes=0):
+    with self._lock:
+      rec = self._records.setdefault((wrapper, stage), [0, 0.0, 0])
+      rec[0] += 1
+      rec[1] += seconds
+      rec[2] += nbytes
+
+  def reset(self):
+    with self._lock:
+      self._records.clear()
+
+  def as_list(self):
+    '''
+    Returns:
+      a list of dicts with keys wrapper, stage, calls, seconds and bytes,
+      sorted by wrapper and stage
+    '''
+    with self._lock:
+      items = sorted(self._records.items())
+    return [{'wrapper' : wrapper, 'stage' : stage, 'calls' : calls,
+             'seconds' : seconds, 'bytes' : nbytes}
+            for ((wrapper, stage), (calls, seconds, nbytes)) in items]
+
+  def to_json_lines(self, file=None):
+    '''
+    Exports the statistics as JSON lines, one line per wrapper and stage.
+
+    Args:
+      file: Default None. An open file to write to.
+
+    Returns:
+      the JSON lines, as a string
+    '''
+    text = ''.join(json.dumps(rec, sort_keys=True) + '\n'
+                   for rec in self.as_list())
+    if file is not None:
+      file.write(text)
+    return text
+
+  def to_prometheus(self):
+    '''
+    Exports the statistics in the Prometheus text exposition format,
+    as counters labelled by wrapper and stage.
+
+    Returns:
+      the exposition text, as a string
+    '''
+    records = self.as_list()
+    lines = []
+    for (metric, field) in [('calls', 'calls'), ('seconds', 'seconds'),
+                            ('bytes', 'bytes')]:
+      name = 'rforecast_stage_%s_total' % metric
+      lines.append('# TYPE %s counter' % name)
+      for rec in records:
+        lines.append('%s{wrapper="%s",stage="%s"} %r' % (
+          name, _label(rec['wrapper']), _label(rec['stage']), rec[field]))
+    return '\n'.join(lines) + '\n'
+
+
+def _label(value):
+  '''
+  Utility function that escapes the backslashes, double quotes and
+  newlines in a Prometheus label value, as the text format requires.
+  '''
+  return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+    '\n', '\\n')
+
+
+registry = Registry()
+_active = registry
+
+
+@contextmanager
+def profiling(stats=None):
+  '''
+  Context manager that turns on instrumentation for the enclosed block.
+
+  Args:
+    stats: Default None, which records into the global registry.
+      Otherwise, a Registry to record into.
+
+  Returns:
+    the Registry being recorded into
+  '''
+  global _enabled, _active
+  old_enabled, old_active = _enabled, _active
+  _enabled = True
+  _active = registry if stats is None else stats
+  try:
+    yield _active
+  finally:
+    _enabled, _active = old_enabled, old_active
+
+
+def enable():
+  '''
+  Turns on instrumentation, recording into the global registry, even
+  inside a profiling block with its own Registry.
+  '''
+  global _enabled, _active
+  _enabled = True
+  _active = registry
+
+
+def disable():
+  '''
+  Turns off instrumentation.
+  '''
+  global _enabled
+  _enabled = False
+
+
+def add_hook(func):
+  '''
+  Adds a function to be called with no arguments after every call to an
+  instrumented wrapper, whether or not profiling is on.
+
+  Args:
+    func: the function to call
+  '''
+  if func not in _hooks:
+    _hooks.append(func)
+
+
+def remove_hook(func):
+  '''
+  Removes a function added with add_hook, if it is present.
+
+  Args:
+    func: the function to remove
+  '''
+  if func in _hooks:
+    _hooks.remove(func)
+
+
+def _run_hooks():
+  for hook in list(_hooks):
+    hook()
+
+
+def _frames():
+  if not hasattr(_local, 'frames'):
+    _local.frames = []
+  return _local.frames
+
+
+def _depth():
+  return getattr(_local, 'depth', 0)
+
+
+def wrapper(func):
+  '''
+  Decorator for the functions in wrappers. Records the total and R time
+  of each call, and runs any hooks after it. Only the outermost call is
+  recorded and runs the hooks, so a wrapper that calls other wrappers,
+  such as frequency from _get_horizon, or wrappers.ets from
+  ensemble.combine, counts as one call; the time of the inner calls is
+  part of the outer call.
+  '''
+  name = func.__name__
+
+  @functools.wraps(func)
+  def instrumented(*args, **kwargs):
+    if not _enabled and not _hooks:
+      return func(*args, **kwargs)
+    if _depth() > 0:
+      return func(*args, **kwargs)
+    _local.depth = 1
+    if not _enabled:
+      try:
+        return func(*args, **kwargs)
+      finally:
+        _local.depth = 0
+        _run_hooks()
+    frames = _frames()
+    frame = {'name' : name, 'conversion' : 0.0, 'extraction' : 0.0}
+    frames.append(frame)
+    start = default_timer()
+    try:
+      return func(*args, **kwargs)
+    finally:
+      total = default_timer() - start
+      frames.pop()
+      _local.depth = 0
+      _active.record(name, 'total', total)
+      r_time = total - frame['conversion'] - frame['extraction']
+      _active.record(name, 'r', max(r_time, 0.0))
+      _run_hooks()
+  return instrumented
+
+
+def stage(name, size=None):
+  '''
+  Decorator for converter functions. Records the time of each call as
+  the given stage of the wrapper it was called from.
+
+  Args:
+    name: the stage, 'conversion' or 'extraction'
+    size: Default None. A function of (args, result) that returns the
+      number of bytes converted.
+  '''
+  def decorate(func):
+    @functools.wraps(func)
+    def instrumented(*args, **kwargs):
+      if not _enabled:
+        return func(*args, **kwargs)
+      start = default_timer()
+      out = func(*args, **kwargs)
+      elapsed = default_timer() - start
+      frames = _frames()
+      if frames:
+        frames[-1][name] += elapsed
+        wrapper_name = frames[-1]['name']
+      else:
+        wrapper_name = '(direct)'
+      nbytes = size(args, out) if size is not None else 0
+      _active.record(wrapper_name, name, elapsed, nbytes)
+      return out
+    return instrumented
+  return decorate
+
+
+def _pandas_nbytes(obj):
+  '''
+  The size of the data in a Pandas object, or 0 for anything else,
+  such as an R object.
+  '''
+  values = getattr(obj, 'values', None)
+  return int(getattr(values, 'nbytes', 0) or 0)
+
+
+def input_nbytes(args, out):
+  '''
+  Size function for stage: the bytes in the first argument.
+  '''
+  return _pandas_nbytes(args[0]) if args else 0
+
+
+def output_nbytes(args, out):
+  '''
+  Size function for stage: the bytes in the result.
+  '''
+  return _pandas_nbytes(out)
@@ -0,0 +1,143 @@
+'''
+The memory module reports the size of R's heap and controls garbage
+collection in R and Python together. This is for long-running processes
+that call the functions in wrappers many times. The R objects behind
+rpy2 proxies are only released by R after Python has collected the
+proxies, so collecting in Python and then in R frees more than either
+alone.
+
+A GCPolicy collects automatically after a number of wrapper calls, or when
+the R heap grows past a threshold:
+
+  memory.set_policy(memory.GCPolicy(every=1000, max_bytes=2 ** 30))
+'''
+import gc
+import threading
+from rpy2 import robjects
+import instrument
+
+# Sizes of R's cons cells and vector cells in bytes, on 64-bit platforms.
+NCELL_BYTES = 56
+VCELL_BYTES = 8
+
+_gc = robjects.r('function(full) gc(verbose=FALSE, full=full)')
+
+_policy = None
+
+
+def _heap(out):
+  '''
+  Utility function that makes the heap usage dict from the matrix
+  returned by R gc().
+  '''
+  used = list(out)[:2]
+  ncells, vcells = int(used[0]), int(used[1])
+  return {'ncells' : ncells,
+          'vcells' : vcells,
+          'ncells_bytes' : ncells * NCELL_BYTES,
+          'vcells_bytes' : vcells * VCELL_BYTES,
+          'bytes' : ncells * NCELL_BYTES + vcells * VCELL_BYTES}
+
+
+def heap_usage():
+  '''
+  Reports the R heap usage. R only reports its heap from a collection, so
+  this runs a minor (young generation) collection in R.
+
+  Returns:
+    a dict with the cons cells (ncells) and vector cells (vcells) in use,
+    their sizes in bytes (ncells_bytes, vcells_bytes) and the total (bytes)
+  '''
+  return _heap(_gc(False))
+
+
+def collect(full=True):
+  '''
+  Runs garbage collection in Python and then in R. Collecting in Python
+  first releases the R objects held by unreachable rpy2 proxies, so that
+  the R collection can free them.
+
+  Args:
+    full: Default True. If False, R runs a minor collection.
+
+  Returns:
+    the R heap usage after collection, as from heap_usage
+  '''
+  gc.collect()
+  return _heap(_gc(full))
+
+
+class GCPolicy(object):
+  '''
+  A policy for automatic garbage collection. Once installed with
+  set_policy, it is checked after every call to a function in wrappers,
+  and it runs collect when either limit is reached.
+
+  Args:
+    every: Default None. Collect after this many wrapper calls.
+    max_bytes: Default None. Collect when the R heap exceeds this many
+      bytes. Checking the heap runs a minor collection in R, so it is only
+      checked every check_every calls.
+    check_every: Default 100. Calls between checks of the heap size.
+    full: Default True. Whether collections are full collections in R.
+
+  Attributes:
+    calls: the number of wrapper calls seen. Only outermost calls count,
+      so a wrapper that calls other wrappers counts once.
+    collections: the number of collections run by the policy
+    last_heap: the R heap usage after the last check or collection
+  '''
+
+  def __init__(self, every=None, max_bytes=None, check_every=100, full=True):
+    if every is None and max_bytes is None:
+      raise ValueError('Provide every, max_bytes or both')
+    if every is not None and every < 1:
+      raise ValueError('every must be at least 1')
+    if check_every < 1:
+      raise ValueError('check_every must be at least 1')
+    self.every = every
+    self.max_bytes = max_bytes
+    self.check_every = check_every
+    self.full = full
+    self.calls = 0
+    self.collections = 0
+    self.last_heap = None
+    self._lock = threading.Lock()
+
+  def __call__(self):
+    with self._lock:
+      self.calls += 1
+      calls = self.calls
+    if self.every is not None and calls % self.every == 0:
+      self._collect()
+    elif self.max_bytes is not None and calls % self.check_every == 0:
+      self.last_heap = heap_usage()
+      if self.last_heap['bytes'] > self.max_bytes:
+        self._collect()
+
+  def _collect(self):
+    self.last_heap = collect(self.full)
+    self.collections += 1
+
+
+def set_policy(policy):
+  '''
+  Installs a garbage collection policy, replacing any current policy.
+
+  Args:
+    policy: a GCPolicy, or None to remove the current policy
+  '''
+  global _policy
+  if _policy is not None:
+    instrument.remove_hook(_policy)
+  _policy = policy
+  if policy is not None:
+    instrument.add_hook(policy)
+
+
+def get_policy():
+  '''
+  Returns:
+    the installed GCPolicy, or None
+  '''
+  return _policy
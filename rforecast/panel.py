@@ -0,0 +1,634 @@
+'''
+The panel module contains NumPy implementations of some of the simpler
+forecasting methods in R Forecast. They operate on a whole panel of series
+at once, instead of making one R call per series. A panel is a Pandas
+DataFrame with one column per series and an index of the kind used by
+converters (a MultiIndex for seasonal series), so all of the series in a
+panel share the same length and frequency.
+'''
+import numpy
+import pandas
+from scipy.special import ndtri
+import converters
+import validate
+
+
+def as_panel(x, start=1, freq=1):
+  '''
+  Converts panel input into a DataFrame with one column per series and
+  the correct index for the series.
+
+  Args:
+    x: a Pandas DataFrame with one column per series, a dict or list of
+      Pandas Series with matching indexes, or a 2-D numpy array or list
+      of lists with one row per series.
+    start: default 1; only used if x is an array or list of lists.
+      A number or 2-tuple to use as start index of the series.
+      If 2-tuple, it is (period, step), e.g. March 2010 is (2010, 3).
+    freq: default 1; only used if x is an array or list of lists.
+      The number of points in each time period, e.g. 12 for monthly data.
+
+  Returns:
+    a Pandas DataFrame with one column per series
+  '''
+  if type(x) is pandas.DataFrame:
+    return x
+  if type(x) is dict:
+    return pandas.DataFrame(x)
+  if type(x) in (list, tuple) and len(x) > 0 and type(x[0]) is pandas.Series:
+    return pandas.DataFrame(dict(enumerate(x)))
+  values = numpy.atleast_2d(numpy.array(x, dtype=float))
+  if values.ndim != 2:
+    raise ValueError('Panel data must be 2-dimensional')
+  idx = converters.sequence_as_series(values[0], start=start, freq=freq).index
+  return pandas.DataFrame(values.T, index=idx)
+
+
+def _frequency(idx):
+  '''
+  Utility function for getting the frequency of a panel from its index.
+
+  Args:
+    idx: the index of a panel or Pandas Series
+
+  Returns:
+    the number of points per period, 1 for a non-seasonal index
+  '''
+  if idx.nlevels == 2:
+    return len(idx.levels[1])
+  return 1
+
+
+def _forecast_index(idx, h):
+  '''
+  Utility function for making the index of the h periods following
+  the end of a panel or Pandas Series.
+
+  Args:
+    idx: the index of the panel or Pandas Series
+    h: the forecast horizon
+
+  Returns:
+    an index of length h for the forecast period
+  '''
+  last = idx[-1]
+  if idx.nlevels == 2:
+    last = tuple(last)
+  fc_idx = converters.sequence_as_series([0] * (h + 1), start=last,
+                                         freq=_frequency(idx)).index
+  return fc_idx[1:]
+
+
+def _forecast_frame(mean, lower, upper, level, columns, idx):
+  '''
+  Utility function for assembling panel forecasts into a DataFrame.
+  The columns have two levels: the first is the series, and the second
+  has the same columns as converters.prediction_intervals, so that
+  out[series] is laid out like the output of a wrapper.
+
+  Args:
+    mean: numpy array (series x horizon) of mean forecasts
+    lower: numpy array (series x horizon x level) of lower bounds
+    upper: numpy array (series x horizon x level) of upper bounds
+    level: sequence of prediction interval confidence values
+    columns: the series names
+    idx: the index for the forecast period
+
+  Returns:
+    a Pandas DataFrame with a point forecast and prediction intervals
+    for each series
+  '''
+  names = ['point_fc']
+  blocks = [mean]
+  for (k, lev) in enumerate(level):
+    names.extend(['lower%d' % lev, 'upper%d' % lev])
+    blocks.extend([lower[:, :, k], upper[:, :, k]])
+  return _panel_frame(blocks, names, columns, idx)
+
+
+def _panel_frame(blocks, names, columns, idx):
+  '''
+  Utility function for assembling per-series arrays into a DataFrame with
+  two levels of columns: the series, and then one column per block.
+
+  Args:
+    blocks: list of numpy arrays (series x time), one per column name
+    names: the column names for the second level
+    columns: the series names
+    idx: the index for the time periods
+
+  Returns:
+    a Pandas DataFrame with a column for each series and name
+  '''
+  data = numpy.concatenate([b[:, :, None] for b in blocks], axis=2)
+  nseries, n, ncols = data.shape
+  data = data.transpose(1, 0, 2).reshape(n, nseries * ncols)
+  cols = pandas.MultiIndex.from_product([list(columns), names])
+  return pandas.DataFrame(data, index=idx, columns=cols)
+
+
+def _panel_blocks(df, names):
+  '''
+  Utility function that is the inverse of _panel_frame. It extracts one
+  numpy array (series x time) for each name in the second column level.
+
+  Args:
+    df: a DataFrame with two levels of columns, as from _panel_frame
+    names: the names in the second column level, in order
+
+  Returns:
+    2-tuple of a list of the series names and a list of numpy arrays
+  '''
+  columns = list(df.columns.get_level_values(0).unique())
+  data = df[pandas.MultiIndex.from_product([columns, names])].values
+  data = data.reshape(data.shape[0], len(columns), len(names))
+  return columns, [data[:, :, k].T for k in range(len(names))]
+
+
+def _qnorm(p):
+  '''
+  Vectorized standard normal quantile function, like R's qnorm.
+
+  Args:
+    p: a number or sequence of probabilities
+
+  Returns:
+    a numpy array of normal quantiles
+  '''
+  p = numpy.atleast_1d(numpy.asarray(p, dtype=float))
+  return ndtri(p)
+
+
+def _box_cox(x, lam):
+  '''
+  NumPy version of BoxCox from R Forecast.
+
+  Args:
+    x: numpy array of data
+    lam: BoxCox transformation parameter
+
+  Returns:
+    the transformed data
+  '''
+  x = numpy.array(x, dtype=float)
+  if lam < 0:
+    x[x < 0] = numpy.nan
+  if lam == 0:
+    return numpy.log(x)
+  return (numpy.sign(x) * numpy.abs(x) ** lam - 1) / lam
+
+
+def _inv_box_cox(x, lam):
+  '''
+  NumPy version of InvBoxCox from R Forecast.
+
+  Args:
+    x: numpy array of data on the scale of a BoxCox transformation
+    lam: BoxCox transformation parameter
+
+  Returns:
+    the data on the original scale
+  '''
+  x = numpy.array(x, dtype=float)
+  if lam < 0:
+    x[x > -1.0 / lam] = numpy.nan
+  if lam == 0:
+    return numpy.exp(x)
+  y = x * lam + 1
+  return numpy.sign(y) * numpy.abs(y) ** (1.0 / lam)
+
+
+def _acf(x, lag_max):
+  '''
+  Computes the autocorrelation of each row of x, as R's acf does.
+
+  Args:
+    x: numpy array (series x time)
+    lag_max: the largest lag to compute
+
+  Returns:
+    numpy array (series x lag_max) of autocorrelations at lags 1..lag_max
+  '''
+  xc = x - x.mean(axis=1)[:, None]
+  denom = (xc ** 2).sum(axis=1)
+  out = numpy.empty((x.shape[0], lag_max))
+  for k in range(1, lag_max + 1):
+    out[:, k - 1] = (xc[:, :-k] * xc[:, k:]).sum(axis=1) / denom
+  return out
+
+
+def _moving_average(x, freq):
+  '''
+  Computes the centred moving average used in R's decompose. For even
+  frequencies, this is a 2 x freq moving average.
+
+  Args:
+    x: numpy array (series x time)
+    freq: the number of points in each time period
+
+  Returns:
+    numpy array the same shape as x, with NaN at either end
+  '''
+  if freq % 2 == 0:
+    weights = numpy.array([0.5] + [1.0] * (freq - 1) + [0.5]) / freq
+  else:
+    weights = numpy.ones(freq) / freq
+  p = len(weights)
+  offset = p // 2
+  n = x.shape[1]
+  out = numpy.empty(x.shape)
+  out.fill(numpy.nan)
+  if n < p:
+    return out
+  total = numpy.zeros((x.shape[0], n - p + 1))
+  for (j, w) in enumerate(weights):
+    total += w * x[:, j:n - p + 1 + j]
+  out[:, offset:offset + n - p + 1] = total
+  return out
+
+
+def _classical_decompose(x, freq, type='additive'):
+  '''
+  Classical seasonal decomposition of each row of x, as done by R's
+  decompose.
+
+  Args:
+    x: numpy array (series x time)
+    freq: the number of points in each time period
+    type: 'additive' or 'multiplicative'
+
+  Returns:
+    4-tuple of numpy arrays (series x time) for the seasonal, trend and
+    remainder components, and (series x freq) for the seasonal figure.
+    The seasonal figure starts at the first point of each series.
+  '''
+  n = x.shape[1]
+  trend = _moving_average(x, freq)
+  if type == 'additive':
+    detrended = x - trend
+  else:
+    detrended = x / trend
+  figure = numpy.empty((x.shape[0], freq))
+  for i in range(freq):
+    figure[:, i] = numpy.nanmean(detrended[:, i::freq], axis=1)
+  if type == 'additive':
+    figure = figure - figure.mean(axis=1)[:, None]
+  else:
+    figure = figure / figure.mean(axis=1)[:, None]
+  seasonal = numpy.tile(figure, (1, n // freq + 1))[:, :n]
+  if type == 'additive':
+    remainder = x - seasonal - trend
+  else:
+    remainder = x / seasonal / trend
+  return seasonal, trend, remainder, figure
+
+
+def _ses_sse(y, alpha):
+  '''
+  Runs simple exponential smoothing over each row of y, with the initial
+  level that minimizes the in-sample MSE for the given alpha. The errors
+  are linear in the initial level, so it has a closed form.
+
+  Args:
+    y: numpy array (series x time)
+    alpha: numpy array with one smoothing parameter per series
+
+  Returns:
+    3-tuple of numpy arrays: sum of squared errors, initial level
+    and final level, for each series
+  '''
+  level = numpy.zeros(y.shape[0])
+  decay = numpy.ones(y.shape[0])
+  sum_aa = numpy.zeros(y.shape[0])
+  sum_ac = numpy.zeros(y.shape[0])
+  sum_cc = numpy.zeros(y.shape[0])
+  for t in range(y.shape[1]):
+    err = y[:, t] - level
+    sum_aa += err * err
+    sum_ac += err * decay
+    sum_cc += decay * decay
+    level = level + alpha * err
+    decay = decay * (1 - alpha)
+  l0 = sum_ac / sum_cc
+  sse = sum_aa - sum_ac * l0
+  return sse, l0, level + decay * l0
+
+
+def _fit_ses(y, lower=1e-4, upper=0.9999, ngrid=20, niter=40):
+  '''
+  Fits simple exponential smoothing to each row of y by minimizing
+  the in-sample MSE, like ses() in R Forecast with initial='optimal'.
+  A coarse grid search over alpha brackets the minimum, which is then
+  refined by a golden section search, for all series at once.
+
+  Args:
+    y: numpy array (series x time)
+    lower: smallest allowed alpha
+    upper: largest allowed alpha
+    ngrid: number of points in the grid search
+    niter: number of golden section iterations
+
+  Returns:
+    3-tuple of numpy arrays: alpha, sum of squared errors and
+    final level, for each series
+  '''
+  nseries = y.shape[0]
+  grid = numpy.linspace(lower, upper, ngrid)
+  sse_grid = numpy.array([_ses_sse(y, numpy.repeat(a, nseries))[0]
+                          for a in grid])
+  best = sse_grid.argmin(axis=0)
+  a = grid[numpy.maximum(best - 1, 0)]
+  b = grid[numpy.minimum(best + 1, ngrid - 1)]
+  ratio = (numpy.sqrt(5) - 1) / 2
+  c = b - ratio * (b - a)
+  d = a + ratio * (b - a)
+  fc = _ses_sse(y, c)[0]
+  fd = _ses_sse(y, d)[0]
+  for _ in range(niter):
+    left = fc < fd
+    a = numpy.where(left, a, c)
+    b = numpy.where(left, d, b)
+    probe = numpy.where(left, b - ratio * (b - a), a + ratio * (b - a))
+    fp = _ses_sse(y, probe)[0]
+    c, d = numpy.where(left, probe, d), numpy.where(left, c, probe)
+    fc, fd = numpy.where(left, fp, fd), numpy.where(left, fc, fp)
+  alpha = (a + b) / 2
+  sse, _, last = _ses_sse(y, alpha)
+  return alpha, sse, last
+
+
+def _seasonality_test(x, freq):
+  '''
+  The test for seasonality used in R's thetaf: the autocorrelation at
+  the seasonal lag is compared with a 90% critical value.
+
+  Args:
+    x: numpy array (series x time)
+    freq: the number of points in each time period
+
+  Returns:
+    boolean numpy array, True for series that test as seasonal
+  '''
+  nseries, n = x.shape
+  if freq <= 1 or n <= 2 * freq:
+    return numpy.zeros(nseries, dtype=bool)
+  constant = (x == x[:, :1]).all(axis=1)
+  with numpy.errstate(divide='ignore', invalid='ignore'):
+    r = _acf(x, freq)
+    stat = numpy.sqrt((1 + 2 * (r[:, :-1] ** 2).sum(axis=1)) / n)
+    seasonal = numpy.abs(r[:, -1]) / stat > _qnorm(0.95)[0]
+  return seasonal & ~constant
+
+
+def thetaf(x, h=10, level=(80, 95), seasonal=None, lam=None):
+  '''
+  Perform a theta forecast on every series in a panel. This is a NumPy
+  version of thetaf() from R Forecast: series that test as seasonal are
+  seasonally adjusted with a classical multiplicative decomposition,
+  a simple exponential smoothing forecast is made with drift equal to
+  half the slope of a linear trend, and the forecast is reseasonalized.
+  Results match R's thetaf within the tolerance of the SES optimizer.
+
+  Args:
+    x: a panel, as accepted by as_panel, with no missing values.
+    h: default 10; the forecast horizon.
+    level: A number or list/tuple of prediction interval confidence values.
+      Default is 80% and 95% intervals.
+    seasonal: Default None, which tests each series for seasonality,
+      as R does. If True, all series are seasonally adjusted, and if
+      False, none of them are.
+    lam: BoxCox transformation parameter. The default is None, for no
+      transformation. Otherwise, a Box-Cox transformation is applied
+      before forecasting and inverted after.
+
+  Returns:
+    a Pandas DataFrame with two levels of columns. The first is the
+    series, and the second is laid out like converters.prediction_intervals.
+  '''
+  df = as_panel(x)
+  freq = _frequency(df.index)
+  y = df.values.T.astype(float)
+  if numpy.isnan(y).any():
+    raise ValueError('thetaf does not allow missing values')
+  if lam is not None:
+    y = _box_cox(y, lam)
+  if type(level) not in (list, tuple):
+    level = [level]
+  nseries, n = y.shape
+  if seasonal is None:
+    is_seasonal = _seasonality_test(y, freq)
+  elif seasonal and freq > 1:
+    is_seasonal = numpy.ones(nseries, dtype=bool)
+  else:
+    is_seasonal = numpy.zeros(nseries, dtype=bool)
+  season = numpy.ones((nseries, n))
+  if is_seasonal.any():
+    s = _classical_decompose(y[is_seasonal], freq, 'multiplicative')[0]
+    ok = (numpy.abs(s) >= 1e-4).all(axis=1)
+    rows = numpy.flatnonzero(is_seasonal)[ok]
+    season[rows] = s[ok]
+    is_seasonal[numpy.flatnonzero(is_seasonal)[~ok]] = False
+  adj = y / season
+  alpha, sse, last = _fit_ses(adj)
+  alpha = numpy.maximum(alpha, 1e-10)
+  t = numpy.arange(n) - (n - 1) / 2.0
+  slope = (adj * t).sum(axis=1) / (t ** 2).sum()
+  steps = numpy.arange(h)
+  drift = (1 - (1 - alpha) ** n) / alpha
+  mean = last[:, None] + (slope / 2)[:, None] * (steps + drift[:, None])
+  last_cycle = season[:, n - freq:] if freq > 1 else season[:, -1:]
+  reps = h // last_cycle.shape[1] + 1
+  mean *= numpy.tile(last_cycle, (1, reps))[:, :h]
+  sigma = numpy.sqrt(sse / (n - 3))
+  se = sigma[:, None] * numpy.sqrt(steps * alpha[:, None] ** 2 + 1)
+  z = _qnorm(0.5 + numpy.array(level, dtype=float) / 200)
+  lower = mean[:, :, None] - z * se[:, :, None]
+  upper = mean[:, :, None] + z * se[:, :, None]
+  if lam is not None:
+    mean = _inv_box_cox(mean, lam)
+    lower = _inv_box_cox(lower, lam)
+    upper = _inv_box_cox(upper, lam)
+  fc_idx = _forecast_index(df.index, h)
+  return _forecast_frame(mean, lower, upper, level, df.columns, fc_idx)
+
+
+def decompose(x, type='additive'):
+  '''
+  Performs a classical seasonal decomposition of every series in a panel
+  into season, trend and remainder components. This is a NumPy version
+  of R's decompose, which wrappers.decompose calls once per series.
+
+  Args:
+    x: a panel, as accepted by as_panel. The series should be seasonal,
+      with at least two full periods of data.
+    type: Type of seasonal decomposition to perform.
+      Default is 'additive', other option is 'multiplicative'.
+
+  Returns:
+    a Pandas DataFrame with two levels of columns. The first is the
+    series, and the second is laid out like converters.decomposition,
+    with columns data, seasonal, trend and remainder.
+  '''
+  df = as_panel(x)
+  freq = _frequency(df.index)
+  if freq <= 1 or df.shape[0] < 2 * freq:
+    raise ValueError('decompose requires at least 2 periods of seasonal data')
+  if type not in ('additive', 'multiplicative'):
+    raise ValueError("type must be 'additive' or 'multiplicative'")
+  y = df.values.T.astype(float)
+  seasonal, trend, remainder, _ = _classical_decompose(y, freq, type)
+  names = ['data', 'seasonal', 'trend', 'remainder']
+  return _panel_frame([y, seasonal, trend, remainder], names, 
+                      df.columns, df.index)
+
+
+def seasadj(decomp):
+  '''
+  Return the seasonally adjusted series from a panel decomposition.
+  For each series, this follows the Pandas branch of wrappers.seasadj:
+  classical decompositions are adjusted by dividing out a multiplicative
+  seasonal component or subtracting an additive one, and STL 
+  decompositions are adjusted by subtraction.
+  
+  Args:
+    decomp: a panel decomposition, from decompose, or a DataFrame with 
+      the same layout
+      
+  Returns:
+    a Pandas DataFrame with one column of seasonally adjusted data 
+    for each series
+  '''
+  if not validate.is_Panel_decomposition(decomp):
+    raise ValueError('seasadj requires a panel decomposition as input')
+  names = ['data', 'seasonal', 'trend', 'remainder']
+  columns, (data, seasonal, trend, _) = _panel_blocks(decomp, names)
+  classical = numpy.isnan(trend).any(axis=1)
+  mult = classical & numpy.isclose(seasonal.mean(axis=1), 1.0, atol=1e-5)
+  out = numpy.where(mult[:, None], data / seasonal, data - seasonal)
+  return pandas.DataFrame(out.T, index=decomp.index, columns=columns)
+
+
+def sindexf(decomp, h):
+  '''
+  Projects the seasonal component of every series in a panel decomposition 
+  forward by h time steps into the future. For each series, this matches
+  the Pandas branch of wrappers.sindexf.
+  
+  Args:
+    decomp: a panel decomposition, from decompose, or a DataFrame with 
+      the same layout
+    h: a forecast horizon
+    
+  Returns:
+    a Pandas DataFrame with one column for each series, containing its 
+    seasonal component projected naively forward h steps.
+  '''
+  if not validate.is_Panel_decomposition(decomp):
+    raise ValueError('sindexf requires a panel decomposition as input')
+  freq = _frequency(decomp.index)
+  names = ['data', 'seasonal', 'trend', 'remainder']
+  columns, blocks = _panel_blocks(decomp, names)
+  last_cycle = blocks[1][:, -freq:]
+  out = numpy.tile(last_cycle, (1, h // freq + 1))[:, :h]
+  fc_idx = _forecast_index(decomp.index, h)
+  return pandas.DataFrame(out.T, index=fc_idx, columns=columns)
+
+
+def _demand_events(x, start, freq):
+  '''
+  Utility function that lists the non-zero demands in a panel, in order
+  of series and then time, for Croston's method.
+
+  Args:
+    x: a panel, as accepted by as_panel, a Pandas DataFrame with all
+      columns sparse, or a SciPy sparse matrix (series x time)
+    start: the start of the series, if x is a SciPy sparse matrix
+    freq: the frequency of the series, if x is a SciPy sparse matrix
+
+  Returns:
+    5-tuple of the series positions, the time positions and the values
+    of the non-zero demands, the series names and the index of the panel
+  '''
+  coo = None
+  if hasattr(x, 'tocoo'):
+    coo = x.tocoo()
+    n = coo.shape[1]
+    columns = list(range(coo.shape[0]))
+    idx = converters.time_index(n, start=start, freq=freq)
+  else:
+    df = as_panel(x)
+    columns, idx = list(df.columns), df.index
+    accessor = getattr(df, 'sparse', None)
+    if accessor is not None:
+      coo = accessor.to_coo().T
+  if coo is None:
+    y = df.values.T.astype(float)
+    if numpy.isnan(y).any():
+      raise ValueError('croston does not allow missing values')
+    rows, times = numpy.nonzero(y)
+    values = y[rows, times]
+  else:
+    order = numpy.lexsort((coo.col, coo.row))
+    rows, times = coo.row[order], coo.col[order]
+    values = numpy.asarray(coo.data, dtype=float)[order]
+    keep = values != 0
+    rows, times, values = rows[keep], times[keep], values[keep]
+  if (values < 0).any():
+    raise ValueError('Series should not contain negative values')
+  return rows, times, values, columns, idx
+
+
+def croston(x, h=10, alpha=0.1, type='croston', start=1, freq=1):
+  '''
+  Forecasts every series in a panel of intermittent demand with Croston's
+  method, or the Syntetos-Boylan approximation (SBA). This is a NumPy
+  version of croston() from R Forecast, which wrappers.croston calls once
+  per series. Simple exponential smoothing, started at the first value,
+  is run over the non-zero demands and over the intervals between them,
+  for all series at once, one demand at a time. Only the non-zero values
+  are used, so a sparse panel is never made dense.
+
+  Args:
+    x: a panel, as accepted by as_panel, with no missing values and no
+      negative values. For sparse data, x may also be a Pandas DataFrame
+      with all columns sparse, or a SciPy sparse matrix with one row per
+      series, in which case the series are named by row number.
+    h: default 10; the forecast horizon.
+    alpha: default 0.1; the smoothing parameter.
+    type: Default 'croston'. The other option is 'sba', which multiplies
+      the forecast by 1 - alpha / 2 to correct Croston's bias.
+    start: default 1; only used if x is a SciPy sparse matrix.
+      A number or 2-tuple to use as start index of the series.
+    freq: default 1; only used if x is a SciPy sparse matrix.
+      The number of points in each time period.
+
+  Returns:
+    a Pandas DataFrame with one column of point forecasts per series.
+    Series with no demand are forecast as NaN, as R gives NA for them.
+  '''
+  if type not in ('croston', 'sba'):
+    raise ValueError("type must be 'croston' or 'sba'")
+  rows, times, values, columns, idx = _demand_events(x, start, freq)
+  nseries = len(columns)
+  counts = numpy.bincount(rows, minlength=nseries)
+  first = numpy.concatenate([[0], numpy.cumsum(counts)[:-1]])
+  demand = numpy.zeros(nseries)
+  interval = numpy.ones(nseries)
+  last = numpy.zeros(nseries)
+  for k in range(counts.max() if len(counts) > 0 else 0):
+    active = numpy.flatnonzero(counts > k)
+    pos = first[active] + k
+    gap = times[pos] + 1 - last[active]
+    if k == 0:
+      demand[active] = values[pos]
+      interval[active] = gap
+    else:
+      demand[active] += alpha * (values[pos] - demand[active])
+      interval[active] += alpha * (gap - interval[active])
+    last[active] = times[pos] + 1
+  mean = demand / interval
+  mean[counts == 0] = numpy.nan
+  if type == 'sba':
+    mean *= 1 - alpha / 2.0
+  out = numpy.tile(mean, (h, 1))
+  return pandas.DataFrame(out, index=_forecast_index(idx, h), columns=columns)
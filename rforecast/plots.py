@@ -1,17 +1,46 @@
 '''
 The plots module contains functions for producing plots using matplotlib 
 of time series, forecast results and seasonal decompositions.
+
+The plot_* functions draw with pyplot and show the plot. The save_*
+functions and render_many draw on their own figures with the Agg backend,
+without using pyplot, and write image files. They work without a display,
+and render_many spreads the work over several processes.
 '''
+import os
+import multiprocessing
+import numpy
+import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import converters
 
+FORMATS = ('png', 'svg')
+KINDS = ('ts', 'decomp', 'forecast')
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+# Points per pixel of axes width when downsample is 'auto'
+POINTS_PER_PIXEL = 2
+
+# The figure and drawing options used for every plot in a render_many
+# worker process
+_worker_figure = None
+_worker_options = None
+
 
-def plot_ts(ts, **kwargs):
+def plot_ts(ts, downsample=None, method='lttb', **kwargs):
   '''
   Plots an R time series using matplotlib/pyplot/pandas.
   
   Args:
     ts: an object that maps to an R time series
+    downsample: Default None, which plots every point. Otherwise the
+      most points to plot, or 'auto' for a limit from the plot width.
+      See the downsample function.
+    method: Default 'lttb'. The downsampling method, 'lttb' or 'minmax'.
     kwargs: keyword arguments passed through a pandas Series
       and on to pyplot.plot().
     
@@ -19,18 +48,25 @@ def plot_ts(ts, **kwargs):
     a time series plot
   '''
   s = converters.to_series(ts)
-  s.plot(**kwargs)
+  if downsample is None:
+    s.plot(**kwargs)
+  else:
+    _draw_ts(plt.gca(), s, downsample, method, **kwargs)
   plt.style.use('ggplot')
   plt.show()
   
 
-def plot_decomp(decomp, **kwargs):
+def plot_decomp(decomp, downsample=None, method='lttb', **kwargs):
   '''
   Plots a seasonal decomposition using matplotlib/pyplot/pandas.
   
   Args:
     decomp: either an R decomposition (class 'stl' or 'decomposed.ts') or 
       a Pandas Data Frame from converters.decomposition.
+    downsample: Default None, which plots every point. Otherwise the
+      most points to plot in each panel, or 'auto' for a limit from the
+      plot width. See the downsample function.
+    method: Default 'lttb'. The downsampling method, 'lttb' or 'minmax'.
     kwargs: keyword arguments passed through a pandas DataFrame
       and on to pyplot.plot().
       
@@ -39,12 +75,16 @@ def plot_decomp(decomp, **kwargs):
     decomposition plus the original time series data
   '''
   decomp = converters.to_decomp(decomp)
-  decomp.plot(subplots=True, **kwargs)
+  if downsample is None:
+    decomp.plot(subplots=True, **kwargs)
+  else:
+    _draw_decomp(plt.gcf(), decomp, downsample, method, **kwargs)
   plt.style.use('ggplot')
   plt.show()
 
 
-def plot_forecast(fc, data=None, test=None, loc='upper left'):
+def plot_forecast(fc, data=None, test=None, loc='upper left',
+                  downsample=None, method='lttb'):
   '''
   Plots a forecast and its prediction intervals.
   
@@ -56,6 +96,11 @@ def plot_forecast(fc, data=None, test=None, loc='upper left'):
     test: optional data for the forecast period as a Pandas Series
     loc: Default is 'upper left', since plots often go up and right.
       For other values see matplotlib.pyplot.legend().
+    downsample: Default None, which plots every point. Otherwise the
+      most points to plot for the data and the test data, or 'auto' for
+      a limit from the plot width. The forecast is never downsampled.
+      See the downsample function.
+    method: Default 'lttb'. The downsampling method, 'lttb' or 'minmax'.
       
   Output:
     a plot of the series, the mean forecast, and the prediciton intervals, 
@@ -63,23 +108,523 @@ def plot_forecast(fc, data=None, test=None, loc='upper left'):
   '''
   fc, data, test = converters.to_forecast(fc, data, test)
   plt.style.use('ggplot')
+  _draw_forecast(plt.gca(), fc, data, test, loc, downsample, method)
+  plt.show()
+
+
+def downsample(x, y, max_points, method='lttb'):
+  '''
+  Reduces a series to at most max_points points for plotting, keeping its
+  shape and peaks. The first and last points are always kept.
+
+  Args:
+    x: sequence of x-values, in increasing order
+    y: sequence of y-values, the same length as x
+    max_points: the most points to keep, at least 3
+    method: Default 'lttb', for largest-triangle-three-buckets, which
+      keeps the point in each bucket that makes the largest triangle with
+      the points kept on either side. The other option is 'minmax', which
+      keeps the lowest and highest points in each bucket.
+
+  Returns:
+    2-tuple of numpy arrays of the x- and y-values of the points kept
+  '''
+  x = numpy.asarray(x, dtype=float)
+  y = numpy.asarray(y, dtype=float)
+  if method not in DOWNSAMPLE_METHODS:
+    raise ValueError('method must be one of %s' % (DOWNSAMPLE_METHODS,))
+  if max_points < 3:
+    raise ValueError('max_points must be at least 3')
+  if len(y) <= max_points:
+    return x, y
+  if method == 'lttb':
+    keep = _lttb(x, y, max_points)
+  else:
+    keep = _minmax(y, max_points)
+  return x[keep], y[keep]
+
+
+def _lttb(x, y, n):
+  '''
+  Utility function for largest-triangle-three-buckets downsampling.
+  Returns the positions of the points to keep. Points with NaN values
+  are only kept if a whole bucket is NaN, so gaps still show.
+  '''
+  edges = numpy.linspace(1, len(y) - 1, n - 1).astype(int)
+  # Mean of each bucket, for the third point of the triangles
+  inner = y[1:-1]
+  valid = ~numpy.isnan(inner)
+  sums_x = numpy.add.reduceat(x[1:-1], edges[:-1] - 1)
+  sums_y = numpy.add.reduceat(numpy.where(valid, inner, 0.0), edges[:-1] - 1)
+  counts_y = numpy.add.reduceat(valid, edges[:-1] - 1)
+  avg_x = numpy.append(sums_x / numpy.diff(edges), x[-1])
+  with numpy.errstate(divide='ignore', invalid='ignore'):
+    avg_y = numpy.append(sums_y / counts_y, y[-1])
+  keep = numpy.empty(n, dtype=int)
+  keep[0], keep[-1] = 0, len(y) - 1
+  a = 0
+  for k in range(n - 2):
+    lo, hi = edges[k], edges[k + 1]
+    area = numpy.abs((x[a] - avg_x[k + 1]) * (y[lo:hi] - y[a]) -
+                     (x[a] - x[lo:hi]) * (avg_y[k + 1] - y[a]))
+    a = lo + numpy.argmax(numpy.where(numpy.isnan(area), -1.0, area))
+    keep[k + 1] = a
+  return keep
+
+
+def _minmax(y, n):
+  '''
+  Utility function for min/max downsampling. Returns the positions of the
+  points to keep: the first and last points, and the lowest and highest
+  points in each of (n - 2) / 2 buckets, in order.
+  '''
+  nbins = max((n - 2) // 2, 1)
+  edges = numpy.linspace(0, len(y), nbins + 1).astype(int)
+  low = numpy.where(numpy.isnan(y), numpy.inf, y)
+  high = numpy.where(numpy.isnan(y), -numpy.inf, y)
+  argmin = [lo + numpy.argmin(low[lo:hi])
+            for (lo, hi) in zip(edges[:-1], edges[1:])]
+  argmax = [lo + numpy.argmax(high[lo:hi])
+            for (lo, hi) in zip(edges[:-1], edges[1:])]
+  return numpy.unique(numpy.concatenate([[0, len(y) - 1], argmin, argmax]))
+
+
+def _points(x, y, ax, max_points, method):
+  '''
+  Utility function that downsamples the points for one line on ax, if
+  max_points is not None. If max_points is 'auto', the limit is
+  POINTS_PER_PIXEL times the width of ax in pixels.
+  '''
+  if max_points is None:
+    return x, y
+  if max_points == 'auto':
+    width = ax.get_window_extent().width
+    max_points = max(int(POINTS_PER_PIXEL * width), 3)
+  return downsample(x, y, max_points, method)
+
+
+def _draw_ts(ax, s, downsample=None, method='lttb', **kwargs):
+  '''
+  Utility function that draws a Pandas Series on a matplotlib Axes.
+  '''
+  x, y = _points(converters.flatten_index(s.index), s.values, ax,
+                 downsample, method)
+  ax.plot(x, y, **kwargs)
+
+
+def _draw_decomp(fig, decomp, downsample=None, method='lttb', **kwargs):
+  '''
+  Utility function that draws each column of a decomposition on its own
+  Axes, stacked vertically in fig, with a shared x-axis.
+  '''
+  x = converters.flatten_index(decomp.index)
+  ncols = len(decomp.columns)
+  first = None
+  for (k, col) in enumerate(decomp.columns):
+    ax = fig.add_subplot(ncols, 1, k + 1, sharex=first)
+    if first is None:
+      first = ax
+    ax.plot(*_points(x, decomp[col].values, ax, downsample, method),
+            **kwargs)
+    ax.set_ylabel(col)
+
+
+def _draw_forecast(ax, fc, data, test, loc, downsample=None, method='lttb'):
+  '''
+  Utility function that draws a forecast, its prediction intervals, the
+  original data and optionally the test data on a matplotlib Axes. Only
+  the data and the test data are downsampled.
+  '''
   l = list(fc.columns)
   lowers = l[1::2]
   uppers = l[2::2]
   tr_idx = converters.flatten_index(data.index)
   fc_idx = converters.flatten_index(fc.index)
-  plt.plot(tr_idx, data, color='black')
-  plt.plot(fc_idx, fc[l[0]], color='blue')
+  handles = ax.plot(*_points(tr_idx, data.values, ax, downsample, method),
+                    color='black')
+  handles += ax.plot(fc_idx, fc[l[0]], color='blue')
   for (k, (low, up)) in enumerate(zip(lowers, uppers), 1):
-    plt.fill_between(fc_idx, fc[low], fc[up], color='grey', alpha=0.5/k)
+    ax.fill_between(fc_idx, fc[low], fc[up], color='grey', alpha=0.5/k)
   labels = ['data', 'forecast']
   if test is not None:
     n = min(len(fc.index), len(test))
-    plt.plot(fc_idx[:n], list(test[:n]), color='green')
+    handles += ax.plot(*_points(fc_idx[:n], test.values[:n], ax,
+                                downsample, method), color='green')
     labels.append('test')
-  plt.legend(labels, loc=loc)
-  plt.show()    
+  ax.legend(handles, labels, loc=loc)
+
+
+def new_figure(figsize=(8, 5), dpi=100):
+  '''
+  Makes a matplotlib Figure on an Agg canvas, without using pyplot.
+
+  Args:
+    figsize: Default (8, 5). Width and height in inches.
+    dpi: Default 100. Resolution in dots per inch.
+
+  Returns:
+    a matplotlib Figure
+  '''
+  fig = Figure(figsize=figsize, dpi=dpi)
+  FigureCanvasAgg(fig)
+  return fig
+
+
+def _format(file, format):
+  '''
+  Utility function that gets the image format from the file extension,
+  if it is not given, and checks it.
+  '''
+  if format is None:
+    name = file if isinstance(file, str) else ''
+    format = os.path.splitext(name)[1][1:].lower() or 'png'
+  if format not in FORMATS:
+    raise ValueError('format must be one of %s' % (FORMATS,))
+  return format
+
+
+def _render(fig, kind, args, file, format, **kwargs):
+  '''
+  Utility function that clears fig, draws a plot of the given kind from
+  Pandas objects, and saves it.
+  '''
+  fig.clear()
+  with matplotlib.style.context('ggplot'):
+    if kind == 'ts':
+      _draw_ts(fig.add_subplot(1, 1, 1), args[0], **kwargs)
+    elif kind == 'decomp':
+      _draw_decomp(fig, args[0], **kwargs)
+    else:
+      _draw_forecast(fig.add_subplot(1, 1, 1), *args, **kwargs)
+    fig.savefig(file, format=format)
+
+
+def save_ts(ts, file, format=None, figsize=(8, 5), dpi=100, downsample=None,
+            method='lttb', **kwargs):
+  '''
+  Plots a time series to an image file, without using pyplot.
+
+  Args:
+    ts: an R time series or a Pandas Series
+    file: the file name, or an open file
+    format: Default None, which takes the format from the file extension.
+      Otherwise 'png' or 'svg'.
+    figsize: Default (8, 5). Width and height in inches.
+    dpi: Default 100. Resolution in dots per inch.
+    downsample: Default None, which plots every point. Otherwise the
+      most points to plot, or 'auto' for a limit from the plot width.
+      See the downsample function.
+    method: Default 'lttb'. The downsampling method, 'lttb' or 'minmax'.
+    kwargs: keyword arguments passed on to matplotlib Axes.plot().
+  '''
+  format = _format(file, format)
+  s = converters.to_series(ts)
+  _render(new_figure(figsize, dpi), 'ts', (s,), file, format,
+          downsample=downsample, method=method, **kwargs)
+
+
+def save_decomp(decomp, file, format=None, figsize=(8, 8), dpi=100,
+                downsample=None, method='lttb', **kwargs):
+  '''
+  Plots a seasonal decomposition to an image file, without using pyplot.
+
+  Args:
+    decomp: either an R decomposition (class 'stl' or 'decomposed.ts') or
+      a Pandas Data Frame from converters.decomposition.
+    file: the file name, or an open file
+    format: Default None, which takes the format from the file extension.
+      Otherwise 'png' or 'svg'.
+    figsize: Default (8, 8). Width and height in inches.
+    dpi: Default 100. Resolution in dots per inch.
+    downsample: Default None, which plots every point. Otherwise the
+      most points to plot in each panel, or 'auto' for a limit from the
+      plot width. See the downsample function.
+    method: Default 'lttb'. The downsampling method, 'lttb' or 'minmax'.
+    kwargs: keyword arguments passed on to matplotlib Axes.plot().
+  '''
+  format = _format(file, format)
+  dc = converters.to_decomp(decomp)
+  _render(new_figure(figsize, dpi), 'decomp', (dc,), file, format,
+          downsample=downsample, method=method, **kwargs)
+
+
+def save_forecast(fc, file, data=None, test=None, loc='upper left',
+                  format=None, figsize=(8, 5), dpi=100, downsample=None,
+                  method='lttb'):
+  '''
+  Plots a forecast and its prediction intervals to an image file,
+  without using pyplot.
+
+  Args:
+    fc: Pandas Data Frame from converters.prediction_intervals,
+      or an R forecast object
+    file: the file name, or an open file
+    data: the data for the forecast period as a Pandas Series, or None
+      if fc is an R forecast
+    test: optional data for the forecast period as a Pandas Series
+    loc: Default is 'upper left'. The location of the legend.
+    format: Default None, which takes the format from the file extension.
+      Otherwise 'png' or 'svg'.
+    figsize: Default (8, 5). Width and height in inches.
+    dpi: Default 100. Resolution in dots per inch.
+    downsample: Default None, which plots every point. Otherwise the
+      most points to plot for the data and the test data, or 'auto' for
+      a limit from the plot width. The forecast is never downsampled.
+    method: Default 'lttb'. The downsampling method, 'lttb' or 'minmax'.
+  '''
+  format = _format(file, format)
+  args = converters.to_forecast(fc, data, test) + (loc,)
+  _render(new_figure(figsize, dpi), 'forecast', args, file, format,
+          downsample=downsample, method=method)
+
+
+def _task(kind, obj, file, format):
+  '''
+  Utility function that converts one item for render_many into Pandas
+  objects, which can be sent to a worker process.
+  '''
+  if kind == 'ts':
+    args = (converters.to_series(obj),)
+  elif kind == 'decomp':
+    args = (converters.to_decomp(obj),)
+  else:
+    args = _forecast_args(obj) + ('upper left',)
+  return (kind, args, file, format)
 
 
+def _forecast_args(obj):
+  '''
+  Utility function that converts a forecast, or a tuple of (forecast,
+  data) or (forecast, data, test), into a 3-tuple of Pandas objects, as
+  from converters.to_forecast.
+  '''
+  if not isinstance(obj, tuple):
+    obj = (obj,)
+  fc, data, test = (obj + (None, None))[:3]
+  return converters.to_forecast(fc, data, test)
+
+
+def _init_worker(figsize, dpi, options):
+  global _worker_figure, _worker_options
+  _worker_figure = new_figure(figsize, dpi)
+  _worker_options = options
+
+
+def _render_task(task):
+  _render(_worker_figure, *task, **_worker_options)
+  return task[2]
+
+
+def render_many(items, directory, kind='forecast', format='png',
+                processes=None, chunksize=8, figsize=(8, 5), dpi=100,
+                downsample=None, method='lttb'):
+  '''
+  Plots many series, decompositions or forecasts to image files, one file
+  per item, using worker processes. Each worker draws every plot on one
+  reused figure with the Agg backend, and does not use pyplot, so nothing
+  carries over from one plot to the next. R objects are converted to
+  Pandas in the calling process.
+
+  Args:
+    items: a dict, or an iterable of (id, object) pairs. The file for each
+      item is named <id>.<format> in directory. For kind 'forecast', each
+      object is a forecast as for save_forecast, or a tuple of
+      (forecast, data) or (forecast, data, test).
+    directory: the directory for the files. It is made if it is missing.
+    kind: Default 'forecast'. One of 'ts', 'decomp' or 'forecast'.
+    format: Default 'png'. The image format, 'png' or 'svg'.
+    processes: Default None, for one process per CPU. If 1, the plots are
+      rendered in the calling process.
+    chunksize: Default 8. Number of plots sent to a worker at a time.
+    figsize: Default (8, 5). Width and height in inches.
+    dpi: Default 100. Resolution in dots per inch.
+    downsample: Default None, which plots every point. Otherwise the
+      most points to plot for each line, or 'auto' for a limit from the
+      plot width. Forecasts are never downsampled.
+    method: Default 'lttb'. The downsampling method, 'lttb' or 'minmax'.
+
+  Returns:
+    a list of the paths of the files written, in the order of items
+  '''
+  if kind not in KINDS:
+    raise ValueError('kind must be one of %s' % (KINDS,))
+  format = _format('', format)
+  if not os.path.isdir(directory):
+    os.makedirs(directory)
+  if isinstance(items, dict):
+    items = items.items()
+  tasks = (_task(kind, obj, os.path.join(directory, '%s.%s' % (
+             str(item_id).replace(os.sep, '_'), format)), format)
+           for (item_id, obj) in items)
+  options = {'downsample' : downsample, 'method' : method}
+  if processes == 1:
+    fig = new_figure(figsize, dpi)
+    out = []
+    for task in tasks:
+      _render(fig, *task, **options)
+      out.append(task[2])
+    return out
+  pool = multiprocessing.Pool(processes, _init_worker,
+                              (figsize, dpi, options))
+  try:
+    return list(pool.imap(_render_task, tasks, chunksize))
+  finally:
+    pool.terminate()
+    pool.join()
+
 
+def plot_grid(forecasts, ncols=4, sharey=False, figsize=None,
+              downsample=None, method='lttb'):
+  '''
+  Plots many forecasts as small multiples, one panel per forecast, in a
+  grid on one figure. Each panel shows the data, the mean forecast, the
+  prediction intervals and the test data, if provided.
 
+  Args:
+    forecasts: a dict, or an iterable of (id, object) pairs. Each object
+      is an R forecast, or a tuple of (forecast, data) or (forecast, data,
+      test), where the forecast is an R forecast or a Pandas Data Frame
+      from converters.prediction_intervals. Panels are titled with the ids.
+    ncols: Default 4. The number of panels in each row.
+    sharey: Default False. If True, all panels have the same y-axis.
+    figsize: Default None, for 3 x 2 inches per panel.
+    downsample: Default None, which plots every point. Otherwise the
+      most points to plot for the data and the test data in each panel,
+      or 'auto' for a limit from the panel width.
+    method: Default 'lttb'. The downsampling method, 'lttb' or 'minmax'.
+
+  Output:
+    a grid of forecast plots
+  '''
+  items = _grid_items(forecasts)
+  fig = plt.figure(figsize=figsize or _grid_size(len(items), ncols))
+  _draw_grid(fig, items, ncols, sharey, downsample, method)
+  plt.show()
+
+
+def save_grid(forecasts, file, ncols=4, sharey=False, format=None,
+              figsize=None, dpi=100, downsample=None, method='lttb'):
+  '''
+  Plots many forecasts as small multiples to an image file, without using
+  pyplot. See plot_grid.
+
+  Args:
+    forecasts: a dict, or an iterable of (id, object) pairs, as for
+      plot_grid
+    file: the file name, or an open file
+    ncols: Default 4. The number of panels in each row.
+    sharey: Default False. If True, all panels have the same y-axis.
+    format: Default None, which takes the format from the file extension.
+      Otherwise 'png' or 'svg'.
+    figsize: Default None, for 3 x 2 inches per panel.
+    dpi: Default 100. Resolution in dots per inch.
+    downsample: Default None, which plots every point. Otherwise the
+      most points to plot for the data and the test data in each panel,
+      or 'auto' for a limit from the panel width.
+    method: Default 'lttb'. The downsampling method, 'lttb' or 'minmax'.
+  '''
+  format = _format(file, format)
+  items = _grid_items(forecasts)
+  fig = new_figure(figsize or _grid_size(len(items), ncols), dpi)
+  with matplotlib.style.context('ggplot'):
+    _draw_grid(fig, items, ncols, sharey, downsample, method)
+    fig.savefig(file, format=format)
+
+
+def _grid_items(forecasts):
+  '''
+  Utility function that converts the forecasts for a grid plot into a
+  list of (id, forecast, data, test) tuples of Pandas objects.
+  '''
+  if isinstance(forecasts, dict):
+    forecasts = forecasts.items()
+  items = [(k,) + _forecast_args(obj) for (k, obj) in forecasts]
+  if not items:
+    raise ValueError('No forecasts provided')
+  return items
+
+
+def _grid_size(n, ncols):
+  ncols = min(ncols, n)
+  nrows = (n + ncols - 1) // ncols
+  return (3 * ncols, 2 * nrows)
+
+
+def _flat_indexes(indexes):
+  '''
+  Utility function that flattens many time series indexes at once, with
+  the same result as converters.flatten_index on each one. Each index is
+  taken to be regular, as made by converters.time_index.
+
+  Args:
+    indexes: a list of Pandas Index or MultiIndex objects
+
+  Returns:
+    a list of numpy float arrays of x-values, one per index
+  '''
+  lengths = numpy.array([len(idx) for idx in indexes])
+  starts = numpy.empty(len(indexes))
+  freqs = numpy.empty(len(indexes))
+  for (k, idx) in enumerate(indexes):
+    start, freq = converters.index_start(idx)
+    if freq > 1:
+      start = start[0] + (start[1] - 1) / float(freq)
+    starts[k], freqs[k] = start, freq
+  offsets = numpy.cumsum(lengths) - lengths
+  steps = numpy.arange(lengths.sum()) - numpy.repeat(offsets, lengths)
+  flat = numpy.repeat(starts, lengths) + steps / numpy.repeat(freqs, lengths)
+  return numpy.split(flat, numpy.cumsum(lengths)[:-1])
+
+
+def _interval_polygons(x, fc):
+  '''
+  Utility function that builds the polygons for all of the prediction
+  intervals in a forecast at once, as an array (levels x 2h x 2) of
+  vertices: along the upper bound, then back along the lower bound.
+  '''
+  lower = fc.values[:, 1::2].T
+  upper = fc.values[:, 2::2].T
+  nlevels = lower.shape[0]
+  verts = numpy.empty((nlevels, 2 * len(x), 2))
+  verts[:, :, 0] = numpy.concatenate([x, x[::-1]])
+  verts[:, :, 1] = numpy.hstack([upper, lower[:, ::-1]])
+  return verts
+
+
+def _draw_grid(fig, items, ncols, sharey, downsample, method):
+  '''
+  Utility function that draws (id, forecast, data, test) tuples as a grid
+  of small multiples on fig.
+  '''
+  n = len(items)
+  ncols = min(ncols, n)
+  nrows = (n + ncols - 1) // ncols
+  data_x = _flat_indexes([item[2].index for item in items])
+  fc_x = _flat_indexes([item[1].index for item in items])
+  first = None
+  for (k, (item_id, fc, data, test)) in enumerate(items):
+    ax = fig.add_subplot(nrows, ncols, k + 1,
+                         sharey=first if sharey else None)
+    if first is None:
+      first = ax
+    nlevels = (fc.shape[1] - 1) // 2
+    alphas = 0.5 / numpy.arange(1, nlevels + 1)
+    ax.add_collection(PolyCollection(
+      _interval_polygons(fc_x[k], fc), linewidths=0,
+      facecolors=[(0.5, 0.5, 0.5, a) for a in alphas]))
+    ax.plot(*_points(data_x[k], data.values, ax, downsample, method),
+            color='black', linewidth=0.8)
+    ax.plot(fc_x[k], fc.values[:, 0], color='blue', linewidth=0.8)
+    if test is not None:
+      h = min(len(fc_x[k]), len(test))
+      ax.plot(*_points(fc_x[k][:h], test.values[:h], ax, downsample,
+                       method), color='green', linewidth=0.8)
+    ax.autoscale_view()
+    ax.set_title(str(item_id), fontsize='small')
+    # Fewer ticks per panel keep the grid readable, and drawing ticks is
+    # most of the cost of a large grid.
+    ax.xaxis.set_major_locator(MaxNLocator(3))
+    ax.yaxis.set_major_locator(MaxNLocator(4))
+    ax.tick_params(labelsize='x-small')
+  fig.subplots_adjust(left=0.05, right=0.98, bottom=0.05, top=0.95,
+                      wspace=0.25, hspace=0.5)
@@ -0,0 +1,247 @@
+'''
+The quantile module makes quantile forecasts from a single model fit.
+The forecast mean and standard error are kept from one forecast, and any
+number of quantiles are computed from them in NumPy, instead of refitting
+the model for each prediction interval level. If the intervals of the
+forecast are not normal, as for some ets models, sample paths are drawn
+from the model once, and the quantiles are taken from them instead:
+
+  qf = quantile.fit(x, method='ets')
+  q = qf.quantiles(numpy.arange(1, 100) / 100.0)
+  loss = quantile.pinball_loss(q, actual, numpy.arange(1, 100) / 100.0)
+'''
+import numpy
+import pandas
+import converters
+import panel
+import simulation
+import validate
+import wrappers
+
+# The methods whose models can be simulated from, if their intervals are
+# not normal
+SIMULATED_METHODS = ('ets', 'arima', 'auto_arima')
+
+
+class QuantileForecast(object):
+  '''
+  A forecast that can produce any quantile at each step of the horizon.
+  The forecast distribution at each step is taken to be normal on the
+  scale of the Box-Cox transformation, if there is one, as it is for the
+  prediction intervals of arima and the simple methods in R Forecast.
+  If paths are given, the quantiles are taken from them instead.
+
+  Attributes:
+    mean: numpy array of the point forecast at each step, which is the
+      median if lam is set
+    se: numpy array of the standard error at each step, on the
+      transformed scale if lam is set
+    lam: the Box-Cox transformation parameter, or None
+    index: the index of the forecast period
+    paths: numpy array (paths x horizon) of sample paths, or None for a
+      normal distribution
+  '''
+
+  def __init__(self, mean, se, lam=None, index=None, paths=None):
+    self.mean = numpy.asarray(mean, dtype=float)
+    self.se = numpy.asarray(se, dtype=float)
+    if self.mean.shape != self.se.shape:
+      raise ValueError('mean and se must have the same length')
+    if paths is not None and paths.shape[1:] != self.mean.shape:
+      raise ValueError('paths must have one column per step')
+    self.lam = lam
+    if index is None:
+      index = numpy.arange(1, len(self.mean) + 1)
+    self.index = index
+    self.paths = paths
+
+  @classmethod
+  def from_forecast(cls, fc, lam=None, rtol=1e-6):
+    '''
+    Makes a QuantileForecast from a forecast with prediction intervals.
+    The standard error is recovered from the width of the intervals,
+    averaged over the levels. The intervals must be symmetric about the
+    mean on the transformed scale, as normal intervals are; for others,
+    such as those simulated for some ets models, use from_paths.
+
+    Args:
+      fc: an R forecast object, or a Pandas Data Frame laid out like the
+        output of converters.prediction_intervals
+      lam: Default None. The Box-Cox transformation parameter, if one was
+        used for the forecast. It is taken from an R forecast if present.
+      rtol: Default 1e-6. The relative tolerance for the intervals to be
+        taken as symmetric.
+
+    Returns:
+      a QuantileForecast
+
+    Raises:
+      ValueError: if the intervals are not symmetric about the mean
+    '''
+    fc, lam, se = _interval_se(fc, lam, rtol)
+    if se is None:
+      raise ValueError('Prediction intervals are not symmetric about the '
+                       'mean; use from_paths for their quantiles')
+    return cls(fc.point_fc.values, se, lam, fc.index)
+
+  @classmethod
+  def from_paths(cls, paths, mean=None, index=None):
+    '''
+    Makes a QuantileForecast from sample paths of the future of a series.
+
+    Args:
+      paths: numpy array (paths x horizon), as from simulation.paths
+      mean: Default None, for the mean of the paths. Otherwise, the point
+        forecast at each step.
+      index: Default None. The index of the forecast period.
+
+    Returns:
+      a QuantileForecast
+    '''
+    paths = numpy.asarray(paths)
+    if mean is None:
+      mean = paths.mean(axis=0)
+    return cls(mean, paths.std(axis=0), index=index, paths=paths)
+
+  def __len__(self):
+    return len(self.mean)
+
+  def __repr__(self):
+    return '<QuantileForecast: horizon %d>' % len(self)
+
+  def quantiles(self, probs):
+    '''
+    Computes quantiles of the forecast at every step.
+
+    Args:
+      probs: a number or sequence of probabilities, between 0 and 1
+
+    Returns:
+      numpy array (horizon x quantiles)
+    '''
+    probs = numpy.atleast_1d(numpy.asarray(probs, dtype=float))
+    if ((probs <= 0) | (probs >= 1)).any():
+      raise ValueError('probs must be between 0 and 1')
+    if self.paths is not None:
+      return simulation.quantiles(self.paths, probs)
+    z = panel._qnorm(probs)
+    if self.lam is None:
+      return self.mean[:, None] + self.se[:, None] * z[None, :]
+    center = panel._box_cox(self.mean, self.lam)
+    out = center[:, None] + self.se[:, None] * z[None, :]
+    return panel._inv_box_cox(out, self.lam)
+
+  def frame(self, probs):
+    '''
+    Makes a Data Frame of quantiles, with one column per probability.
+
+    Args:
+      probs: a number or sequence of probabilities, between 0 and 1
+
+    Returns:
+      a Pandas Data Frame indexed like the forecast
+    '''
+    probs = numpy.atleast_1d(numpy.asarray(probs, dtype=float))
+    return pandas.DataFrame(self.quantiles(probs), index=self.index,
+                            columns=list(probs))
+
+
+def _interval_se(fc, lam, rtol):
+  '''
+  Utility function that recovers the standard error at each step from
+  the width of the prediction intervals of a forecast, averaged over the
+  levels.
+
+  Returns:
+    3-tuple of the forecast as a Pandas Data Frame, the Box-Cox parameter
+    and the standard error, which is None if the intervals are not
+    symmetric about the mean on the transformed scale
+  '''
+  if validate.is_R_forecast(fc):
+    if lam is None and 'lambda' in fc.names:
+      value = fc.rx2('lambda')
+      if len(value) > 0:
+        lam = value[0]
+    fc = converters.prediction_intervals(fc)
+  elif not validate.is_Pandas_forecast(fc):
+    raise TypeError(
+      'Forecast must be R forecast object or Pandas DataFrame')
+  level = numpy.array([float(col[5:]) for col in fc.columns[1::2]])
+  center = fc.point_fc.values
+  lower = fc.values[:, 1::2]
+  upper = fc.values[:, 2::2]
+  if lam is not None:
+    center = panel._box_cox(center, lam)
+    lower = panel._box_cox(lower, lam)
+    upper = panel._box_cox(upper, lam)
+  above = upper - center[:, None]
+  below = center[:, None] - lower
+  atol = rtol * numpy.abs(center).max()
+  if not numpy.allclose(above, below, rtol=rtol, atol=atol):
+    return fc, lam, None
+  z = panel._qnorm(0.5 + level / 200)
+  return fc, lam, ((upper - lower) / (2 * z)).mean(axis=1)
+
+
+def fit(x, method='ets', h=None, lam=None, npaths=1000, seed=None,
+        **kwargs):
+  '''
+  Fits a model once and keeps its forecast mean and standard error. If
+  the prediction intervals of the forecast are not normal, as for ets
+  models with multiplicative parts, sample paths are drawn from the
+  fitted model instead, and quantiles are taken from them.
+
+  Args:
+    x: an R time series, obtained from converters.ts(), or a Pandas Series
+      with the correct index (e.g. from converters.sequence_as_series().
+    method: Default 'ets'. The name of a forecast function in wrappers
+      that makes prediction intervals, from wrappers.INTERVAL_METHODS.
+    h: Forecast horizon; default is 2 full periods of a periodic series,
+      or 10 steps for non-seasonal series.
+    lam: BoxCox transformation parameter. The default is None, for no
+      transformation.
+    npaths: default 1000; the number of sample paths to draw, if the
+      intervals are not normal.
+    seed: Default None. The random seed for the sample paths.
+    kwargs: other arguments for the forecast function
+
+  Returns:
+    a QuantileForecast
+  '''
+  if method not in wrappers.INTERVAL_METHODS:
+    raise ValueError('method must be one of %s' %
+                     (wrappers.INTERVAL_METHODS,))
+  x, _ = converters.to_ts(x)
+  h = wrappers._get_horizon(x, h)
+  if lam is not None:
+    kwargs['lam'] = lam
+  out = getattr(wrappers, method)(x, h=h, level=(80, 95), **kwargs)
+  fc, lam, se = _interval_se(out, lam, 1e-6)
+  if se is not None:
+    return QuantileForecast(fc.point_fc.values, se, lam, fc.index)
+  if method not in SIMULATED_METHODS:
+    raise ValueError('Prediction intervals of %s are not symmetric about '
+                     'the mean' % method)
+  paths = simulation.paths(out, h, npaths, seed=seed, dtype=float)
+  return QuantileForecast.from_paths(paths, fc.point_fc.values, fc.index)
+
+
+def pinball_loss(q, actual, probs):
+  '''
+  Computes the pinball (quantile) loss of quantile forecasts, averaged
+  over the horizon.
+
+  Args:
+    q: numpy array (horizon x quantiles) of quantile forecasts, as from
+      QuantileForecast.quantiles
+    actual: a sequence of the actual values over the horizon
+    probs: the probabilities of the quantiles in q
+
+  Returns:
+    numpy array with the loss for each quantile
+  '''
+  q = numpy.asarray(q, dtype=float)
+  actual = numpy.asarray(actual, dtype=float)[:, None]
+  probs = numpy.asarray(probs, dtype=float)[None, :]
+  err = actual - q
+  return numpy.mean(numpy.maximum(probs * err, (probs - 1) * err), axis=0)
@@ -0,0 +1,515 @@
+'''
+The search module selects models by fitting the candidates in parallel,
+across worker processes, and comparing them by an information criterion.
+Each worker process has its own R session, so the fits run at the same
+time, unlike the fits within a single call to R.
+'''
+import itertools
+import multiprocessing
+from timeit import default_timer
+import numpy
+import pandas
+from rpy2 import robjects
+from rpy2.robjects.packages import importr
+from rpy2.rinterface import RRuntimeError
+import converters
+import instrument
+import validate
+import wrappers
+
+fc = importr('forecast')
+stats = importr('stats')
+NULL = robjects.NULL
+
+ICS = ('aicc', 'aic', 'bic')
+
+# Fitted models are sent back from worker processes as serialized bytes
+_serialize = robjects.r('function(x) as.integer(serialize(x, NULL))')
+_unserialize = robjects.r('function(x) unserialize(as.raw(x))')
+
+# The series being fit in a worker process
+_worker_ts = None
+
+
+def _series_args(x):
+  '''
+  Utility function that reduces an R time series to picklable values,
+  so that it can be sent to worker processes.
+  '''
+  tsp = list(stats.tsp(x))
+  return numpy.array(x, dtype=float), tsp[0], tsp[2]
+
+
+def _init_worker(values, start, freq):
+  global _worker_ts
+  _worker_ts = stats.ts(robjects.FloatVector(values), start=start,
+                        frequency=freq)
+
+
+def _pool(processes, x):
+  '''
+  Utility function that starts a pool of worker processes for the series x.
+  '''
+  return multiprocessing.Pool(processes, _init_worker, _series_args(x))
+
+
+def _picklable(kwargs):
+  '''
+  Utility function that drops the arguments that are R's NULL, which is
+  the default in R for all of them, so that the rest can be sent to
+  worker processes.
+  '''
+  return dict((k, v) for (k, v) in kwargs.items() if v is not NULL)
+
+
+def _collect(results, time_budget):
+  '''
+  Utility function that gathers results from a pool, in order of
+  completion, until all are in or the time budget (in seconds) runs out.
+  '''
+  out = []
+  deadline = None
+  if time_budget is not None:
+    deadline = default_timer() + time_budget
+  while True:
+    timeout = None
+    if deadline is not None:
+      timeout = max(deadline - default_timer(), 0)
+    try:
+      out.append(results.next(timeout))
+    except (StopIteration, multiprocessing.TimeoutError):
+      return out
+
+
+def _arima_candidates(freq, max_p, max_q, max_P, max_Q, max_order):
+  '''
+  Utility function that lists the (p, q, P, Q) orders to try, simplest
+  first, so that the simple models are fit first under a time budget.
+  '''
+  if freq <= 1:
+    max_P = max_Q = 0
+  orders = [k for k in itertools.product(range(max_p + 1), range(max_q + 1),
+                                         range(max_P + 1), range(max_Q + 1))
+            if sum(k) <= max_order]
+  return sorted(orders, key=lambda k: (sum(k), k))
+
+
+def _arima_task(task):
+  '''
+  Fits one arima model in a worker process.
+
+  Returns:
+    3-tuple of the task, the value of the information criterion, which is
+    infinite if the fit fails, and the time taken in seconds
+  '''
+  order, seasonal, constant, ic, kwargs = task
+  start = default_timer()
+  try:
+    model = fc.Arima(_worker_ts, order=robjects.IntVector(order),
+                     seasonal=robjects.IntVector(seasonal),
+                     include_constant=constant, **kwargs)
+    value = model.rx2(ic)[0]
+  except RRuntimeError:
+    value = numpy.inf
+  return task, value, default_timer() - start
+
+
+@instrument.wrapper
+def arima(x, h=None, d=None, D=None, max_p=5, max_q=5, max_P=2, max_Q=2,
+          max_order=5, ic='aicc', lam=NULL, level=(80, 95), processes=None,
+          time_budget=None):
+  '''
+  Selects an arima model like auto.arima in R, by fitting every candidate
+  order in parallel across worker processes, and forecasts with the best
+  one. The orders of differencing are chosen first, as auto.arima does,
+  with the KPSS and OCSB tests. If a time budget is given, the search
+  stops when it runs out, and the best model fit so far is used. The
+  simplest models are fit first. When d + D is at most 1, each order is
+  fit both with and without a constant, as auto.arima does; otherwise
+  there is no constant.
+
+  Args:
+    x: an R time series, obtained from converters.ts(), or a Pandas Series
+      with the correct index (e.g. from converters.sequence_as_series().
+    h: Forecast horizon; default is 2 full periods of a periodic series,
+      or 10 steps for non-seasonal series.
+    d: Default None. Order of first differencing. If None, it is chosen
+      with the KPSS test.
+    D: Default None. Order of seasonal differencing. If None, it is chosen
+      with the OCSB test.
+    max_p: maximum value for non-seasonal AR order
+    max_q: maximum value for non-seasonal MA order
+    max_P: maximum value for seasonal AR order
+    max_Q: maximum value for seasonal MA order
+    max_order: maximum value of p + q + P + Q
+    ic: information criterion. Default is 'aicc' for bias-corrected AIC.
+      Other values are 'aic' for regular AIC, or 'bic' for BIC.
+    lam: BoxCox transformation parameter. The default is R's NULL value,
+      for no transformation.
+    level: A number or list/tuple of prediction interval confidence values.
+      Default is 80% and 95% intervals.
+    processes: Default None, for one worker process per CPU.
+    time_budget: Default None, for no limit. Otherwise, the most time in
+      seconds to spend fitting candidates.
+
+  Returns:
+    2-tuple of the forecast and a Pandas Data Frame of the candidates fit,
+    with their orders, whether they have a constant, information criterion
+    values and fit times, best first. If x is an R ts object, the forecast is an R forecast. If x is
+    a Pandas Series, it is a Pandas Data Frame.
+  '''
+  if ic not in ICS:
+    raise ValueError('ic must be one of %s' % (ICS,))
+  x, is_pandas = converters.to_ts(x)
+  freq = wrappers.frequency(x)
+  if d is None:
+    d = wrappers.ndiffs(x)
+  if D is None:
+    D = wrappers.nsdiffs(x) if freq > 1 else 0
+  constants = [True, False] if d + D <= 1 else [False]
+  kwargs = _picklable({'lambda' : lam})
+  tasks = [((p, d, q), (P, D, Q), constant, ic, kwargs)
+           for (p, q, P, Q) in _arima_candidates(freq, max_p, max_q, max_P,
+                                                 max_Q, max_order)
+           for constant in constants]
+  pool = _pool(processes, x)
+  try:
+    results = _collect(pool.imap_unordered(_arima_task, tasks), time_budget)
+  finally:
+    pool.terminate()
+    pool.join()
+  rows = [task[0] + task[1] + (task[2], value, seconds)
+          for (task, value, seconds) in results]
+  table = pandas.DataFrame(rows, columns=['p', 'd', 'q', 'P', 'D', 'Q',
+                                          'constant', ic, 'seconds'])
+  table = table.sort_values(ic).reset_index(drop=True)
+  if len(table) == 0 or not numpy.isfinite(table[ic][0]):
+    raise RuntimeError('No arima model could be fit')
+  best = table.iloc[0]
+  order = robjects.IntVector([int(best[k]) for k in ['p', 'd', 'q']])
+  seasonal = robjects.IntVector([int(best[k]) for k in ['P', 'D', 'Q']])
+  model = fc.Arima(x, order=order, seasonal=seasonal,
+                   include_constant=bool(best['constant']), **kwargs)
+  h = wrappers._get_horizon(x, h)
+  level = converters.map_arg(level)
+  out = fc.forecast(model, h=h, level=level)
+  return converters.forecast_out(out, is_pandas), table
+
+
+def _ets_candidates(model_spec, damped, freq, additive_only,
+                    allow_multiplicative_trend, positive):
+  '''
+  Utility function that lists the (model, damped) pairs to try, following
+  the rules of ets in R for a partly specified model_spec. Combinations
+  that R forbids, and multiplicative parts for data that are not all
+  positive, are left out. A seasonal part can only be chosen for
+  frequencies from 2 to 24, as in R.
+  '''
+  error, trend, season = model_spec
+  errors = ['A', 'M'] if error == 'Z' else [error]
+  trends = ['N', 'A'] if trend == 'Z' else [trend]
+  if trend == 'Z' and allow_multiplicative_trend:
+    trends.append('M')
+  seasons = ['N', 'A', 'M'] if season == 'Z' else [season]
+  if freq <= 1 or freq > 24:
+    if season not in 'NZ':
+      raise ValueError('A seasonal model needs a frequency from 2 to 24')
+    seasons = ['N']
+  dampeds = [True, False] if damped is NULL else [bool(damped)]
+  out = []
+  for (e, t, s, d) in itertools.product(errors, trends, seasons, dampeds):
+    if t == 'N' and d:
+      continue
+    if 'M' in (e, t, s) and (additive_only or not positive):
+      continue
+    if (e == 'A' and 'M' in (t, s)) or (t == 'M' and s == 'A'):
+      continue
+    out.append((e + t + s, d))
+  return out
+
+
+def _ets_task(task):
+  '''
+  Fits one ets model in a worker process.
+
+  Returns:
+    4-tuple of the task, a list of the aic, aicc and bic, which are
+    infinite if the fit fails, the time taken in seconds, and the fitted
+    model serialized as a numpy array of bytes, or None if the fit fails
+  '''
+  model, damped, kwargs = task
+  start = default_timer()
+  try:
+    fit = fc.ets(_worker_ts, model=model, damped=damped, **kwargs)
+    values = [fit.rx2(ic)[0] for ic in ICS]
+    data = numpy.array(_serialize(fit), dtype=numpy.uint8)
+  except RRuntimeError:
+    values = [numpy.inf] * len(ICS)
+    data = None
+  return task, values, default_timer() - start, data
+
+
+@instrument.wrapper
+def ets(x, h=None, model_spec='ZZZ', damped=NULL, alpha=NULL, beta=NULL,
+        gamma=NULL, phi=NULL, additive_only=False, lam=NULL, opt_crit='lik',
+        nmse=3, ic='aicc', allow_multiplicative_trend=False, level=(80, 95),
+        processes=None):
+  '''
+  Selects an exponential smoothing model like wrappers.ets, but fits the
+  candidate models in parallel across worker processes, instead of one
+  after another in R. The candidates are the error, trend, seasonal and
+  damping combinations allowed by model_spec and damped, and the best is
+  chosen by the information criterion ic. The best model is sent back
+  from its worker, so it is not fit again.
+
+  Args:
+    x: an R time series, obtained from converters.ts(), or a Pandas Series
+      with the correct index (e.g. from converters.sequence_as_series().
+    h: Forecast horizon; default is 2 full periods of a periodic series,
+      or 10 steps for non-seasonal series.
+    model_spec: Default is 'ZZZ'. A 3-letter string denoting the model
+      type, as for wrappers.ets. Each Z is tried with every allowed value.
+    damped: Default is NULL, which tries damped and undamped models.
+      If True or False, only damped or undamped models are tried.
+    alpha, beta, gamma, phi: Smoothing and damping parameters. The default
+      of NULL fits each of these values.
+    additive_only: Default False. If True, only try additive models.
+    lam: BoxCox transformation parameter. The default is R's NULL value,
+      for no transformation. If given, only additive models are tried.
+    opt_crit: Optimization criterion. Default is 'lik' for log-likelihood.
+      See wrappers.ets for other values.
+    nmse: number of steps in average MSE, if 'amse' is opt_crit.
+    ic: information criterion. Default is 'aicc' for bias-corrected AIC.
+      Other values are 'aic' for regular AIC, or 'bic' for BIC.
+    allow_multiplicative_trend: Default is False. If True, also try models
+      with a multiplicative trend.
+    level: A number or list/tuple of prediction interval confidence values.
+      Default is 80% and 95% intervals.
+    processes: Default None, for one worker process per CPU.
+
+  Returns:
+    3-tuple of the forecast, a Pandas Data Frame of the candidates, with
+    their aic, aicc and bic and fit times, best first, and the spec of
+    the best model, as from ets_spec. Candidates that could not be fit
+    have infinite scores. If x is an R ts object, the forecast is an R
+    forecast. If x is a Pandas Series, it is a Pandas Data Frame.
+  '''
+  if ic not in ICS:
+    raise ValueError('ic must be one of %s' % (ICS,))
+  if len(model_spec) != 3 or model_spec[0] not in 'AMZ' or \
+     any(k not in 'ANMZ' for k in model_spec[1:]):
+    raise ValueError('Invalid model_spec: %s' % model_spec)
+  x, is_pandas = converters.to_ts(x)
+  freq = wrappers.frequency(x)
+  positive = bool(numpy.nanmin(numpy.array(x)) > 0)
+  candidates = _ets_candidates(model_spec, damped, freq,
+                               additive_only or lam is not NULL,
+                               allow_multiplicative_trend, positive)
+  if not candidates:
+    raise ValueError('No ets model is allowed for this model_spec and data')
+  kwargs = _picklable({'alpha' : alpha, 'beta' : beta, 'gamma' : gamma,
+                       'phi' : phi, 'opt.crit' : opt_crit, 'nmse' : nmse,
+                       'lambda' : lam})
+  tasks = [(model, is_damped, kwargs) for (model, is_damped) in candidates]
+  pool = _pool(processes, x)
+  try:
+    results = pool.map(_ets_task, tasks)
+  finally:
+    pool.terminate()
+    pool.join()
+  rows = [(task[0], task[1]) + tuple(values) + (seconds,)
+          for (task, values, seconds, _) in results]
+  fits = dict(((task[0], task[1]), data)
+              for (task, values, seconds, data) in results)
+  table = pandas.DataFrame(rows, columns=['model', 'damped'] + list(ICS) +
+                                         ['seconds'])
+  table = table.sort_values(ic).reset_index(drop=True)
+  if not numpy.isfinite(table[ic][0]):
+    raise RuntimeError('No ets model could be fit')
+  best = table.iloc[0]
+  data = fits[(best['model'], bool(best['damped']))]
+  model = _unserialize(robjects.IntVector(data.tolist()))
+  h = wrappers._get_horizon(x, h)
+  level = converters.map_arg(level)
+  out = fc.forecast_ets(model, h, level=level)
+  return converters.forecast_out(out, is_pandas), table, ets_spec(model, ic)
+
+
+def ets_spec(model, ic='aicc'):
+  '''
+  Describes a fitted ets model as a dict of plain Python values.
+
+  Args:
+    model: an R ets model, as from ets, or an R forecast made from one
+    ic: Default 'aicc'. The information criterion to record.
+
+  Returns:
+    a dict with the model type (e.g. 'MAM'), whether the trend is damped,
+    the smoothing and damping parameters (par), the ic name and its value
+    (ic_value)
+  '''
+  if validate.is_R_forecast(model):
+    model = model.rx2('model')
+  components = list(model.rx2('components'))
+  par = model.rx2('par')
+  par = dict((k, v) for (k, v) in zip(par.names, par)
+             if k in ('alpha', 'beta', 'gamma', 'phi'))
+  return {'model' : ''.join(components[:3]),
+          'damped' : components[3] == 'TRUE',
+          'par' : par,
+          'ic' : ic,
+          'ic_value' : model.rx2(ic)[0]}
+
+
+def arima_spec(model, ic='aicc'):
+  '''
+  Describes a fitted arima model as a dict of plain Python values, which
+  can be stored and passed to warm_arima on the next refit.
+
+  Args:
+    model: an R Arima model, as from auto.arima, or an R forecast made
+      from one
+    ic: Default 'aicc'. The information criterion to record.
+
+  Returns:
+    a dict with the order (p, d, q), the seasonal order (P, D, Q), whether
+    the model has a constant, the ic name, its value (ic_value) and the
+    number of observations (nobs)
+  '''
+  if validate.is_R_forecast(model):
+    model = model.rx2('model')
+  arma = [int(k) for k in model.rx2('arma')]
+  names = model.rx2('coef').names
+  names = [] if names is NULL else list(names)
+  return {'order' : (arma[0], arma[5], arma[1]),
+          'seasonal' : (arma[2], arma[6], arma[3]),
+          'constant' : 'intercept' in names or 'drift' in names,
+          'ic' : ic,
+          'ic_value' : model.rx2(ic)[0],
+          'nobs' : int(model.rx2('nobs')[0])}
+
+
+def _diff(x, lag=1, differences=0):
+  if differences == 0:
+    return x
+  return robjects.r('diff')(x, lag=lag, differences=differences)
+
+
+def _check_diffs(x, d, D, freq):
+  '''
+  Utility function that checks whether the orders of differencing d and D
+  still hold for the series x, with the tests auto.arima uses, and
+  returns the orders to use. D is tested with one OCSB test. d is kept if
+  one KPSS test finds the series differenced d times to be stationary,
+  and, for d > 0, another finds it non-stationary when differenced d - 1
+  times. Otherwise d is chosen again with ndiffs.
+  '''
+  D_new = wrappers.nsdiffs(x) if freq > 1 else 0
+  x = _diff(x, freq, D_new)
+  if D_new == D:
+    enough = fc.ndiffs(_diff(x, 1, d), **{'max.d' : 1})[0] == 0
+    needed = d == 0 or fc.ndiffs(_diff(x, 1, d - 1), **{'max.d' : 1})[0] == 1
+    if enough and needed:
+      return d, D
+  return fc.ndiffs(x)[0], D_new
+
+
+@instrument.wrapper
+def warm_arima(x, previous=None, h=None, ic='aicc', tolerance=0.05,
+               lam=NULL, level=(80, 95), **kwargs):
+  '''
+  Refits an arima model on updated data, starting from the model selected
+  on the previous data, so that a weekly refit does not search the whole
+  order space again. The steps are:
+
+    1. If the cheap differencing tests of auto.arima find d and D as
+       before, the previous orders are refit. If the information
+       criterion per observation is no more than tolerance worse than
+       before, that model is kept.
+    2. Otherwise, auto.arima runs a stepwise search that starts at the
+       previous orders, with d and D fixed at their tested values.
+
+  Without a previous model, this runs auto.arima as usual.
+
+  Args:
+    x: an R time series, obtained from converters.ts(), or a Pandas Series
+      with the correct index (e.g. from converters.sequence_as_series().
+    previous: Default None. The previous model, as a dict from arima_spec
+      or the spec returned by an earlier call, or an R Arima model or
+      forecast.
+    h: Forecast horizon; default is 2 full periods of a periodic series,
+      or 10 steps for non-seasonal series.
+    ic: information criterion. Default is 'aicc' for bias-corrected AIC.
+      Other values are 'aic' for regular AIC, or 'bic' for BIC.
+    tolerance: Default 0.05. The largest increase in the information
+      criterion per observation for which the previous orders are kept.
+      This is roughly the relative increase in the residual variance.
+    lam: BoxCox transformation parameter. The default is R's NULL value,
+      for no transformation.
+    level: A number or list/tuple of prediction interval confidence values.
+      Default is 80% and 95% intervals.
+    kwargs: other arguments for auto.arima in R, such as max_p or
+      stepwise, with underscores for dots. If d or D is given, it is used
+      instead of the order of differencing from the tests, both for the
+      first fit and for a refit.
+
+  Returns:
+    2-tuple of the forecast and the spec of the model, as from
+    arima_spec, with a 'selection' key that is 'reused' if the previous
+    orders were kept, 'local' for a search from the previous orders, or
+    'full' for a search without a previous model. If x is an R ts object,
+    the forecast is an R forecast. If x is a Pandas Series, it is a
+    Pandas Data Frame.
+  '''
+  if ic not in ICS:
+    raise ValueError('ic must be one of %s' % (ICS,))
+  x, is_pandas = converters.to_ts(x)
+  d_fixed = kwargs.pop('d', None)
+  D_fixed = kwargs.pop('D', None)
+  kwargs = converters.translate_kwargs(**kwargs)
+  kwargs['lambda'] = lam
+  if previous is None:
+    if d_fixed is not None:
+      kwargs['d'] = d_fixed
+    if D_fixed is not None:
+      kwargs['D'] = D_fixed
+    model = fc.auto_arima(x, ic=ic, **kwargs)
+    selection = 'full'
+  else:
+    if not isinstance(previous, dict):
+      previous = arima_spec(previous, ic)
+    p, d, q = previous['order']
+    P, D, Q = previous['seasonal']
+    xt = x if lam is NULL else fc.BoxCox(x, lam)
+    d_new, D_new = d_fixed, D_fixed
+    if d_new is None or D_new is None:
+      d_test, D_test = _check_diffs(xt, d, D, wrappers.frequency(x))
+      d_new = d_test if d_new is None else d_new
+      D_new = D_test if D_new is None else D_new
+    model = None
+    selection = 'local'
+    if (d_new, D_new) == (d, D) and previous['ic'] == ic:
+      try:
+        model = fc.Arima(x, order=robjects.IntVector(previous['order']),
+                         seasonal=robjects.IntVector(previous['seasonal']),
+                         include_constant=previous['constant'],
+                         **{'lambda' : lam})
+      except RRuntimeError:
+        model = None
+      if model is not None:
+        before = previous['ic_value'] / previous['nobs']
+        after = model.rx2(ic)[0] / model.rx2('nobs')[0]
+        if after - before <= tolerance:
+          selection = 'reused'
+        else:
+          model = None
+    if model is None:
+      start = {'start.p' : p, 'start.q' : q, 'start.P' : P, 'start.Q' : Q}
+      start.update(kwargs)
+      model = fc.auto_arima(x, d=d_new, D=D_new, ic=ic, **start)
+  spec = arima_spec(model, ic)
+  spec['selection'] = selection
+  h = wrappers._get_horizon(x, h)
+  level = converters.map_arg(level)
+  out = fc.forecast_Arima(model, h, level=level)
+  return converters.forecast_out(out, is_pandas), spec
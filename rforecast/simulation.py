@@ -0,0 +1,261 @@
+'''
+The simulation module draws future sample paths from a fitted ets or
+arima model, for prediction intervals at any probability and for
+quantities that depend on the whole path, such as the total over the
+forecast horizon. Paths are simulated in R in chunks, so the memory
+needed at any one time is bounded by the chunk size. They can be kept in
+a compact float32 array, optionally memory-mapped to a file, or reduced
+to summaries chunk by chunk without keeping them:
+
+  paths = simulation.paths(x, h=12, npaths=100000, file='paths.dat')
+  out = simulation.summarize(x, h=12, npaths=100000, aggregates=['sum'])
+'''
+import numpy
+import pandas
+from rpy2 import robjects
+from rpy2.robjects.packages import importr
+import converters
+import validate
+
+fc = importr('forecast')
+NULL = robjects.NULL
+
+METHODS = ('ets', 'auto_arima')
+AGGREGATES = {'sum' : numpy.sum, 'mean' : numpy.mean,
+              'max' : numpy.max, 'min' : numpy.min}
+DEFAULT_QUANTILES = (0.025, 0.1, 0.5, 0.9, 0.975)
+
+# Histogram bins per horizon step for quantiles in summarize
+NUM_BINS = 2000
+
+_simulate = robjects.r('''
+  function(model, h, n, bootstrap, seed) {
+    if (!is.null(seed)) set.seed(seed)
+    as.numeric(replicate(n, as.numeric(simulate(model, nsim=h, future=TRUE,
+                                                bootstrap=bootstrap))))
+  }
+''')
+
+_future = robjects.r('''
+  function(model, h) {
+    x <- model$x
+    ts(numeric(h), start=tsp(x)[2] + 1 / frequency(x),
+       frequency=frequency(x))
+  }
+''')
+
+
+def fit(x, method='ets', **kwargs):
+  '''
+  Fits a model to simulate from.
+
+  Args:
+    x: an R time series, obtained from converters.ts(), or a Pandas Series
+      with the correct index (e.g. from converters.sequence_as_series().
+    method: Default 'ets'. The other option is 'auto_arima'.
+    kwargs: other arguments for R ets or auto.arima, with Python names
+
+  Returns:
+    an R model of class 'ets' or 'Arima'
+  '''
+  if method not in METHODS:
+    raise ValueError('method must be one of %s' % (METHODS,))
+  x, _ = converters.to_ts(x)
+  kwargs = converters.translate_kwargs(**kwargs)
+  if method == 'ets':
+    return fc.ets(x, **kwargs)
+  return fc.auto_arima(x, **kwargs)
+
+
+def _model(x, method, kwargs):
+  '''
+  Utility function that takes the model from a forecast, uses a model as
+  it is, or fits one to a series.
+  '''
+  if validate.is_R_forecast(x):
+    model = x.rx2('model')
+    if model is NULL:
+      raise ValueError('The forecast has no model to simulate from')
+    return model
+  if hasattr(x, 'rclass') and ('ets' in x.rclass or 'Arima' in x.rclass):
+    return x
+  return fit(x, method, **kwargs)
+
+
+def _chunks(model, h, npaths, chunk_size, bootstrap, seed):
+  '''
+  Utility function that simulates paths in chunks.
+
+  Returns:
+    a generator of numpy arrays (paths x horizon), with npaths rows in all
+  '''
+  if npaths < 1 or chunk_size < 1:
+    raise ValueError('npaths and chunk_size must be at least 1')
+  for (k, start) in enumerate(range(0, npaths, chunk_size)):
+    n = min(chunk_size, npaths - start)
+    chunk_seed = NULL if seed is None else seed + k
+    out = _simulate(model, h, n, bootstrap, chunk_seed)
+    yield numpy.array(out, dtype=float).reshape(n, h)
+
+
+def future_index(model, h):
+  '''
+  Makes the index for the h steps after the end of the series a model
+  was fit to.
+
+  Args:
+    model: an R model of class 'ets' or 'Arima'
+    h: the forecast horizon
+
+  Returns:
+    a Pandas Index of length h, like that of a forecast from wrappers
+  '''
+  return converters.ts_as_series(_future(model, h)).index
+
+
+def paths(x, h=10, npaths=1000, method='ets', bootstrap=False,
+          chunk_size=1000, seed=None, dtype=numpy.float32, file=None,
+          **kwargs):
+  '''
+  Draws sample paths of the future of a series from a fitted model.
+
+  Args:
+    x: an R time series or Pandas Series to fit a model to, or an R model
+      of class 'ets' or 'Arima', or an R forecast with such a model.
+    h: default 10; the number of steps in each path.
+    npaths: default 1000; the number of paths.
+    method: Default 'ets'. Used if x is a series, as for fit.
+    bootstrap: Default False. If True, errors are resampled from the
+      residuals instead of drawn from a normal distribution.
+    chunk_size: default 1000; the number of paths simulated per R call.
+    seed: Default None. If given, the random seed for the first chunk.
+      Chunk k uses seed + k, so the paths are the same for the same seed
+      and chunk size.
+    dtype: Default numpy.float32. The type of the returned array.
+    file: Default None. If given, the paths are written to a numpy memmap
+      at this path, which is returned, instead of being held in memory.
+    kwargs: other arguments for fit, if x is a series
+
+  Returns:
+    a numpy array (paths x horizon), or a numpy memmap if file is given
+  '''
+  model = _model(x, method, kwargs)
+  if file is None:
+    out = numpy.empty((npaths, h), dtype=dtype)
+  else:
+    out = numpy.memmap(file, dtype=dtype, mode='w+', shape=(npaths, h))
+  start = 0
+  for chunk in _chunks(model, h, npaths, chunk_size, bootstrap, seed):
+    out[start:start + len(chunk)] = chunk
+    start += len(chunk)
+  if file is not None:
+    out.flush()
+  return out
+
+
+def quantiles(paths, probs=DEFAULT_QUANTILES):
+  '''
+  Computes quantiles of sample paths at each step.
+
+  Args:
+    paths: numpy array (paths x horizon), as from paths
+    probs: the probabilities of the quantiles, between 0 and 1
+
+  Returns:
+    numpy array (horizon x quantiles)
+  '''
+  probs = numpy.atleast_1d(numpy.asarray(probs, dtype=float))
+  return numpy.percentile(paths, 100 * probs, axis=0).T
+
+
+def aggregate(paths, how='sum'):
+  '''
+  Reduces each sample path over the horizon, e.g. to its total.
+
+  Args:
+    paths: numpy array (paths x horizon), as from paths
+    how: Default 'sum'. Also 'mean', 'max' or 'min'.
+
+  Returns:
+    numpy array with one value per path
+  '''
+  if how not in AGGREGATES:
+    raise ValueError('how must be one of %s' % sorted(AGGREGATES))
+  return AGGREGATES[how](paths, axis=1)
+
+
+def _hist_quantiles(counts, lo, width, probs):
+  '''
+  Utility function that interpolates quantiles from histograms with
+  one row of counts per horizon step.
+  '''
+  h, nbins = counts.shape
+  cum = numpy.cumsum(counts, axis=1)
+  total = cum[:, -1:].astype(float)
+  target = probs[None, :] * total
+  out = numpy.empty((h, len(probs)))
+  for step in range(h):
+    b = numpy.searchsorted(cum[step], target[step], side='left')
+    b = numpy.minimum(b, nbins - 1)
+    below = numpy.where(b > 0, cum[step][b - 1], 0)
+    inside = numpy.maximum(counts[step][b], 1)
+    frac = numpy.clip((target[step] - below) / inside, 0, 1)
+    out[step] = lo[step] + (b + frac) * width[step]
+  return out
+
+
+def summarize(x, h=10, npaths=1000, probs=DEFAULT_QUANTILES,
+              aggregates=('sum',), method='ets', bootstrap=False,
+              chunk_size=1000, seed=None, bins=NUM_BINS, **kwargs):
+  '''
+  Simulates sample paths in chunks and reduces each chunk to summaries,
+  so that memory use does not grow with the number of paths beyond one
+  value per path for each aggregate. Quantiles of the path aggregates are
+  exact. Quantiles at each step are interpolated from histograms whose
+  range is set from the first chunk, to within one bin; values outside
+  that range are counted in the end bins.
+
+  Args:
+    x, h, npaths, method, bootstrap, chunk_size, seed, kwargs: as for paths
+    probs: the probabilities of the quantiles, between 0 and 1
+    aggregates: Default ('sum',). Reductions of each path over the
+      horizon to summarize, from 'sum', 'mean', 'max' and 'min'.
+    bins: default NUM_BINS; the number of histogram bins at each step.
+
+  Returns:
+    a dict with the mean at each step ('mean', a Pandas Series), the
+    quantiles at each step ('quantiles', a Pandas DataFrame with one
+    column per probability) and the quantiles of the aggregates
+    ('aggregates', a Pandas DataFrame with one row per aggregate)
+  '''
+  for how in aggregates:
+    if how not in AGGREGATES:
+      raise ValueError('aggregates must be from %s' % sorted(AGGREGATES))
+  probs = numpy.atleast_1d(numpy.asarray(probs, dtype=float))
+  model = _model(x, method, kwargs)
+  total = numpy.zeros(h)
+  counts = numpy.zeros((h, bins), dtype=numpy.int64)
+  agg = dict((how, []) for how in aggregates)
+  lo = width = None
+  for chunk in _chunks(model, h, npaths, chunk_size, bootstrap, seed):
+    if lo is None:
+      low, high = chunk.min(axis=0), chunk.max(axis=0)
+      span = numpy.maximum(high - low, 1e-8 * (1 + numpy.abs(high)))
+      lo = low - span
+      width = 3 * span / bins
+    total += chunk.sum(axis=0)
+    b = numpy.clip(((chunk - lo) / width).astype(int), 0, bins - 1)
+    b += numpy.arange(h) * bins
+    counts += numpy.bincount(b.ravel(), minlength=h * bins).reshape(h, bins)
+    for how in aggregates:
+      agg[how].append(aggregate(chunk, how))
+  idx = future_index(model, h)
+  cols = list(probs)
+  step_q = _hist_quantiles(counts, lo, width, probs)
+  agg_q = numpy.array([numpy.percentile(numpy.concatenate(agg[how]),
+                                        100 * probs)
+                       for how in aggregates]).reshape(-1, len(probs))
+  return {'mean' : pandas.Series(total / npaths, index=idx),
+          'quantiles' : pandas.DataFrame(step_q, index=idx, columns=cols),
+          'aggregates' : pandas.DataFrame(agg_q, index=list(aggregates),
+                                          columns=cols)}
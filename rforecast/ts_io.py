@@ -2,21 +2,34 @@
 ts_io.py handles reading time series into Pandas Series objects with the 
 index set up as used in RForecast.
 '''
+import time
+import numpy
 import pandas
 import converters
+import validate
+from collections import OrderedDict
 from rpy2 import robjects
 from rpy2.robjects.packages import importr
 from rpy2.rinterface import RRuntimeError
+try:
+  import pyarrow
+  import pyarrow.compute
+  import pyarrow.ipc
+  import pyarrow.parquet as parquet
+except ImportError:
+  pyarrow = None
 
 
-# TODO: if we accept msts, this will have to accept more than 3 columns
 def read_series(file):
   '''
   Function read_ts reads a csv file of a time series. Input file should have 
   1, 2, or 3 columns. If 1 column, it is data-only. If 2-columns, it is read 
   as a non-seasonal timeseries like: time, data. If 3-column, it is read as a 
   seasonal time series, e.g. year, month, data. Seasonal time series will be 
-  represented with a Series with a MultiIndex.
+  represented with a Series with a MultiIndex. Series with more than one 
+  seasonal period are read like seasonal series, indexed by the longest 
+  period, e.g. week, hour of week, data for hourly data. Pass the periods 
+  to converters.as_msts, or as seasonal_periods to wrappers.tbats.
   
   Args:
     file: a path or open file to the data
@@ -41,6 +54,78 @@ def read_series(file):
   return pandas.Series(data=data, index=index)
 
 
+def _long_series(df):
+  '''
+  Utility function for making a Pandas Series from the rows of a 
+  long-format file that belong to a single series.
+  
+  Args:
+    df: a Pandas DataFrame with columns id, time, data or 
+      id, period, step, data
+      
+  Returns:
+    a Pandas Series with the appropriate type of index for the type 
+    of data (seasonal/non-seasonal)
+  '''
+  ncols = df.shape[1]
+  if ncols == 3:
+    index = df.iloc[:, 1].values
+  else:
+    index = [df.iloc[:, 1].values, df.iloc[:, 2].values]
+  return pandas.Series(data=df.iloc[:, -1].values, index=index)
+
+
+def iter_series(file, chunksize=100000, header=None):
+  '''
+  Function iter_series reads a csv file holding many time series in long 
+  format, in chunks, and yields each series as soon as all of its rows 
+  have been read. Input file should have 3 or 4 columns. If 3 columns, 
+  they are read as id, time, data for non-seasonal series. If 4 columns, 
+  they are read as id, period, step, data for seasonal series, e.g. 
+  id, year, month, data. The rows for each id must be contiguous and in 
+  time order. Only one chunk and one series are held in memory at a time.
+  
+  Args:
+    file: a path or open file to the data
+    chunksize: Default 100000. The number of rows read at a time.
+    header: Default None, for no header row. Use 0 if the first row of 
+      the file has column names.
+    
+  Returns:
+    a generator of 2-tuples of the series id (as a string) and a Pandas 
+    Series with the data for that id and the appropriate type of index, 
+    like the output of read_series
+  '''
+  # The ids are read as strings, so that e.g. '007' is not read as 7, and
+  # the ids of a series split across chunks match
+  reader = pandas.read_csv(file, header=header, chunksize=chunksize,
+                           dtype={0 : str})
+  seen = set()
+  pending = None
+  for chunk in reader:
+    ncols = chunk.shape[1]
+    if ncols not in (3, 4):
+      raise IOError('File %s has wrong format' % file)
+    if pending is not None:
+      chunk = pandas.concat([pending, chunk], ignore_index=True)
+    ids = chunk.iloc[:, 0].astype(str).values
+    starts = numpy.concatenate(
+      [[0], numpy.flatnonzero(ids[1:] != ids[:-1]) + 1])
+    ends = numpy.concatenate([starts[1:], [len(ids)]])
+    for (start, end) in zip(starts[:-1], ends[:-1]):
+      series_id = ids[start]
+      if series_id in seen:
+        raise IOError('Rows for series %s are not contiguous' % series_id)
+      seen.add(series_id)
+      yield series_id, _long_series(chunk.iloc[start:end])
+    pending = chunk.iloc[starts[-1]:]
+  if pending is not None and len(pending) > 0:
+    series_id = str(pending.iloc[0, 0])
+    if series_id in seen:
+      raise IOError('Rows for series %s are not contiguous' % series_id)
+    yield series_id, _long_series(pending)
+
+
 def read_ts(ts_name, pkgname=None, as_pandas=True):
   '''
   Function reads a time series in from R. If needed, it can load a package 
@@ -55,11 +140,7 @@ def read_ts(ts_name, pkgname=None, as_pandas=True):
   Returns:
     the time series as an R time series or a Pandas Series
   '''
-  if pkgname is not None:
-    try:
-      importr(pkgname)
-    except RRuntimeError:
-      raise IOError('Package %s not found in R.' % pkgname)
+  _load_package(pkgname)
   try:
     tsout = robjects.r(ts_name)
   except RRuntimeError:
@@ -67,6 +148,508 @@ def read_ts(ts_name, pkgname=None, as_pandas=True):
   return converters.series_out(tsout, as_pandas)
 
 
+# Packages loaded, and datasets read by read_ts_many, in this process.
+_loaded_packages = set()
+_ts_cache = {}
+
+
+def _load_package(pkgname):
+  '''
+  Utility function that loads an R package, if it is not None and has not 
+  already been loaded by this module.
+  '''
+  if pkgname is None or pkgname in _loaded_packages:
+    return
+  try:
+    importr(pkgname)
+  except RRuntimeError:
+    raise IOError('Package %s not found in R.' % pkgname)
+  _loaded_packages.add(pkgname)
+
+
+def read_ts_many(ts_names, pkgname=None, as_pandas=True):
+  '''
+  Function reads several time series in from R at once. The package is 
+  loaded once, all of the series that have not been read before are 
+  fetched in a single R call, and the results are cached for the life of 
+  the process, so repeated calls are cheap.
+  
+  Args:
+    ts_names: a list of the names of the time series in R
+    pkgname: Default None. The name of an R package with the time series.
+    as_pandas: Default True. If true, return Pandas Series.
 
+  Returns:
+    a list of the time series, in the same order as ts_names, as R time 
+    series or Pandas Series. The Pandas Series are copies, so they can be 
+    modified without changing the cache.
+  '''
+  _load_package(pkgname)
+  missing = [name for name in ts_names if (pkgname, name) not in _ts_cache]
+  if missing:
+    fetched = _mget(robjects.StrVector(missing))
+    for (name, tsout) in zip(missing, fetched):
+      if tsout is robjects.NULL:
+        raise IOError('Time series %s not found in R.' % name)
+      _ts_cache[(pkgname, name)] = [tsout, None]
+  out = []
+  for name in ts_names:
+    entry = _ts_cache[(pkgname, name)]
+    if not as_pandas:
+      out.append(entry[0])
+      continue
+    if entry[1] is None:
+      entry[1] = converters.ts_as_series(entry[0])
+    out.append(entry[1].copy())
+  return out
+
+
+def clear_ts_cache():
+  '''
+  Empties the cache of time series read by read_ts_many.
+  '''
+  _ts_cache.clear()
+
+
+_mget = robjects.r('''
+  function(names) {
+    mget(names, envir=globalenv(), inherits=TRUE, ifnotfound=list(NULL))
+  }
+''')
+
+
+def _require_pyarrow():
+  if pyarrow is None:
+    raise ImportError('Reading and writing panels requires pyarrow')
+
+
+def _panel_items(panel):
+  '''
+  Utility function that iterates over a panel given as a dict of 
+  Pandas Series, a DataFrame with one column per series, or an 
+  iterable of (id, Series) pairs, as from iter_series.
+  '''
+  if isinstance(panel, (dict, pandas.DataFrame)):
+    return panel.items()
+  else:
+    return panel
+
+
+def _panel_table(items):
+  '''
+  Utility function for making an Arrow table with one row per series.
+  The values of each series are stored together in a list column, and 
+  the index is reduced to its start, frequency and length.
+  
+  Args:
+    items: a list of (id, Series) pairs
+    
+  Returns:
+    a pyarrow Table with columns id, start_period, start_step, frequency,
+    length and values
+  '''
+  ids, periods, steps, freqs, values = [], [], [], [], []
+  for (series_id, x) in items:
+    start, freq = converters.index_start(x.index)
+    if freq > 1:
+      period, step = start
+    else:
+      period, step = start, 1
+    ids.append(str(series_id))
+    periods.append(int(period))
+    steps.append(int(step))
+    freqs.append(int(freq))
+    values.append(numpy.asarray(x.values, dtype=numpy.float64))
+  lengths = numpy.array([len(v) for v in values], dtype=numpy.int32)
+  offsets = numpy.concatenate([[0], numpy.cumsum(lengths)]).astype(numpy.int32)
+  flat = numpy.concatenate(values) if values else numpy.zeros(0)
+  value_col = pyarrow.ListArray.from_arrays(pyarrow.array(offsets), 
+                                            pyarrow.array(flat))
+  names = ['id', 'start_period', 'start_step', 'frequency', 'length', 
+           'values']
+  cols = [pyarrow.array(ids, type=pyarrow.string()),
+          pyarrow.array(periods, type=pyarrow.int64()),
+          pyarrow.array(steps, type=pyarrow.int64()),
+          pyarrow.array(freqs, type=pyarrow.int64()),
+          pyarrow.array(lengths), value_col]
+  return pyarrow.Table.from_arrays(cols, names=names)
+
+
+def _table_panel(table):
+  '''
+  Utility function that is the inverse of _panel_table. It rebuilds each 
+  series, with its index, from an Arrow table with one row per series.
+  
+  Args:
+    table: a pyarrow Table, as from _panel_table
+    
+  Returns:
+    an OrderedDict mapping series ids to Pandas Series
+  '''
+  out = OrderedDict()
+  if table.num_rows == 0:
+    return out
+  col = table.column('values')
+  values = col.chunk(0) if col.num_chunks == 1 else pyarrow.concat_arrays(
+    col.chunks)
+  flat = values.flatten().to_numpy(zero_copy_only=False)
+  offsets = numpy.concatenate(
+    [[0], numpy.cumsum(table.column('length').to_numpy())])
+  meta = zip(table.column('id').to_pylist(), 
+             table.column('start_period').to_pylist(),
+             table.column('start_step').to_pylist(),
+             table.column('frequency').to_pylist())
+  for (k, (series_id, period, step, freq)) in enumerate(meta):
+    data = flat[offsets[k]:offsets[k + 1]]
+    start = (period, step) if freq > 1 else period
+    idx = converters.time_index(len(data), start=start, freq=freq)
+    out[series_id] = pandas.Series(data, index=idx)
+  return out
+
+
+def write_panel(panel, file, row_group_size=1024, format='parquet'):
+  '''
+  Function writes a panel of time series to a Parquet or Arrow file with 
+  one row per series. The values of each series are stored contiguously, 
+  and the index is stored as start, frequency and length, rather than as 
+  a column. Series are written in groups of row_group_size, so an 
+  iterator of series, such as the output of iter_series, is never held 
+  in memory all at once.
+  
+  Args:
+    panel: a dict of Pandas Series, a DataFrame with one column per 
+      series, or an iterable of (id, Series) pairs, as from iter_series
+    file: a path to write to
+    row_group_size: Default 1024. The number of series in each row group.
+    format: Default 'parquet'. The other option is 'arrow', for the Arrow 
+      IPC file format, which can be memory-mapped when read.
+      
+  Returns:
+    the number of series written
+  '''
+  _require_pyarrow()
+  if format not in ('parquet', 'arrow'):
+    raise ValueError("format must be 'parquet' or 'arrow'")
+  writer = None
+  count = 0
+  batch = []
+  try:
+    for item in _panel_items(panel):
+      batch.append(item)
+      if len(batch) == row_group_size:
+        writer = _write_batch(writer, batch, file, format)
+        count += len(batch)
+        batch = []
+    if batch or writer is None:
+      writer = _write_batch(writer, batch, file, format)
+      count += len(batch)
+  finally:
+    if writer is not None:
+      writer.close()
+  return count
+
+
+def _write_batch(writer, batch, file, format):
+  '''
+  Utility function for write_panel that writes one group of series, 
+  opening the writer if needed.
+  '''
+  table = _panel_table(batch)
+  if writer is None:
+    if format == 'parquet':
+      writer = parquet.ParquetWriter(file, table.schema)
+    else:
+      writer = pyarrow.RecordBatchFileWriter(file, table.schema)
+  if format == 'parquet':
+    writer.write_table(table)
+  else:
+    for record_batch in table.to_batches():
+      writer.write_batch(record_batch)
+  return writer
+
+
+def read_panel(file, ids=None, format='parquet'):
+  '''
+  Function reads a panel of time series written by write_panel. 
+  Optionally, only the series with the given ids are read. For Parquet 
+  files, row groups that do not contain any of those ids are skipped.
+  Arrow files are memory-mapped, so only the selected series are copied.
+  
+  Args:
+    file: a path to the data
+    ids: Default None, to read every series. Otherwise, a list of the 
+      ids of the series to read.
+    format: Default 'parquet'. The other option is 'arrow', for the Arrow 
+      IPC file format.
+      
+  Returns:
+    an OrderedDict mapping series ids to Pandas Series, in file order
+  '''
+  _require_pyarrow()
+  if ids is not None:
+    ids = [str(k) for k in ids]
+  if format == 'parquet':
+    filters = None if ids is None else [('id', 'in', ids)]
+    table = parquet.read_table(file, filters=filters)
+  elif format == 'arrow':
+    source = pyarrow.memory_map(file, 'r')
+    table = pyarrow.ipc.open_file(source).read_all()
+    if ids is not None:
+      mask = pyarrow.compute.is_in(table.column('id'), 
+                                   value_set=pyarrow.array(ids))
+      table = table.filter(mask)
+  else:
+    raise ValueError("format must be 'parquet' or 'arrow'")
+  return _table_panel(table)
+
+
+def write_store(panel, path):
+  '''
+  Function writes a panel of time series to a binary store that can be 
+  opened with SeriesStore. The store has two files: path.bin holds the 
+  values of all of the series, back to back, as float64, and path.idx is 
+  a csv file with one row per series, holding its id (as a string), 
+  offset, length, start and frequency. The series are streamed to disk 
+  one at a time.
+  
+  Args:
+    panel: a dict of Pandas Series, a DataFrame with one column per 
+      series, or an iterable of (id, Series) pairs, as from iter_series
+    path: the path of the store, without the .bin or .idx extension
+    
+  Returns:
+    the number of series written
+  '''
+  rows = []
+  offset = 0
+  with open(path + '.bin', 'wb') as f:
+    for (series_id, x) in _panel_items(panel):
+      start, freq = converters.index_start(x.index)
+      if freq > 1:
+        period, step = start
+      else:
+        period, step = start, 1
+      data = numpy.asarray(x.values, dtype='<f8')
+      data.tofile(f)
+      rows.append((str(series_id), offset, len(data), period, step, freq))
+      offset += len(data)
+  cols = ['id', 'offset', 'length', 'start_period', 'start_step', 'frequency']
+  pandas.DataFrame(rows, columns=cols).to_csv(path + '.idx', index=False)
+  return len(rows)
+
+
+class SeriesStore(object):
+  '''
+  Read-only access to a binary store written by write_store. The values 
+  file is opened with numpy.memmap, so series are read from disk only 
+  when they are used, and worker processes that open the same store share 
+  its pages through the OS page cache. Only the index is parsed on open.
+  Ids are stored as strings, and series can be looked up by any id with
+  the same string form, so a series written with id 1 is store[1] or
+  store['1'].
+  
+  Attributes:
+    ids: list of the ids (as strings) of the series in the store, in file
+      order
+  '''
+
+  def __init__(self, path):
+    '''
+    Args:
+      path: the path of the store, without the .bin or .idx extension
+    '''
+    index = pandas.read_csv(path + '.idx', dtype={'id' : str})
+    self.ids = list(index['id'])
+    self._index = dict(zip(self.ids, zip(index['offset'], index['length'], 
+                                         index['start_period'],
+                                         index['start_step'], 
+                                         index['frequency'])))
+    if index['length'].sum() > 0:
+      self._data = numpy.memmap(path + '.bin', dtype='<f8', mode='r')
+    else:
+      self._data = numpy.zeros(0)
+
+  def __len__(self):
+    return len(self.ids)
+
+  def __contains__(self, series_id):
+    return str(series_id) in self._index
+
+  def __getitem__(self, series_id):
+    return self.get(series_id)
+
+  def values(self, series_id):
+    '''
+    Gets the values of one series as a read-only view on the store, 
+    without making a copy.
+    
+    Args:
+      series_id: the id of the series
+      
+    Returns:
+      a numpy array backed by the memory-mapped file
+    '''
+    if series_id not in self:
+      raise KeyError('Series %s is not in the store' % series_id)
+    offset, length = self._index[str(series_id)][:2]
+    return self._data[offset:offset + length]
+
+  def get(self, series_id, as_pandas=True):
+    '''
+    Gets one series from the store.
+    
+    Args:
+      series_id: the id of the series
+      as_pandas: Default True. If true, return a Pandas Series, 
+        otherwise return an R time series.
+        
+    Returns:
+      the series as a Pandas Series or an R time series
+    '''
+    data = self.values(series_id)
+    _, length, period, step, freq = self._index[str(series_id)]
+    start = (int(period), int(step)) if freq > 1 else int(period)
+    if as_pandas:
+      idx = converters.time_index(length, start=start, freq=freq)
+      return pandas.Series(data, index=idx, copy=False)
+    else:
+      return converters.ts(data, start=start, frequency=int(freq))
+
+  def items(self, ids=None, as_pandas=True):
+    '''
+    Iterates over series in the store.
+    
+    Args:
+      ids: Default None, for every series. Otherwise, the ids of the 
+        series to get, e.g. one worker's shard of store.ids.
+      as_pandas: Default True. If true, yield Pandas Series, 
+        otherwise yield R time series.
+        
+    Returns:
+      a generator of 2-tuples of the series id and the series
+    '''
+    if ids is None:
+      ids = self.ids
+    for series_id in ids:
+      yield series_id, self.get(series_id, as_pandas)
+
+
+class ForecastWriter(object):
+  '''
+  Streams forecasts to a csv or Parquet file in long format, with one row 
+  per series and horizon step. The columns are series_id, horizon, period, 
+  season (1 for non-seasonal series), point_fc and the lower/upper columns 
+  from converters.prediction_intervals. Rows are buffered and written out 
+  as soon as row_group_size rows have accumulated, and also whenever 
+  flush_seconds have passed since the last write, so the full set of 
+  results is never held in memory. Use it as a context manager, or call close() when done.
+  '''
+
+  def __init__(self, path, format='csv', row_group_size=65536, 
+               flush_seconds=None):
+    '''
+    Args:
+      path: the path of the output file
+      format: Default 'csv'. The other option is 'parquet'.
+      row_group_size: Default 65536. The most rows buffered before writing.
+      flush_seconds: Default None. If given, buffered rows are also written 
+        by the first call to write after this many seconds since the last 
+        flush.
+    '''
+    if format not in ('csv', 'parquet'):
+      raise ValueError("format must be 'csv' or 'parquet'")
+    if format == 'parquet':
+      _require_pyarrow()
+    self.path = path
+    self.format = format
+    self.row_group_size = row_group_size
+    self.flush_seconds = flush_seconds
+    self.rows_written = 0
+    self._columns = None
+    self._buffer = []
+    self._nbuffered = 0
+    self._last_flush = time.time()
+    self._file = None
+    self._writer = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def write(self, series_id, fc):
+    '''
+    Adds the forecast for one series to the output.
+    
+    Args:
+      series_id: the id of the series
+      fc: an R forecast object, or a Pandas Data Frame from 
+        converters.prediction_intervals
+    '''
+    if validate.is_R_forecast(fc):
+      fc = converters.prediction_intervals(fc)
+    elif not validate.is_Pandas_forecast(fc):
+      raise TypeError('Forecast must be R forecast object or Pandas DataFrame')
+    if self._columns is None:
+      self._columns = list(fc.columns)
+    elif list(fc.columns) != self._columns:
+      raise ValueError('All forecasts must have the same prediction intervals')
+    h = len(fc)
+    if fc.index.nlevels == 2:
+      period = fc.index.get_level_values(0)
+      season = fc.index.get_level_values(1)
+    else:
+      period = fc.index
+      season = numpy.ones(h, dtype=int)
+    block = pandas.DataFrame({'series_id' : [str(series_id)] * h,
+                              'horizon' : numpy.arange(1, h + 1),
+                              'period' : numpy.asarray(period, dtype=int),
+                              'season' : numpy.asarray(season, dtype=int)})
+    for col in self._columns:
+      block[col] = fc[col].values
+    self._buffer.append(block)
+    self._nbuffered += h
+    if self._nbuffered >= self.row_group_size:
+      self.flush()
+    elif (self.flush_seconds is not None 
+          and time.time() - self._last_flush >= self.flush_seconds):
+      self.flush()
 
+  def flush(self):
+    '''
+    Writes any buffered rows out to the file.
+    '''
+    self._last_flush = time.time()
+    if not self._buffer:
+      return
+    df = pandas.concat(self._buffer, ignore_index=True)
+    cols = ['series_id', 'horizon', 'period', 'season'] + self._columns
+    df = df[cols]
+    self._buffer = []
+    self._nbuffered = 0
+    if self.format == 'csv':
+      if self._file is None:
+        self._file = open(self.path, 'w')
+        df.to_csv(self._file, index=False)
+      else:
+        df.to_csv(self._file, index=False, header=False)
+      self._file.flush()
+    else:
+      table = pyarrow.Table.from_pandas(df, preserve_index=False)
+      if self._writer is None:
+        self._writer = parquet.ParquetWriter(self.path, table.schema)
+      self._writer.write_table(table)
+    self.rows_written += len(df)
 
+  def close(self):
+    '''
+    Writes any buffered rows and closes the file.
+    '''
+    self.flush()
+    if self._file is not None:
+      self._file.close()
+      self._file = None
+    if self._writer is not None:
+      self._writer.close()
+      self._writer = None
@@ -1,6 +1,14 @@
 from rpy2 import robjects
 from rbase import cls, dim, colnames
 import pandas
+
+try:
+  _string_types = basestring
+except NameError:
+  _string_types = str
+
+def is_string(x):
+  return isinstance(x, _string_types)
     
 def is_R_forecast(fc):
   return type(fc) is robjects.ListVector and 'forecast' in cls(fc)
@@ -20,6 +28,11 @@ def is_Pandas_decomposition(dc):
   return (type(dc) is pandas.DataFrame and dc.shape[1] == 4 
           and len(set(dc.columns).intersection(col_names)) == 4)
 
+def is_Panel_decomposition(dc):
+  col_names = [u'data', u'seasonal', u'trend', u'remainder']
+  return (type(dc) is pandas.DataFrame and dc.columns.nlevels == 2 
+          and set(dc.columns.get_level_values(1)) == set(col_names))
+
 def is_decomposition(dc):
   return is_Pandas_decomposition(dc) or is_R_decomposition
 
@@ -36,6 +49,9 @@ def is_R_accuracy(acc):
 def is_R_ts(x):
   return type(x) is robjects.FloatVector and 'ts' in cls(x)
 
+def is_R_msts(x):
+  return is_R_ts(x) and 'msts' in cls(x)
+
 def is_R_matrix(x):
   return type(x) is robjects.Matrix and 'matrix' in cls(x)
   
@@ -7,13 +7,27 @@ from rpy2.robjects.packages import importr
 import numpy
 import converters
 import validate
+import instrument
+import rbase
 import itertools
+import hashlib
+from collections import OrderedDict
 
 fc = importr('forecast')
 stats = importr('stats')
 NULL = robjects.NULL
 NA = robjects.NA_Real
 
+# The forecast functions that take a level argument and return
+# prediction intervals
+INTERVAL_METHODS = ('meanf', 'thetaf', 'naive', 'snaive', 'rwf', 'ses',
+                    'holt', 'hw', 'ets', 'arima', 'auto_arima', 'stlf',
+                    'tbats', 'bats', 'stlm')
+
+# The most STL decompositions kept by stl and stlf when cache=True
+STL_CACHE_SIZE = 256
+_stl_cache = OrderedDict()
+
 
 def frequency(x):
   '''
@@ -50,6 +64,7 @@ def _get_horizon(x, h=None):
     return 10
 
 
+@instrument.wrapper
 def meanf(x, h=10, level=(80,95), lam=NULL):
   '''
   Perform a mean forecast on the provided data by calling meanf() 
@@ -75,6 +90,7 @@ def meanf(x, h=10, level=(80,95), lam=NULL):
   return converters.forecast_out(out, is_pandas)
   
 
+@instrument.wrapper
 def thetaf(x, h=10, level=(80, 95)):
   '''
   Perform a theta forecast on the provided data by calling thetaf() 
@@ -100,6 +116,7 @@ def thetaf(x, h=10, level=(80, 95)):
   return converters.forecast_out(out, is_pandas)
 
 
+@instrument.wrapper
 def naive(x, h=10, level=(80, 95), lam=NULL):
   '''
   Perform a naive forecast on the provided data by calling naive() 
@@ -126,6 +143,7 @@ def naive(x, h=10, level=(80, 95), lam=NULL):
   return converters.forecast_out(out, is_pandas)
   
 
+@instrument.wrapper
 def snaive(x, h=None, level=(80, 95), lam=NULL):
   '''
   Perform a seasonal naive forecast on the provided data by calling 
@@ -155,6 +173,7 @@ def snaive(x, h=None, level=(80, 95), lam=NULL):
   return converters.forecast_out(out, is_pandas)
   
 
+@instrument.wrapper
 def rwf(x, h=10, drift=False, level=(80, 95), lam=NULL):
   '''
   Perform a random walk forecast on the provided data by calling 
@@ -182,6 +201,34 @@ def rwf(x, h=10, drift=False, level=(80, 95), lam=NULL):
   return converters.forecast_out(out, is_pandas)
 
 
+@instrument.wrapper
+def croston(x, h=10, alpha=0.1):
+  '''
+  Forecasts a series of intermittent demand with Croston's method, by
+  calling croston() from R Forecast. Simple exponential smoothing is
+  applied separately to the non-zero demands and to the intervals between
+  them, and the forecast is the ratio of the two. There are no prediction
+  intervals, so the output only has the point forecast. For a whole panel
+  of series at once, see panel.croston.
+
+  Args:
+    x: an R time series, obtained from converters.ts(), or a Pandas Series
+      with the correct index (e.g. from converters.sequence_as_series().
+      The values should be non-negative.
+    h: default 10; the forecast horizon.
+    alpha: default 0.1; the smoothing parameter for the demands and the
+      intervals.
+
+  Returns:
+    If x is an R ts object, an R forecast is returned. If x is a Pandas 
+    Series, a Pandas Data Frame with a point_fc column is returned.
+  '''
+  x, is_pandas = converters.to_ts(x)
+  out = fc.croston(x, h, alpha=alpha)
+  return converters.forecast_out(out, is_pandas)
+
+
+@instrument.wrapper
 def ses(x, h=10, level=(80, 95), alpha=NULL, lam=NULL):
   '''
   Generate a simple exponential smoothing forecast for the time series x.
@@ -215,6 +262,7 @@ def ses(x, h=10, level=(80, 95), alpha=NULL, lam=NULL):
   return converters.forecast_out(out, is_pandas)
 
 
+@instrument.wrapper
 def holt(x, h=10, level=(80, 95), alpha=NULL, beta=NULL, lam=NULL):
   '''
   Generates a forecast using Holt's exponential smoothing method.
@@ -254,6 +302,7 @@ def holt(x, h=10, level=(80, 95), alpha=NULL, beta=NULL, lam=NULL):
   return converters.forecast_out(out, is_pandas)
 
 
+@instrument.wrapper
 def hw(x, h=None, level=(80, 95), alpha=NULL, beta=NULL, gamma=NULL, lam=NULL):
   '''
   Generates a forecast using Holt-Winter's exponential smoothing.
@@ -300,6 +349,7 @@ def hw(x, h=None, level=(80, 95), alpha=NULL, beta=NULL, gamma=NULL, lam=NULL):
   return converters.forecast_out(out, is_pandas)
 
 
+@instrument.wrapper
 def forecast(x, h=None, **kwargs):
   '''
   Generate a forecast for the time series x, using ets if x is non-seasonal 
@@ -334,6 +384,7 @@ def forecast(x, h=None, **kwargs):
   return converters.forecast_out(out, is_pandas)
 
 
+@instrument.wrapper
 def ets(x, h=None, model_spec='ZZZ', damped=NULL, alpha=NULL, 
         beta=NULL, gamma=NULL, phi=NULL, additive_only=False, lam=NULL,
         opt_crit='lik', nmse=3, ic='aicc', allow_multiplicative_trend=False,
@@ -399,6 +450,7 @@ def ets(x, h=None, model_spec='ZZZ', damped=NULL, alpha=NULL,
   return converters.forecast_out(out, is_pandas)
   
   
+@instrument.wrapper
 def arima(x, h=None, level=(80,95), order=(0,0,0), seasonal=(0,0,0), 
          lam=NULL, **kwargs):
   '''
@@ -447,11 +499,13 @@ def arima(x, h=None, level=(80,95), order=(0,0,0), seasonal=(0,0,0),
    
 
 # TODO: convert xreg and newxreg if needed
+@instrument.wrapper
 def auto_arima(x, h=None, d=NA, D=NA, max_p=5, max_q=5, max_P=2, max_Q=2,
                max_order=5, max_d=2, max_D=1, start_p=2, start_q=2, 
                start_P=1, start_Q=1, stationary=False, seasonal=True, 
                ic='aicc', xreg=NULL, newxreg=NULL, test='kpss', 
-               seasonal_test='ocsb', lam=NULL, level=(80, 95)):
+               seasonal_test='ocsb', lam=NULL, level=(80, 95), stepwise=True,
+               approximation=None, parallel=False, num_cores=2, trace=False):
   '''
   Use the auto.arima function from the R Forecast package to automatically 
   select an arima model order, fit the model to the provided data, and 
@@ -495,6 +549,17 @@ def auto_arima(x, h=None, d=NA, D=NA, max_p=5, max_q=5, max_P=2, max_Q=2,
         transformation is applied before forecasting and inverted after.
     level : A number or list/tuple of prediction interval confidence values.
       Default is 80% and 95% intervals.
+    stepwise : Default is True, for R's fast stepwise search. If False,
+        all models within the limits are fit, which is much slower.
+    approximation : If True, models are selected by approximate
+        likelihoods, and the final model is refit exactly. Default is None,
+        which leaves the choice to R: True for series longer than 150 or
+        with frequency above 12.
+    parallel : Default is False. If True and stepwise is False, the models
+        are fit in parallel in R.
+    num_cores : Default 2. Number of cores used in R if parallel is True.
+        If NULL, R uses all available cores.
+    trace : Default is False. If True, R prints each model considered.
       
   Returns:
     If x is an R ts object, an R forecast is returned. If x is a Pandas 
@@ -505,7 +570,11 @@ def auto_arima(x, h=None, d=NA, D=NA, max_p=5, max_q=5, max_P=2, max_Q=2,
             'max.Q' : max_Q, 'max.order' : max_order, 'max.d' : max_d, 
             'max.D' : max_D, 'start.p' : start_p, 'start.q' : start_q, 
             'start.P' : start_P, 'start.Q' : start_Q, 
-            'seasonal.test' : seasonal_test, 'lambda' : lam}
+            'seasonal.test' : seasonal_test, 'lambda' : lam,
+            'stepwise' : stepwise, 'parallel' : parallel,
+            'num.cores' : num_cores, 'trace' : trace}
+  if approximation is not None:
+    kwargs['approximation'] = approximation
   if (xreg is NULL) != (newxreg is NULL):
     raise ValueError(
         'Specifiy both xreg and newxreg or neither.')
@@ -522,8 +591,10 @@ def auto_arima(x, h=None, d=NA, D=NA, max_p=5, max_q=5, max_P=2, max_Q=2,
   return converters.forecast_out(out, is_pandas)
 
 
+@instrument.wrapper
 def stlf(x, h=None, s_window=7, robust=False, lam=NULL, method='ets', 
-         etsmodel='ZZZ', xreg=NULL, newxreg=NULL, level=(80, 95)):
+         etsmodel='ZZZ', xreg=NULL, newxreg=NULL, level=(80, 95),
+         cache=False):
   '''
   Constructs a forecast of a seasonal time series by seasonally decomposing 
   it using an STL decomposition, then making a non-seasonal forecast on the 
@@ -533,7 +604,10 @@ def stlf(x, h=None, s_window=7, robust=False, lam=NULL, method='ets',
   Args:
     x: an R time series, obtained from converters.ts(), or a Pandas Series
       with the correct index (e.g. from converters.sequence_as_series().
-      For this forecast method, x should be seasonal.
+      For this forecast method, x should be seasonal. x may also be an
+      existing STL decomposition, as an R 'stl' object or a Pandas Data
+      Frame from stl, in which case it is not decomposed again, and
+      s_window and robust are ignored.
     h : Forecast horizon; default is 2 full periods of a periodic series
     s.window : either 'periodic' or the span (in lags) of the 
       loess window for seasonal extraction, which should be odd.
@@ -556,22 +630,85 @@ def stlf(x, h=None, s_window=7, robust=False, lam=NULL, method='ets',
       fitting, then they must be supplied for the forecast period as newxreg.
     level : A number or list/tuple of prediction interval confidence values.
       Default is 80% and 95% intervals.
+    cache : Default False. If True, the decomposition is taken from, or
+      added to, the cache used by stl. The cache is not used with lam.
       
   Returns:
-    If x is an R ts object, an R forecast is returned. If x is a Pandas 
-    Series, a Pandas Data Frame is returned.
+    If x is an R ts object or decomposition, an R forecast is returned.
+    If x is a Pandas Series or Data Frame, a Pandas Data Frame is returned.
   '''
-  x, is_pandas = converters.to_ts(x)
-  h = _get_horizon(x, h)
-  kwargs = {'s.window' : s_window,
-            'lambda' : lam}
   level = converters.map_arg(level)
-  out = fc.stlf(x, h, level=level, robust=robust, method=method, 
-                       etsmodel=etsmodel, xreg=xreg, newxreg=newxreg, **kwargs)
+  if validate.is_R_decomposition(x) or validate.is_Pandas_decomposition(x):
+    is_pandas = validate.is_Pandas_decomposition(x)
+    if is_pandas and x.trend.isnull().any():
+      raise ValueError('stlf requires an STL decomposition')
+    decomp = converters.decomposition_as_stl(x) if is_pandas else x
+    if 'stl' not in rbase.cls(decomp):
+      raise ValueError('stlf requires an STL decomposition')
+  else:
+    x, is_pandas = converters.to_ts(x)
+    if not cache or lam is not NULL:
+      h = _get_horizon(x, h)
+      kwargs = {'s.window' : s_window,
+                'lambda' : lam}
+      out = fc.stlf(x, h, level=level, robust=robust, method=method,
+                    etsmodel=etsmodel, xreg=xreg, newxreg=newxreg, **kwargs)
+      return converters.forecast_out(out, is_pandas)
+    decomp = _cached_stl(x, s_window, robust=robust)
+  h = _get_horizon(decomp.rx2('time.series'), h)
+  out = fc.forecast_stl(decomp, method=method, etsmodel=etsmodel, h=h,
+                        level=level, xreg=xreg, newxreg=newxreg,
+                        **{'lambda' : lam})
   return converters.forecast_out(out, is_pandas)
 
 
-def stl(x, s_window, **kwargs):
+def _stl_key(x, s_window, kwargs):
+  '''
+  Utility function for the key of a decomposition in the STL cache: a
+  digest of the values and time attributes of the series, with the
+  arguments to stl.
+  '''
+  values = numpy.ascontiguousarray(numpy.array(x, dtype=float))
+  digest = hashlib.sha1(values).hexdigest()
+  return (digest, tuple(stats.tsp(x)), str(s_window),
+          repr(sorted(kwargs.items())))
+
+
+def _cached_stl(x, s_window, **kwargs):
+  '''
+  Utility function that returns the STL decomposition of the R time series
+  x from the cache, or decomposes x and adds it to the cache, dropping the
+  least recently used decomposition if the cache is full.
+  
+  Args:
+    x: an R time series
+    s_window: as for stl
+    kwargs: other arguments for R stl, with R names
+    
+  Returns:
+    an R object of class 'stl'
+  '''
+  kwargs.setdefault('robust', False)
+  key = _stl_key(x, s_window, kwargs)
+  out = _stl_cache.pop(key, None)
+  if out is None:
+    kwargs['s.window'] = s_window
+    out = stats.stl(x, **kwargs)
+    while len(_stl_cache) >= STL_CACHE_SIZE:
+      _stl_cache.popitem(last=False)
+  _stl_cache[key] = out
+  return out
+
+
+def clear_stl_cache():
+  '''
+  Empties the cache of STL decompositions used by stl and stlf.
+  '''
+  _stl_cache.clear()
+
+
+@instrument.wrapper
+def stl(x, s_window, cache=False, **kwargs):
   '''
   Perform a decomposition of the time series x into seasonal, trend and 
   remainder components using loess. Most of the arguments listed below are 
@@ -604,18 +741,189 @@ def stl(x, s_window, **kwargs):
     na_action : Default is na.fail, which means that the user has to fill or 
       remove any missing values. If used, it must be an object that maps to 
       an R function, obtained from rpy2.
+    cache : Default False. If True, a decomposition of the same series with
+      the same arguments is taken from a cache, if present, or else the new
+      decomposition is kept in the cache. stlf with cache=True also uses
+      this cache, so that a series is decomposed once for both. The cache
+      holds the STL_CACHE_SIZE most recently used decompositions.
       
   Returns:
     If x is an R ts object, an R object of class 'stl' is returned. 
     If x is a Pandas Series, a Pandas Data Frame is returned.
   '''
   x, is_pandas = converters.to_ts(x)
+  if cache:
+    out = _cached_stl(x, s_window, **converters.translate_kwargs(**kwargs))
+    return converters.decomposition_out(out, is_pandas)
   kwargs['s.window'] = s_window
   kwargs = converters.translate_kwargs(**kwargs)
   out = stats.stl(x, **kwargs)
   return converters.decomposition_out(out, is_pandas)
 
 
+def _msts_input(x, seasonal_periods):
+  '''
+  Utility function that converts the input to tbats, bats and stlm to an
+  R time series, which is multi-seasonal if seasonal_periods is given.
+  '''
+  if seasonal_periods is None:
+    return converters.to_ts(x)
+  return converters.as_msts(x, seasonal_periods), not validate.is_R_ts(x)
+
+
+def _bats_kwargs(use_box_cox, use_trend, use_damped_trend, use_arma_errors,
+                 use_parallel, num_cores):
+  '''
+  Utility function for the R arguments shared by tbats and bats.
+  '''
+  kwargs = {'use.box.cox' : use_box_cox, 'use.trend' : use_trend,
+            'use.damped.trend' : use_damped_trend,
+            'use.arma.errors' : use_arma_errors, 'num.cores' : num_cores}
+  if use_parallel is not None:
+    kwargs['use.parallel'] = use_parallel
+  return kwargs
+
+
+@instrument.wrapper
+def tbats(x, h=None, seasonal_periods=None, use_box_cox=NULL, use_trend=NULL,
+          use_damped_trend=NULL, use_arma_errors=True, use_parallel=None,
+          num_cores=2, level=(80, 95)):
+  '''
+  Fits a TBATS model (exponential smoothing with trigonometric seasonality,
+  Box-Cox transformation and ARMA errors) with tbats() from R Forecast,
+  and uses it to produce a forecast. TBATS handles several seasonal 
+  periods, including non-integer ones, such as the daily and weekly 
+  cycles of hourly data.
+  
+  Args:
+    x: an R time series, obtained from converters.ts() or 
+      converters.as_msts(), or a Pandas Series with the correct index 
+      (e.g. from converters.sequence_as_series().
+    h: Forecast horizon; default is 2 full periods of the longest seasonal
+      period, or 10 steps for non-seasonal series.
+    seasonal_periods: Default None, which uses the seasonal periods of x
+      if it is an R msts object, or else its frequency. Otherwise, a 
+      sequence of seasonal periods, e.g. (24, 168), and x is converted 
+      with converters.as_msts.
+    use_box_cox: Default NULL, which tries with and without a Box-Cox 
+      transformation and picks the better model by AIC.
+    use_trend: Default NULL, which tries with and without a trend.
+    use_damped_trend: Default NULL, which tries with and without damping.
+    use_arma_errors: Default True. If True, ARMA errors are fit to the 
+      residuals, and kept if they improve the AIC.
+    use_parallel: Default None, which leaves the choice to R: the model 
+      options are fit in parallel for series longer than 1000. If True 
+      or False, this is passed to R.
+    num_cores: Default 2. The number of cores used in R if use_parallel
+      is True. If NULL, R uses all available cores.
+    level: A number or list/tuple of prediction interval confidence values.
+      Default is 80% and 95% intervals.
+      
+  Returns:
+    If x is an R ts object, an R forecast is returned. If x is a Pandas 
+    Series, a Pandas Data Frame is returned.
+  '''
+  x, is_pandas = _msts_input(x, seasonal_periods)
+  kwargs = _bats_kwargs(use_box_cox, use_trend, use_damped_trend, 
+                        use_arma_errors, use_parallel, num_cores)
+  model = fc.tbats(x, **kwargs)
+  h = _get_horizon(x, h)
+  level = converters.map_arg(level)
+  out = fc.forecast(model, h=h, level=level)
+  return converters.forecast_out(out, is_pandas)
+
+
+@instrument.wrapper
+def bats(x, h=None, seasonal_periods=None, use_box_cox=NULL, use_trend=NULL,
+         use_damped_trend=NULL, use_arma_errors=True, use_parallel=None,
+         num_cores=2, level=(80, 95)):
+  '''
+  Fits a BATS model (exponential smoothing with Box-Cox transformation, 
+  ARMA errors and one or more seasonal periods) with bats() from 
+  R Forecast, and uses it to produce a forecast. Unlike tbats, the 
+  seasonal periods must be integers.
+  
+  Args:
+    x: an R time series, obtained from converters.ts() or 
+      converters.as_msts(), or a Pandas Series with the correct index 
+      (e.g. from converters.sequence_as_series().
+    h: Forecast horizon; default is 2 full periods of the longest seasonal
+      period, or 10 steps for non-seasonal series.
+    seasonal_periods, use_box_cox, use_trend, use_damped_trend, 
+      use_arma_errors, use_parallel, num_cores, level: as for tbats
+      
+  Returns:
+    If x is an R ts object, an R forecast is returned. If x is a Pandas 
+    Series, a Pandas Data Frame is returned.
+  '''
+  x, is_pandas = _msts_input(x, seasonal_periods)
+  kwargs = _bats_kwargs(use_box_cox, use_trend, use_damped_trend, 
+                        use_arma_errors, use_parallel, num_cores)
+  model = fc.bats(x, **kwargs)
+  h = _get_horizon(x, h)
+  level = converters.map_arg(level)
+  out = fc.forecast(model, h=h, level=level)
+  return converters.forecast_out(out, is_pandas)
+
+
+@instrument.wrapper
+def stlm(x, h=None, seasonal_periods=None, s_window=7, robust=False, 
+         method='ets', etsmodel='ZZN', lam=NULL, xreg=NULL, newxreg=NULL,
+         level=(80, 95), **kwargs):
+  '''
+  Fits a model to a seasonally adjusted series with stlm() from 
+  R Forecast, and uses it to produce a forecast. The series is decomposed 
+  with STL, or with MSTL if it has more than one seasonal period, a 
+  non-seasonal ets or arima model is fit to the seasonally adjusted data, 
+  and the seasonal components are projected forward naively.
+  
+  Args:
+    x: an R time series, obtained from converters.ts() or 
+      converters.as_msts(), or a Pandas Series with the correct index 
+      (e.g. from converters.sequence_as_series().
+    h: Forecast horizon; default is 2 full periods of the longest seasonal
+      period, or 10 steps for non-seasonal series.
+    seasonal_periods: as for tbats
+    s_window: either 'periodic' or the span (in lags) of the 
+      loess window for seasonal extraction, which should be odd.
+    robust: If True, use robust fitting in the loess procedure.
+    method: Default 'ets'. The other option is 'arima'.
+    etsmodel: Default is 'ZZN'. The ets model for the seasonally adjusted
+      series, used if method is 'ets'. The last letter should be N.
+    lam: BoxCox transformation parameter. The default is R's NULL value.
+      If NULL, no transformation is applied. Otherwise, a Box-Cox 
+      transformation is applied before forecasting and inverted after.
+    xreg: Only available if method is 'arima'. An optional vector or 
+      matrix of regressors, with one row/element for each point in x.
+    newxreg: If regressors were used in fitting, then they must be 
+      supplied for the forecast period as newxreg.
+    level: A number or list/tuple of prediction interval confidence values.
+      Default is 80% and 95% intervals.
+    kwargs: other arguments for R ets or auto.arima, with Python names, 
+      such as parallel and num_cores with method 'arima'.
+      
+  Returns:
+    If x is an R ts object, an R forecast is returned. If x is a Pandas 
+    Series, a Pandas Data Frame is returned.
+  '''
+  x, is_pandas = _msts_input(x, seasonal_periods)
+  if (xreg is NULL) != (newxreg is NULL):
+    raise ValueError('Specifiy both xreg and newxreg or neither.')
+  if xreg is not NULL:
+    xreg = converters.as_matrix(xreg)
+    newxreg = converters.as_matrix(newxreg)
+  kwargs = converters.translate_kwargs(**kwargs)
+  kwargs['s.window'] = s_window
+  kwargs['lambda'] = lam
+  model = fc.stlm(x, robust=robust, method=method, etsmodel=etsmodel, 
+                  xreg=xreg, **kwargs)
+  h = _get_horizon(x, h)
+  level = converters.map_arg(level)
+  out = fc.forecast(model, h=h, level=level, newxreg=newxreg)
+  return converters.forecast_out(out, is_pandas)
+
+
+@instrument.wrapper
 def decompose(x, type='additive'):
   '''
   Performs a classical seasonal decomposition of a time series into 
@@ -637,6 +945,7 @@ def decompose(x, type='additive'):
   return converters.decomposition_out(out, is_pandas)
 
   
+@instrument.wrapper
 def seasadj(decomp):
   '''
   Return a seasonally adjusted version of the origin time series that 
@@ -669,6 +978,7 @@ def seasadj(decomp):
     raise ValueError('seasadj requires a seasonal decomposition as input')
 
 
+@instrument.wrapper
 def sindexf(decomp, h):
   '''
   Projects the seasonal component of a seasonal decomposition of a time series 
@@ -700,6 +1010,7 @@ def sindexf(decomp, h):
     raise ValueError('seasadj requires a seasonal decomposition as input')
   
 
+@instrument.wrapper
 def BoxCox(x, lam):
   '''
   Applies a Box-Cox transformation to the data in x. This can stabilize the 
@@ -722,6 +1033,7 @@ def BoxCox(x, lam):
   return converters.series_out(out, is_pandas)
   
 
+@instrument.wrapper
 def InvBoxCox(x, lam):
   '''
   Invert a BoxCox transformation. The return value is a timeseries with 
@@ -743,6 +1055,7 @@ def InvBoxCox(x, lam):
   return converters.series_out(out, is_pandas)
   
 
+@instrument.wrapper
 def BoxCox_lambda(x, method='guerrero', lower=-1, upper=2):
   '''
   Function to find a good value of the BoxCox transformation parameter, lambda.
@@ -762,6 +1075,7 @@ def BoxCox_lambda(x, method='guerrero', lower=-1, upper=2):
   return fc.BoxCox_lambda(x, method=method, lower=lower, upper=upper)[0]
 
 
+@instrument.wrapper
 def na_interp(x, lam=NULL):
   '''
   Funtction for interpolating missing values in R time series. This function 
@@ -787,6 +1101,7 @@ def na_interp(x, lam=NULL):
   return converters.series_out(out, is_pandas)
   
 
+@instrument.wrapper
 def accuracy(result, x=None, **kwargs):
   '''
   Computes an R matrix of forecast accuracy measures. Must take an R forecast 
@@ -820,6 +1135,7 @@ def accuracy(result, x=None, **kwargs):
   return fc.accuracy(result, **kwargs)
 
 
+@instrument.wrapper
 def tsclean(x, **kwargs):
   '''
   Identify and replace outliers. Uses loess for non-seasonal series and 
@@ -843,6 +1159,7 @@ def tsclean(x, **kwargs):
   return converters.series_out(out, is_pandas)
 
 
+@instrument.wrapper
 def findfrequency(x):
   '''
   Performs spectral analysis of x to find the dominant frequency, if there 
@@ -858,6 +1175,7 @@ def findfrequency(x):
   return fc.findfrequency(x)[0]
 
 
+@instrument.wrapper
 def ndiffs(x, **kwargs):
   '''
   Estimates the number of first differences (non-seasonal) to take on the 
@@ -879,6 +1197,7 @@ def ndiffs(x, **kwargs):
   return fc.ndiffs(x, **kwargs)[0]
   
   
+@instrument.wrapper
 def nsdiffs(x, **kwargs):
   '''
   Estimates the number of seasonal differences to take on the time series, 
@@ -900,6 +1219,7 @@ def nsdiffs(x, **kwargs):
   return fc.nsdiffs(x, **kwargs)[0]
 
 
+@instrument.wrapper
 def acf(x, lag_max=NULL):
   '''
   Function computes the autocorrelation of a univariate time series.
@@ -919,6 +1239,7 @@ def acf(x, lag_max=NULL):
   return converters.acf_out(out, is_pandas)
   
   
+@instrument.wrapper
 def pacf(x, lag_max=NULL):
   '''
   Function computes the partial autocorrelation of a univariate time series.
@@ -9,12 +9,10 @@ from rpy2.robjects.packages import importr
 class EndToEndTestCase(unittest.TestCase):
 
   def setUp(self):
-    self.oil_r  = ts_io.read_ts('oil', 'fpp', as_pandas=False)
-    self.oil_py = converters.ts_as_series(self.oil_r)
-    self.aus_r = ts_io.read_ts('austourists', 'fpp', as_pandas=False)
-    self.aus_py = converters.ts_as_series(self.aus_r)
-    self.austa_r = ts_io.read_ts('austa', 'fpp', as_pandas=False)
-    self.austa_py = converters.ts_as_series(self.austa_r)
+    names = ['oil', 'austourists', 'austa']
+    self.oil_r, self.aus_r, self.austa_r = ts_io.read_ts_many(
+      names, 'fpp', as_pandas=False)
+    self.oil_py, self.aus_py, self.austa_py = ts_io.read_ts_many(names, 'fpp')
     self.fc = importr('forecast')
 
   def _check_points(self, fc_py, fc_r):
@@ -81,6 +79,14 @@ class EndToEndTestCase(unittest.TestCase):
     fc_r  = self.fc.forecast(model)
     self._check_points(fc_py, fc_r)
 
+  def test_auto_arima_exhaustive(self):
+    fc_py = wrappers.auto_arima(self.aus_py, stepwise=False, 
+                                approximation=False)
+    model = self.fc.auto_arima(self.aus_r, stepwise=False, 
+                               approximation=False)
+    fc_r  = self.fc.forecast(model)
+    self._check_points(fc_py, fc_r)
+
   def test_auto_arima_raises(self):
     self.assertRaises(ValueError, wrappers.auto_arima, self.oil_py , 
                        xreg=range(len(self.oil_py)))
@@ -92,6 +98,28 @@ class EndToEndTestCase(unittest.TestCase):
     fc_r  = self.fc.stlf(self.aus_r)
     self._check_points(fc_py, fc_r)
 
+  def test_stlf_decomposition(self):
+    fc_r = self.fc.stlf(self.aus_r)
+    dc_r = wrappers.stl(self.aus_r, 7)
+    self._check_points(converters.prediction_intervals(wrappers.stlf(dc_r)),
+                       fc_r)
+    dc_py = wrappers.stl(self.aus_py, 7)
+    self._check_points(wrappers.stlf(dc_py), fc_r)
+    dc_py = wrappers.decompose(self.aus_py)
+    self.assertRaises(ValueError, wrappers.stlf, dc_py)
+
+  def test_stl_cache(self):
+    wrappers.clear_stl_cache()
+    dc = wrappers.stl(self.aus_py, 7, cache=True)
+    self.assertEqual(len(wrappers._stl_cache), 1)
+    fc_py = wrappers.stlf(self.aus_py, cache=True)
+    self.assertEqual(len(wrappers._stl_cache), 1)
+    self._check_points(fc_py, self.fc.stlf(self.aus_r))
+    wrappers.stl(self.aus_py, 'periodic', cache=True)
+    self.assertEqual(len(wrappers._stl_cache), 2)
+    wrappers.clear_stl_cache()
+    self.assertEqual(len(wrappers._stl_cache), 0)
+
   def test_acf(self):
     acf_py = wrappers.acf(self.oil_py, lag_max=10)
     self.assertEqual(acf_py.name, 'Acf')
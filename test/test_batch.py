@@ -0,0 +1,73 @@
+import unittest
+from rforecast import batch
+from rforecast import panel
+from rforecast import wrappers
+from rforecast import converters
+from rforecast import ts_io
+from rpy2 import robjects
+import numpy
+
+
+class BatchTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.oil, self.aus = ts_io.read_ts_many(['oil', 'austourists'], 'fpp')
+    self.fc_oil = wrappers.meanf(self.oil, h=8)
+    self.fc_aus = wrappers.snaive(self.aus, h=8)
+    self.batch = batch.ForecastBatch.from_forecasts(
+      [('oil', self.fc_oil), ('aus', self.fc_aus)])
+
+  def test_from_forecasts(self):
+    self.assertEqual(len(self.batch), 2)
+    self.assertEqual(self.batch.data.shape, (2, 8, 5))
+    self.assertEqual(list(self.batch.level), [80, 95])
+    self.assertTrue(self.batch['oil'].equals(self.fc_oil))
+    self.assertTrue(self.batch.frame('aus').equals(self.fc_aus))
+    fc_r = wrappers.naive(converters.series_as_ts(self.oil), h=8)
+    b = batch.ForecastBatch.from_forecasts({'oil' : fc_r})
+    self.assertTrue(b['oil'].equals(converters.prediction_intervals(fc_r)))
+    self.assertRaises(ValueError, batch.ForecastBatch.from_forecasts, 
+                      {'oil' : wrappers.meanf(self.oil, h=8, level=90), 
+                       'aus' : self.fc_aus})
+
+  def test_from_frame(self):
+    out = panel.thetaf({'a' : self.aus, 'b' : self.aus * 2}, h=8)
+    b = batch.ForecastBatch.from_frame(out)
+    self.assertEqual(b.ids, ['a', 'b'])
+    self.assertTrue(b['b'].equals(out['b']))
+    self.assertEqual(b.to_frame().shape, out.shape)
+    b = batch.ForecastBatch.from_frame(out.sort_index(axis=1))
+    self.assertEqual(sorted(b.ids), ['a', 'b'])
+    self.assertEqual(list(b.level), [80, 95])
+    self.assertTrue(b['a'].equals(out['a']))
+    self.assertTrue(b['b'].equals(out['b']))
+
+  def test_slicing(self):
+    b = self.batch.select(['aus'])
+    self.assertEqual(b.ids, ['aus'])
+    self.assertTrue(b['aus'].equals(self.fc_aus))
+    b = self.batch.select(numpy.array([True, False]))
+    self.assertEqual(b.ids, ['oil'])
+    b = self.batch.head(3)
+    self.assertEqual(b.horizon, 3)
+    self.assertTrue(b['oil'].equals(self.fc_oil.iloc[:3]))
+    self.assertRaises(KeyError, self.batch.frame, 'foo')
+
+  def test_aggregation(self):
+    total = self.batch.total()
+    self.assertAlmostEqual(total['oil'], self.fc_oil.point_fc.sum(), places=6)
+    total = self.batch.total(over='series')
+    self.assertAlmostEqual(total[1], self.fc_oil.point_fc.iloc[0] + 
+                           self.fc_aus.point_fc.iloc[0], places=6)
+    self.assertEqual(self.batch.point_fc().shape, (2, 8))
+
+  def test_accuracy(self):
+    oil_r = converters.series_as_ts(self.oil)
+    train = robjects.r('window')(oil_r, end=2002)
+    test = robjects.r('window')(oil_r, start=2003)
+    fc_r = wrappers.meanf(train, h=8)
+    b = batch.ForecastBatch.from_forecasts({'oil' : fc_r})
+    acc = b.accuracy({'oil' : list(test)}, train={'oil' : list(train)})
+    acc_r = converters.accuracy(wrappers.accuracy(fc_r, test))
+    for col in ['ME', 'RMSE', 'MAE', 'MPE', 'MAPE', 'MASE']:
+      self.assertAlmostEqual(acc[col]['oil'], acc_r.Test[col], places=3)
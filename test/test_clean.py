@@ -0,0 +1,57 @@
+import unittest
+from rforecast import clean
+from rforecast import wrappers
+from rforecast import ts_io
+import numpy
+
+
+class CleanTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.aus = ts_io.read_ts('austourists', 'fpp')
+    dirty = self.aus.copy()
+    dirty.iloc[10] = dirty.iloc[10] * 5
+    dirty.iloc[20] = numpy.nan
+    self.df = dirty.to_frame('dirty')
+    self.df['clean'] = self.aus
+    self.dirty = dirty
+
+  def test_tsclean(self):
+    out, changes = clean.tsclean(self.df)
+    self.assertEqual(out.shape, self.df.shape)
+    self.assertTrue(numpy.allclose(out['dirty'].values,
+                                   wrappers.tsclean(self.dirty).values))
+    self.assertTrue(10 in changes['dirty'])
+    self.assertTrue(20 in changes['dirty'])
+    self.assertFalse(0 in changes['dirty'])
+    self.assertTrue((numpy.diff(changes['dirty']) > 0).all())
+
+  def test_na_interp(self):
+    out, changes = clean.na_interp(self.df)
+    self.assertTrue(numpy.allclose(out['dirty'].values,
+                                   wrappers.na_interp(self.dirty).values))
+    self.assertEqual(list(changes), ['dirty'])
+    self.assertEqual(list(changes['dirty']), [20])
+
+  def test_columns(self):
+    out, changes = clean.tsclean(self.df, columns=['clean'])
+    self.assertTrue(numpy.isnan(out['dirty'].iloc[20]))
+    self.assertFalse('dirty' in changes)
+
+  def test_processes(self):
+    out, changes = clean.tsclean(self.df)
+    out2, changes2 = clean.tsclean(self.df, processes=2)
+    self.assertTrue(numpy.allclose(out.values, out2.values))
+    self.assertEqual(sorted(changes), sorted(changes2))
+    for k in changes:
+      self.assertTrue(numpy.array_equal(changes[k], changes2[k]))
+
+  def test_unchanged(self):
+    df = self.df.copy()
+    for k in range(5):
+      df['copy%d' % k] = self.aus
+    out, changes = clean.na_interp(df)
+    self.assertEqual(list(changes), ['dirty'])
+    unchanged = [col for col in df.columns if col not in changes]
+    self.assertEqual(len(unchanged), 6)
+    self.assertTrue(out[unchanged].equals(df[unchanged]))
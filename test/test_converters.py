@@ -69,6 +69,17 @@ class ConvertersTestCase(unittest.TestCase):
     self.assertTrue(aus2.equals(aus))
     
         
+  def test_time_index(self):
+    idx = converters.time_index(48, start=(1999, 1), freq=4)
+    self.assertTrue(idx.equals(self.aus.index))
+    idx = converters.time_index(46, start=1965)
+    self.assertListEqual(list(idx), range(1965, 2011))
+    idx = converters.time_index(3, start=(1999, 4), freq=4)
+    self.assertListEqual(list(idx), [(1999, 4), (2000, 1), (2000, 2)])
+    self.assertEqual(converters.index_start(self.aus.index), ((1999, 1), 4))
+    self.assertEqual(converters.index_start(self.oil.index), (1965, 1))
+
+
   def test_series_as_ts(self):
     oil_ts = converters.series_as_ts(self.oil)
     self.assertTrue(type(oil_ts) is robjects.FloatVector)
@@ -156,6 +167,23 @@ class ConvertersTestCase(unittest.TestCase):
     self.assertEqual(aus.index[-1], (2010, 4))
 
 
+  def test_as_msts(self):
+    x = pandas.Series(numpy.arange(336.0), 
+                      index=converters.time_index(336, start=(5, 1), freq=168))
+    ms = converters.as_msts(x, (24, 168))
+    self.assertEqual(list(robjects.r('class')(ms)), ['msts', 'ts'])
+    self.assertEqual(converters.msts_periods(ms), [24, 168])
+    self.assertEqual(list(robjects.r('start')(ms)), [5, 1])
+    out = converters.ts_as_series(ms)
+    self.assertEqual(out.index.nlevels, 2)
+    self.assertTrue(out.index.equals(x.index))
+    self.assertTrue((out.values == x.values).all())
+    ms = converters.as_msts(self.aus_ts, (2, 4))
+    self.assertEqual(converters.msts_periods(ms), [2, 4])
+    self.assertEqual(converters.msts_periods(self.aus_ts), None)
+    self.assertRaises(TypeError, converters.as_msts, [1, 2, 3], (2, 4))
+
+
   def test_decomposition(self):
     dc = wrappers.stl(self.aus_ts, 7)
     dcdf = converters.decomposition(dc)
@@ -240,6 +268,43 @@ class ConvertersTestCase(unittest.TestCase):
     self.assertRaises(ValueError, converters.prediction_intervals, self.oil_ts)
 
 
+  def test_panel_as_ts_list(self):
+    df = pandas.DataFrame({'a' : self.aus, 'b' : self.aus * 2})
+    ts_list = converters.panel_as_ts_list(df)
+    self.assertEqual(list(robjects.r('names')(ts_list)), ['a', 'b'])
+    tsp = robjects.r('tsp')(ts_list.rx2('b'))
+    self.assertEqual(tuple(tsp), (1999.0, 2010.75, 4.0))
+    self.assertAlmostEqual(ts_list.rx2('b')[0], 2 * self.aus.iloc[0], 
+                           places=6)
+    long_df = pandas.read_csv('data/long.csv', header=None)
+    ts_list = converters.panel_as_ts_list(long_df, long=True)
+    self.assertEqual(list(robjects.r('names')(ts_list)), ['aus', 'aus2'])
+    self.assertEqual(tuple(robjects.r('tsp')(ts_list.rx2('aus'))), 
+                     (1999.0, 2010.75, 4.0))
+    self.assertListEqual(list(ts_list.rx2('aus')), list(self.aus_ts))
+
+
+  def test_forecast_list_as_frame(self):
+    df = pandas.DataFrame({'a' : self.aus, 'b' : self.aus * 2})
+    ts_list = converters.panel_as_ts_list(df)
+    fc = importr('forecast')
+    fcs = robjects.r('lapply')(ts_list, fc.snaive, h=6)
+    out = converters.forecast_list_as_frame(fcs)
+    self.assertEqual(out.shape, (12, 9))
+    self.assertEqual(list(out.series_id), ['a'] * 6 + ['b'] * 6)
+    self.assertEqual(list(out.horizon[:6]), range(1, 7))
+    self.assertEqual(list(out.period[:6]), [2011] * 4 + [2012] * 2)
+    self.assertEqual(list(out.season[:6]), [1, 2, 3, 4, 1, 2])
+    pi = converters.prediction_intervals(fcs.rx2('b'))
+    self.assertTrue(numpy.allclose(out[out.series_id == 'b'].iloc[:, 4:], 
+                                   pi.values))
+    fcs = robjects.r('lapply')(ts_list, fc.croston, h=6)
+    out = converters.forecast_list_as_frame(fcs)
+    self.assertEqual(list(out.columns),
+                     ['series_id', 'horizon', 'period', 'season', 'point_fc'])
+    self.assertEqual(out.shape, (12, 5))
+
+
   def test_accuracy(self):
     acc1 = wrappers.accuracy(self.fc_oil)
     acdf1 = converters.accuracy(acc1)
@@ -0,0 +1,67 @@
+import unittest
+from rforecast import ensemble
+from rforecast import wrappers
+from rforecast import converters
+from rforecast import validate
+from rforecast import ts_io
+import numpy
+
+
+class EnsembleTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.oil = ts_io.read_ts('oil', 'fpp')
+    self.naive = wrappers.naive(self.oil, h=5)
+    self.meanf = wrappers.meanf(self.oil, h=5)
+
+  def test_combine(self):
+    out = ensemble.combine(self.oil, methods=['naive', 'meanf'], h=5)
+    self.assertEqual(list(out.columns), list(self.naive.columns))
+    self.assertTrue(out.index.equals(self.naive.index))
+    expected = (self.naive + self.meanf) / 2
+    self.assertTrue(numpy.allclose(out.values, expected.values))
+
+  def test_weights(self):
+    out = ensemble.combine(self.oil, methods=['naive', 'meanf'], h=5,
+                           weights={'naive' : 3, 'meanf' : 1})
+    expected = 0.75 * self.naive + 0.25 * self.meanf
+    self.assertTrue(numpy.allclose(out.values, expected.values))
+    out = ensemble.combine(self.oil, methods=[('rwf', {'drift' : True})],
+                           h=5)
+    self.assertTrue(numpy.allclose(
+      out.values, wrappers.rwf(self.oil, h=5, drift=True).values))
+    self.assertRaises(ValueError, ensemble.combine, self.oil,
+                      methods=['naive', 'meanf'], weights=[1])
+    for name in ['foo', 'stl', 'frequency', 'croston']:
+      self.assertRaises(ValueError, ensemble.combine, self.oil,
+                        methods=['naive', name])
+    out = ensemble.combine(self.oil, methods=['naive', 'meanf'], h=5,
+                           weights=u'equal')
+    self.assertTrue(numpy.allclose(out.values,
+                                   ((self.naive + self.meanf) / 2).values))
+
+  def test_inverse_mse_weights(self):
+    x = numpy.arange(10.0)
+    fitted = numpy.vstack([x + 1, x + 2])
+    fitted[0, 0] = numpy.nan
+    w = ensemble.inverse_mse_weights(x, fitted)
+    self.assertTrue(numpy.allclose(w, [0.8, 0.2]))
+    out = ensemble.combine(self.oil, methods=['naive', 'meanf'], h=5,
+                           weights='inverse_mse')
+    point = out.point_fc.iloc[0]
+    self.assertTrue(self.meanf.point_fc.iloc[0] < point)
+    self.assertTrue(point < self.naive.point_fc.iloc[0])
+
+  def test_r_forecast(self):
+    oil_r = converters.series_as_ts(self.oil)
+    out = ensemble.combine(oil_r, methods=['naive', 'meanf'], h=5)
+    self.assertTrue(validate.is_R_forecast(out))
+    self.assertEqual(out.rx2('method')[0], 'Combination of naive, meanf')
+    acc = converters.accuracy(wrappers.accuracy(out))
+    self.assertTrue(acc.Train['RMSE'] > 0)
+
+  def test_combine_many(self):
+    out = ensemble.combine_many({'a' : self.oil, 'b' : self.oil * 2},
+                                methods=['naive', 'meanf'], h=5)
+    self.assertEqual(len(out), 2)
+    self.assertTrue(numpy.allclose(out['b'].values, 2 * out['a'].values))
@@ -0,0 +1,82 @@
+import unittest
+import json
+from rforecast import instrument
+from rforecast import wrappers
+from rforecast import ts_io
+
+
+class InstrumentTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.oil, = ts_io.read_ts_many(['oil'], 'fpp')
+    self.oil_r, = ts_io.read_ts_many(['oil'], 'fpp', as_pandas=False)
+    self.aus, = ts_io.read_ts_many(['austourists'], 'fpp')
+
+  def _stats(self, stats):
+    return dict(((rec['wrapper'], rec['stage']), rec) 
+                for rec in stats.as_list())
+
+  def test_disabled(self):
+    instrument.registry.reset()
+    wrappers.thetaf(self.oil)
+    self.assertEqual(instrument.registry.as_list(), [])
+
+  def test_profiling(self):
+    with instrument.profiling(instrument.Registry()) as stats:
+      wrappers.thetaf(self.oil)
+      wrappers.thetaf(self.oil)
+      wrappers.naive(self.oil_r)
+    recs = self._stats(stats)
+    for stage in ['conversion', 'r', 'extraction', 'total']:
+      self.assertEqual(recs[('thetaf', stage)]['calls'], 2)
+    self.assertEqual(recs[('thetaf', 'conversion')]['bytes'], 
+                     2 * self.oil.values.nbytes)
+    self.assertTrue(recs[('thetaf', 'extraction')]['bytes'] > 0)
+    self.assertEqual(recs[('naive', 'conversion')]['bytes'], 0)
+    total = recs[('thetaf', 'total')]['seconds']
+    parts = sum(recs[('thetaf', stage)]['seconds'] 
+                for stage in ['conversion', 'r', 'extraction'])
+    self.assertAlmostEqual(total, parts, places=6)
+    self.assertFalse(instrument._enabled)
+
+  def test_nested(self):
+    with instrument.profiling(instrument.Registry()) as stats:
+      wrappers.snaive(self.aus)
+      wrappers.hw(self.aus)
+    recs = self._stats(stats)
+    self.assertEqual(sorted(set(k[0] for k in recs)), ['hw', 'snaive'])
+    for name in ['snaive', 'hw']:
+      self.assertEqual(recs[(name, 'total')]['calls'], 1)
+      self.assertEqual(recs[(name, 'r')]['calls'], 1)
+    self.assertEqual(instrument._depth(), 0)
+
+  def test_export(self):
+    stats = instrument.Registry()
+    stats.record('thetaf', 'r', 0.5)
+    stats.record('thetaf', 'conversion', 0.25, 1024)
+    lines = stats.to_json_lines().splitlines()
+    self.assertEqual(len(lines), 2)
+    self.assertEqual(json.loads(lines[0])['bytes'], 1024)
+    text = stats.to_prometheus()
+    self.assertTrue(
+      'rforecast_stage_seconds_total{wrapper="thetaf",stage="r"} 0.5' in text)
+    self.assertTrue(
+      'rforecast_stage_bytes_total{wrapper="thetaf",stage="conversion"} 1024' 
+      in text)
+    stats.record('a"b\\c\nd', 'r', 1.0)
+    text = stats.to_prometheus()
+    self.assertTrue(
+      'rforecast_stage_calls_total{wrapper="a\\"b\\\\c\\nd",stage="r"} 1'
+      in text)
+    self.assertEqual(len(text.splitlines()), 12)
+
+  def test_enable(self):
+    instrument.registry.reset()
+    with instrument.profiling(instrument.Registry()) as stats:
+      instrument.enable()
+      wrappers.thetaf(self.oil)
+    instrument.disable()
+    self.assertEqual(stats.as_list(), [])
+    recs = self._stats(instrument.registry)
+    self.assertEqual(recs[('thetaf', 'total')]['calls'], 1)
+    instrument.registry.reset()
@@ -1,6 +1,13 @@
 import unittest
+import os
+import shutil
+import tempfile
+import numpy
 import pandas
 from rforecast import ts_io
+from rforecast import wrappers
+from rforecast import converters
+from rpy2 import robjects
 
 class IOTestCase(unittest.TestCase):
 
@@ -30,3 +37,119 @@ class IOTestCase(unittest.TestCase):
     self.assertListEqual(list(oil.index), range(1965, 2011))
     self.assertRaises(IOError, ts_io.read_ts, 'foo')
     self.assertRaises(IOError, ts_io.read_ts, 'oil', pkgname='foo')
+
+
+  def test_read_ts_many(self):
+    oil, aus = ts_io.read_ts_many(['oil', 'austourists'], 'fpp')
+    self.assertEqual(len(oil), 46)
+    self.assertListEqual(list(oil.index), range(1965, 2011))
+    self.assertEqual(aus.index.nlevels, 2)
+    oil[1965] = 0
+    oil2, = ts_io.read_ts_many(['oil'], 'fpp')
+    self.assertNotEqual(oil2[1965], 0)
+    oil_r, = ts_io.read_ts_many(['oil'], 'fpp', as_pandas=False)
+    self.assertTrue(oil2.equals(ts_io.read_ts('oil', 'fpp')))
+    self.assertAlmostEqual(oil_r[0], oil2[1965], places=3)
+    self.assertRaises(IOError, ts_io.read_ts_many, ['oil', 'foo'], 'fpp')
+    self.assertRaises(IOError, ts_io.read_ts_many, ['oil'], 'foo')
+    ts_io.clear_ts_cache()
+
+
+  def test_iter_series(self):
+    out = list(ts_io.iter_series('data/long.csv', chunksize=10))
+    self.assertEqual([k for (k, _) in out], ['aus', 'aus2'])
+    aus = ts_io.read_series('data/aus.csv')
+    self.assertTrue(out[0][1].equals(aus))
+    self.assertEqual(out[1][1].index.nlevels, 2)
+    self.assertAlmostEqual(out[1][1][(2010, 4)], 2 * aus[(2010, 4)], places=3)
+    self.assertRaises(IOError, list, ts_io.iter_series('data/oil.csv'))
+    tmpdir = tempfile.mkdtemp()
+    try:
+      path = os.path.join(tmpdir, 'ids.csv')
+      with open(path, 'w') as f:
+        f.write('007,1,1.0\n007,2,2.0\n007,3,3.0\nx,1,4.0\n7,1,5.0\n')
+      out = list(ts_io.iter_series(path, chunksize=2))
+      self.assertEqual([k for (k, _) in out], ['007', 'x', '7'])
+      self.assertEqual(list(out[0][1].values), [1.0, 2.0, 3.0])
+    finally:
+      shutil.rmtree(tmpdir)
+
+
+  @unittest.skipIf(ts_io.pyarrow is None, 'pyarrow is not installed')
+  def test_read_write_panel(self):
+    tmpdir = tempfile.mkdtemp()
+    try:
+      aus = ts_io.read_series('data/aus.csv')
+      oil = ts_io.read_series('data/oil.csv')
+      for fmt in ['parquet', 'arrow']:
+        path = os.path.join(tmpdir, 'panel.' + fmt)
+        n = ts_io.write_panel({'aus' : aus, 'oil' : oil}, path, 
+                              row_group_size=1, format=fmt)
+        self.assertEqual(n, 2)
+        panel = ts_io.read_panel(path, format=fmt)
+        self.assertEqual(set(panel.keys()), {'aus', 'oil'})
+        self.assertTrue(panel['aus'].equals(aus))
+        self.assertTrue(panel['oil'].equals(oil))
+        panel = ts_io.read_panel(path, ids=['oil'], format=fmt)
+        self.assertEqual(list(panel.keys()), ['oil'])
+      path = os.path.join(tmpdir, 'long.parquet')
+      n = ts_io.write_panel(ts_io.iter_series('data/long.csv'), path)
+      self.assertEqual(n, 2)
+      self.assertTrue(ts_io.read_panel(path)['aus'].equals(aus))
+    finally:
+      shutil.rmtree(tmpdir)
+
+
+  def test_series_store(self):
+    tmpdir = tempfile.mkdtemp()
+    try:
+      aus = ts_io.read_series('data/aus.csv')
+      oil = ts_io.read_series('data/oil.csv')
+      path = os.path.join(tmpdir, 'store')
+      self.assertEqual(ts_io.write_store({'aus' : aus, 'oil' : oil}, path), 2)
+      store = ts_io.SeriesStore(path)
+      self.assertEqual(len(store), 2)
+      self.assertEqual(set(store.ids), {'aus', 'oil'})
+      self.assertTrue(store['aus'].equals(aus))
+      self.assertTrue(store.get('oil').equals(oil))
+      self.assertFalse(store.values('oil').flags.writeable)
+      oil_ts = store.get('oil', as_pandas=False)
+      self.assertEqual(tuple(robjects.r('tsp')(oil_ts)), (1965.0, 2010.0, 1.0))
+      self.assertEqual(len(list(store.items(['aus']))), 1)
+      self.assertRaises(KeyError, store.get, 'foo')
+      path = os.path.join(tmpdir, 'ints')
+      ts_io.write_store(pandas.DataFrame({1 : oil, 2 : oil * 2}), path)
+      store = ts_io.SeriesStore(path)
+      self.assertEqual(store.ids, ['1', '2'])
+      self.assertTrue(1 in store and '2' in store)
+      self.assertTrue(store[2].equals(store['2']))
+      self.assertTrue(numpy.allclose(store[2].values, 2 * oil.values))
+    finally:
+      shutil.rmtree(tmpdir)
+
+
+  def test_forecast_writer(self):
+    tmpdir = tempfile.mkdtemp()
+    try:
+      aus = ts_io.read_series('data/aus.csv')
+      oil = ts_io.read_series('data/oil.csv')
+      fc_aus = wrappers.snaive(aus, h=6)
+      fc_oil = wrappers.meanf(converters.series_as_ts(oil), h=4)
+      path = os.path.join(tmpdir, 'fc.csv')
+      with ts_io.ForecastWriter(path, row_group_size=5) as writer:
+        writer.write('aus', fc_aus)
+        writer.write('oil', fc_oil)
+        self.assertRaises(ValueError, writer.write, 'bad', 
+                          wrappers.meanf(oil, level=90))
+      self.assertEqual(writer.rows_written, 10)
+      df = pandas.read_csv(path)
+      self.assertEqual(list(df.columns), ['series_id', 'horizon', 'period', 
+                       'season', 'point_fc', 'lower80', 'upper80', 
+                       'lower95', 'upper95'])
+      self.assertEqual(list(df.horizon), range(1, 7) + range(1, 5))
+      self.assertEqual(list(df.season[:6]), [1, 2, 3, 4, 1, 2])
+      self.assertEqual(list(df.period[6:]), range(2011, 2015))
+      self.assertAlmostEqual(df.point_fc[0], fc_aus.point_fc.iloc[0], 
+                             places=3)
+    finally:
+      shutil.rmtree(tmpdir)
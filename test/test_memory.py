@@ -0,0 +1,74 @@
+import unittest
+from rforecast import memory
+from rforecast import instrument
+from rforecast import wrappers
+from rforecast import ensemble
+from rforecast import ts_io
+
+
+class MemoryTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.oil = ts_io.read_series('data/oil.csv')
+    self.aus = ts_io.read_series('data/aus.csv')
+
+  def tearDown(self):
+    memory.set_policy(None)
+
+  def test_heap_usage(self):
+    heap = memory.heap_usage()
+    self.assertTrue(heap['ncells'] > 0)
+    self.assertTrue(heap['vcells'] > 0)
+    self.assertEqual(heap['bytes'], 
+                     heap['ncells_bytes'] + heap['vcells_bytes'])
+    self.assertEqual(heap['vcells_bytes'], 8 * heap['vcells'])
+
+  def test_collect(self):
+    heap = memory.collect()
+    self.assertTrue(heap['bytes'] > 0)
+
+  def test_policy_every(self):
+    policy = memory.GCPolicy(every=3)
+    memory.set_policy(policy)
+    for k in range(7):
+      wrappers.naive(self.oil)
+    self.assertEqual(policy.calls, 7)
+    self.assertEqual(policy.collections, 2)
+    self.assertTrue(policy.last_heap['bytes'] > 0)
+    memory.set_policy(None)
+    wrappers.naive(self.oil)
+    self.assertEqual(policy.calls, 7)
+    self.assertTrue(memory.get_policy() is None)
+
+  def test_policy_nested(self):
+    policy = memory.GCPolicy(every=2)
+    memory.set_policy(policy)
+    wrappers.snaive(self.aus)
+    wrappers.ets(self.aus)
+    ensemble.combine(self.aus, methods=['snaive', 'naive'])
+    self.assertEqual(policy.calls, 3)
+    self.assertEqual(policy.collections, 1)
+
+  def test_policy_max_bytes(self):
+    policy = memory.GCPolicy(max_bytes=0, check_every=2)
+    memory.set_policy(policy)
+    for k in range(5):
+      wrappers.naive(self.oil)
+    self.assertEqual(policy.collections, 2)
+    policy = memory.GCPolicy(max_bytes=2 ** 62, check_every=1)
+    memory.set_policy(policy)
+    wrappers.naive(self.oil)
+    self.assertEqual(policy.collections, 0)
+    self.assertTrue(policy.last_heap is not None)
+
+  def test_policy_raises(self):
+    self.assertRaises(ValueError, memory.GCPolicy)
+    self.assertRaises(ValueError, memory.GCPolicy, every=0)
+    self.assertRaises(ValueError, memory.GCPolicy, every=1, check_every=0)
+
+  def test_set_policy_replaces(self):
+    first = memory.GCPolicy(every=10)
+    second = memory.GCPolicy(every=10)
+    memory.set_policy(first)
+    memory.set_policy(second)
+    self.assertEqual(instrument._hooks, [second])
@@ -0,0 +1,151 @@
+import unittest
+from rforecast import panel
+from rforecast import converters
+from rforecast import wrappers
+from rforecast import ts_io
+from rpy2 import robjects
+from rpy2.robjects.packages import importr
+import pandas
+import numpy
+
+
+class PanelTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.oil_r = ts_io.read_ts('oil', 'fpp', as_pandas=False)
+    self.oil = converters.ts_as_series(self.oil_r)
+    self.aus_r = ts_io.read_ts('austourists', 'fpp', as_pandas=False)
+    self.aus = converters.ts_as_series(self.aus_r)
+    self.fc = importr('forecast')
+
+  def _check_close(self, fc_py, fc_r):
+    '''
+    Checks that a panel forecast for one series matches the R forecast
+    to within 1%, at the first and last points of the mean forecast and
+    the 80% lower and 95% upper prediction intervals.
+    '''
+    lower = fc_r.rx2('lower')
+    upper = fc_r.rx2('upper')
+    mean = fc_r.rx2('mean')
+    pairs = [(fc_py.point_fc.iloc[0], mean[0]),
+             (fc_py.point_fc.iloc[-1], mean[-1]),
+             (fc_py.lower80.iloc[0], lower[0]),
+             (fc_py.upper95.iloc[-1], upper[-1])]
+    for (py_val, r_val) in pairs:
+      self.assertAlmostEqual(py_val, r_val, delta=0.01 * abs(r_val))
+
+  def test_as_panel(self):
+    df = panel.as_panel([list(self.oil), list(self.oil)], start=1965)
+    self.assertEqual(df.shape, (46, 2))
+    self.assertEqual(df.index[0], 1965)
+    df = panel.as_panel({'a' : self.aus, 'b' : self.aus})
+    self.assertEqual(df.shape, (48, 2))
+    self.assertEqual(df.index.nlevels, 2)
+    self.assertEqual(list(df.columns), ['a', 'b'])
+
+  def test_forecast_index(self):
+    idx = panel._forecast_index(self.aus.index, 6)
+    self.assertEqual(idx[0], (2011, 1))
+    self.assertEqual(idx[-1], (2012, 2))
+    idx = panel._forecast_index(self.oil.index, 3)
+    self.assertEqual(list(idx), [2011, 2012, 2013])
+
+  def test_thetaf_nonseasonal(self):
+    out = panel.thetaf({'oil' : self.oil})
+    self.assertEqual(out.shape, (10, 5))
+    self.assertEqual(list(out['oil'].columns),
+                     ['point_fc', 'lower80', 'upper80', 'lower95', 'upper95'])
+    self._check_close(out['oil'], self.fc.thetaf(self.oil_r))
+
+  def test_thetaf_seasonal(self):
+    out = panel.thetaf({'aus' : self.aus, 'aus2' : self.aus * 2}, h=8)
+    self.assertEqual(out.index[0], (2011, 1))
+    fc_r = self.fc.thetaf(self.aus_r, h=8)
+    self._check_close(out['aus'], fc_r)
+    self.assertTrue(numpy.allclose(out['aus2'].point_fc,
+                                   2 * out['aus'].point_fc))
+
+  def test_thetaf_raises(self):
+    oil = self.oil.copy()
+    oil.iloc[3] = numpy.nan
+    self.assertRaises(ValueError, panel.thetaf, {'oil' : oil})
+
+  def test_decompose(self):
+    dc = panel.decompose({'aus' : self.aus, 'aus2' : self.aus + 1})
+    self.assertEqual(dc.shape, (48, 8))
+    self.assertEqual(list(dc['aus'].columns), 
+                     ['data', 'seasonal', 'trend', 'remainder'])
+    dc_r = converters.decomposition(wrappers.decompose(self.aus_r))
+    for col in dc_r.columns:
+      self.assertTrue(numpy.allclose(dc['aus'][col], dc_r[col], 
+                                     equal_nan=True))
+    self.assertTrue(numpy.allclose(dc['aus2'].seasonal, dc['aus'].seasonal))
+    dc = panel.decompose({'aus' : self.aus}, type='multiplicative')
+    dc_r = wrappers.decompose(self.aus, type='multiplicative')
+    self.assertTrue(numpy.allclose(dc['aus'].seasonal, dc_r.seasonal))
+    self.assertRaises(ValueError, panel.decompose, {'oil' : self.oil})
+
+  def test_seasadj(self):
+    dc = panel.decompose({'aus' : self.aus, 'aus2' : self.aus * 2}, 
+                         type='multiplicative')
+    adj = panel.seasadj(dc)
+    self.assertEqual(adj.shape, (48, 2))
+    self.assertTrue(numpy.allclose(adj['aus'], wrappers.seasadj(dc['aus'])))
+    self.assertTrue(numpy.allclose(adj['aus2'], wrappers.seasadj(dc['aus2'])))
+    cols = [(k, name) for name in ['remainder', 'trend', 'seasonal', 'data']
+            for k in ['aus', 'aus2']]
+    adj2 = panel.seasadj(dc[pandas.MultiIndex.from_tuples(cols)])
+    self.assertTrue(adj2.equals(adj))
+    self.assertRaises(ValueError, panel.seasadj, self.aus)
+
+  def test_sindexf(self):
+    dc = panel.decompose({'aus' : self.aus, 'aus2' : self.aus * 2})
+    sf = panel.sindexf(dc, 6)
+    sf_py = wrappers.sindexf(dc['aus'], 6)
+    self.assertEqual(sf.shape, (6, 2))
+    self.assertEqual(list(sf.index), list(sf_py.index))
+    self.assertTrue(numpy.allclose(sf['aus'], sf_py))
+
+  def test_qnorm(self):
+    p = numpy.array([1e-6, 0.025, 0.1, 0.5, 0.9, 0.975, 1 - 1e-6])
+    q = importr('stats').qnorm(robjects.FloatVector(p))
+    self.assertTrue(numpy.allclose(panel._qnorm(p), numpy.array(q)))
+
+  def test_croston(self):
+    rng = numpy.random.RandomState(0)
+    y = (rng.rand(40, 4) < 0.3) * rng.poisson(5, (40, 4))
+    y[:, 0] = 0
+    y[7, 1] = 3
+    df = panel.as_panel(pandas.DataFrame(y.astype(float)))
+    out = panel.croston(df, h=5, alpha=0.2)
+    self.assertEqual(out.shape, (5, 4))
+    self.assertTrue(out[0].isnull().all())
+    for k in range(4):
+      x = converters.sequence_as_series(y[:, k].astype(float))
+      fc_py = wrappers.croston(x, h=5, alpha=0.2)
+      self.assertEqual(list(fc_py.columns), ['point_fc'])
+      self.assertTrue(numpy.allclose(out[k], fc_py.point_fc, equal_nan=True))
+    sba = panel.croston(df, h=5, alpha=0.2, type='sba')
+    self.assertTrue(numpy.allclose(sba.values, 0.9 * out.values,
+                                   equal_nan=True))
+    self.assertRaises(ValueError, panel.croston, -df)
+
+  def test_croston_sparse(self):
+    rng = numpy.random.RandomState(0)
+    y = (rng.rand(40, 4) < 0.3) * rng.poisson(5, (40, 4))
+    y[:, 0] = 0
+    df = panel.as_panel(pandas.DataFrame(y.astype(float)))
+    out = panel.croston(df, h=5, alpha=0.2)
+    sparse = df.astype(pandas.SparseDtype(float, 0.0))
+    out2 = panel.croston(sparse, h=5, alpha=0.2)
+    self.assertTrue(out2.index.equals(out.index))
+    self.assertEqual(list(out2.columns), list(out.columns))
+    self.assertTrue(numpy.allclose(out2.values, out.values, equal_nan=True))
+    try:
+      from scipy import sparse
+    except ImportError:
+      return
+    out3 = panel.croston(sparse.csr_matrix(y.T.astype(float)), h=5,
+                         alpha=0.2)
+    self.assertEqual(list(out3.columns), [0, 1, 2, 3])
+    self.assertTrue(numpy.allclose(out3.values, out.values, equal_nan=True))
@@ -0,0 +1,173 @@
+import unittest
+import io
+import os
+import shutil
+import struct
+import tempfile
+import numpy
+import matplotlib.pyplot as plt
+from rforecast import plots
+from rforecast import wrappers
+from rforecast import ts_io
+
+
+class DownsampleTestCase(unittest.TestCase):
+
+  def setUp(self):
+    rng = numpy.random.RandomState(0)
+    self.x = numpy.arange(10000.0)
+    self.y = numpy.cumsum(rng.randn(10000))
+    self.y[1234] = 1000.0
+
+  def test_lttb(self):
+    xs, ys = plots.downsample(self.x, self.y, 500)
+    self.assertEqual(len(xs), 500)
+    self.assertEqual((xs[0], xs[-1]), (0.0, 9999.0))
+    self.assertTrue(numpy.all(numpy.diff(xs) > 0))
+    self.assertTrue(1000.0 in ys)
+    self.assertTrue(numpy.allclose(ys, self.y[xs.astype(int)]))
+
+  def test_minmax(self):
+    xs, ys = plots.downsample(self.x, self.y, 500, method='minmax')
+    self.assertTrue(len(xs) <= 500)
+    self.assertEqual((xs[0], xs[-1]), (0.0, 9999.0))
+    self.assertTrue(numpy.all(numpy.diff(xs) > 0))
+    self.assertEqual(ys.max(), self.y.max())
+    self.assertEqual(ys.min(), self.y.min())
+
+  def test_short(self):
+    xs, ys = plots.downsample(self.x[:10], self.y[:10], 500)
+    self.assertTrue(numpy.array_equal(ys, self.y[:10]))
+
+  def test_nan(self):
+    y = self.y.copy()
+    y[2000:4000] = numpy.nan
+    for method in plots.DOWNSAMPLE_METHODS:
+      xs, ys = plots.downsample(self.x, y, 100, method=method)
+      self.assertTrue(numpy.isnan(ys).any())
+      self.assertTrue(1000.0 in ys)
+
+  def test_raises(self):
+    self.assertRaises(ValueError, plots.downsample, self.x, self.y, 2)
+    self.assertRaises(ValueError, plots.downsample, self.x, self.y, 100,
+                      method='mean')
+
+
+def _is_image(data, format):
+  if format == 'png':
+    return data.startswith(b'\x89PNG')
+  return b'<svg' in data
+
+
+class SaveTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.oil, self.aus = ts_io.read_ts_many(['oil', 'austourists'], 'fpp')
+    self.fc = wrappers.naive(self.oil, h=5)
+    self.tmpdir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def _read(self, name):
+    with open(os.path.join(self.tmpdir, name), 'rb') as f:
+      return f.read()
+
+  def test_save_ts(self):
+    for fmt in plots.FORMATS:
+      plots.save_ts(self.oil, os.path.join(self.tmpdir, 'oil.' + fmt),
+                    downsample=20)
+      self.assertTrue(_is_image(self._read('oil.' + fmt), fmt))
+
+  def test_save_decomp(self):
+    dc = wrappers.stl(self.aus, 'periodic')
+    for fmt in plots.FORMATS:
+      plots.save_decomp(dc, os.path.join(self.tmpdir, 'aus.' + fmt))
+      self.assertTrue(_is_image(self._read('aus.' + fmt), fmt))
+
+  def test_save_forecast(self):
+    for fmt in plots.FORMATS:
+      plots.save_forecast(self.fc, os.path.join(self.tmpdir, 'fc.' + fmt),
+                          data=self.oil, test=self.oil[-5:])
+      self.assertTrue(_is_image(self._read('fc.' + fmt), fmt))
+
+  def test_format(self):
+    buf = io.BytesIO()
+    plots.save_ts(self.oil, buf, format='svg')
+    self.assertTrue(_is_image(buf.getvalue(), 'svg'))
+    buf = io.BytesIO()
+    plots.save_ts(self.oil, buf)
+    self.assertTrue(_is_image(buf.getvalue(), 'png'))
+    self.assertRaises(ValueError, plots.save_ts, self.oil,
+                      os.path.join(self.tmpdir, 'oil.jpg'))
+
+  def test_render_many(self):
+    items = dict(('fc%d' % k, (self.fc, self.oil)) for k in range(5))
+    directory = os.path.join(self.tmpdir, 'many')
+    out = plots.render_many(items, directory, processes=2, chunksize=2)
+    names = sorted('fc%d.png' % k for k in range(5))
+    self.assertEqual(sorted(os.listdir(directory)), names)
+    self.assertEqual(sorted(os.path.basename(path) for path in out), names)
+    for name in names:
+      self.assertTrue(_is_image(self._read(os.path.join('many', name)),
+                                'png'))
+
+  def test_render_many_ts(self):
+    items = [('oil', self.oil), ('aus', self.aus)]
+    out = plots.render_many(items, self.tmpdir, kind='ts', format='svg',
+                            processes=1)
+    self.assertEqual(out, [os.path.join(self.tmpdir, 'oil.svg'),
+                           os.path.join(self.tmpdir, 'aus.svg')])
+    for path in out:
+      self.assertTrue(_is_image(self._read(os.path.basename(path)), 'svg'))
+    self.assertRaises(ValueError, plots.render_many, items, self.tmpdir,
+                      kind='acf')
+
+
+class GridTestCase(unittest.TestCase):
+
+  def setUp(self):
+    plt.switch_backend('agg')
+    oil = ts_io.read_ts('oil', 'fpp')
+    fc = wrappers.naive(oil, h=5)
+    self.items = [('fc%d' % k, (fc, oil, oil[-5:])) for k in range(5)]
+    self.tmpdir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    plt.close('all')
+    shutil.rmtree(self.tmpdir)
+
+  def test_plot_grid(self):
+    plots.plot_grid(self.items, ncols=2)
+    fig = plt.gcf()
+    self.assertEqual(len(fig.axes), 5)
+    self.assertEqual(fig.axes[0].get_subplotspec().get_geometry()[:2],
+                     (3, 2))
+    self.assertEqual(tuple(fig.get_size_inches()), (6, 6))
+    self.assertEqual([ax.get_title() for ax in fig.axes],
+                     ['fc%d' % k for k in range(5)])
+    shared = fig.axes[0].get_shared_y_axes()
+    self.assertFalse(shared.joined(fig.axes[0], fig.axes[4]))
+
+  def test_plot_grid_sharey(self):
+    plots.plot_grid(dict(self.items[:3]), ncols=4, sharey=True)
+    fig = plt.gcf()
+    self.assertEqual(len(fig.axes), 3)
+    self.assertEqual(fig.axes[0].get_subplotspec().get_geometry()[:2],
+                     (1, 3))
+    shared = fig.axes[0].get_shared_y_axes()
+    self.assertTrue(all(shared.joined(fig.axes[0], ax) for ax in fig.axes))
+
+  def test_save_grid(self):
+    path = os.path.join(self.tmpdir, 'grid.png')
+    plots.save_grid(self.items, path, ncols=2, dpi=10)
+    with open(path, 'rb') as f:
+      data = f.read()
+    self.assertTrue(_is_image(data, 'png'))
+    # The PNG header holds the width and height, 3 x 2 inches per panel
+    self.assertEqual(struct.unpack('>II', data[16:24]), (60, 60))
+    path = os.path.join(self.tmpdir, 'grid.svg')
+    plots.save_grid(self.items, path, ncols=4, sharey=True)
+    with open(path, 'rb') as f:
+      self.assertTrue(_is_image(f.read(), 'svg'))
+    self.assertRaises(ValueError, plots.save_grid, [], path)
@@ -0,0 +1,84 @@
+import unittest
+from rforecast import quantile
+from rforecast import wrappers
+from rforecast import converters
+from rforecast import ts_io
+import numpy
+
+
+class QuantileTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.oil = ts_io.read_ts('oil', 'fpp')
+    self.probs = numpy.arange(1, 100) / 100.0
+
+  def test_fit(self):
+    qf = quantile.fit(self.oil, method='naive', h=5)
+    fc = wrappers.naive(self.oil, h=5, level=(90, 99))
+    q = qf.quantiles([0.05, 0.5, 0.995])
+    self.assertEqual(q.shape, (5, 3))
+    self.assertTrue(numpy.allclose(q[:, 0], fc.lower90.values))
+    self.assertTrue(numpy.allclose(q[:, 1], fc.point_fc.values))
+    self.assertTrue(numpy.allclose(q[:, 2], fc.upper99.values))
+    q = qf.quantiles(self.probs)
+    self.assertEqual(q.shape, (5, 99))
+    self.assertTrue((numpy.diff(q, axis=1) > 0).all())
+    self.assertRaises(ValueError, qf.quantiles, [0, 0.5])
+
+  def test_lambda(self):
+    qf = quantile.fit(self.oil, method='rwf', h=5, lam=0.5)
+    fc = wrappers.rwf(self.oil, h=5, lam=0.5, level=90)
+    q = qf.quantiles([0.05, 0.95])
+    self.assertTrue(numpy.allclose(q[:, 0], fc.lower90.values))
+    self.assertTrue(numpy.allclose(q[:, 1], fc.upper90.values))
+
+  def test_from_forecast(self):
+    fc = wrappers.ets(converters.series_as_ts(self.oil), h=4,
+                      model_spec='ANN')
+    qf = quantile.QuantileForecast.from_forecast(fc)
+    frame = qf.frame([0.1, 0.9])
+    fc = converters.prediction_intervals(fc)
+    self.assertTrue(frame.index.equals(fc.index))
+    self.assertEqual(list(frame.columns), [0.1, 0.9])
+    self.assertTrue(numpy.allclose(frame[0.9].values, fc.upper80.values,
+                                   rtol=1e-6))
+
+  def test_asymmetric(self):
+    fc = wrappers.naive(self.oil, h=4, level=80)
+    fc['upper80'] = fc.upper80 + 1.0
+    self.assertRaises(ValueError, quantile.QuantileForecast.from_forecast, fc)
+    fc = wrappers.rwf(self.oil, h=4, lam=0.5, level=80)
+    self.assertRaises(ValueError, quantile.QuantileForecast.from_forecast, fc)
+    qf = quantile.QuantileForecast.from_forecast(fc, lam=0.5)
+    self.assertEqual(len(qf), 4)
+
+  def test_fit_simulated(self):
+    aus = ts_io.read_ts('austourists', 'fpp')
+    qf = quantile.fit(aus, model_spec='MAM', h=8, npaths=2000, seed=1)
+    self.assertEqual(len(qf), 8)
+    q = qf.quantiles(self.probs)
+    self.assertEqual(q.shape, (8, 99))
+    self.assertTrue((numpy.diff(q, axis=1) >= 0).all())
+    qf2 = quantile.fit(aus, model_spec='MAM', h=8, npaths=2000, seed=1)
+    self.assertTrue(numpy.allclose(qf2.quantiles(self.probs), q))
+    self.assertEqual(len(quantile.fit(aus)), 8)
+
+  def test_fit_raises(self):
+    self.assertRaises(ValueError, quantile.fit, self.oil, method='stl')
+    self.assertRaises(ValueError, quantile.fit, self.oil, method='croston')
+
+  def test_from_paths(self):
+    rng = numpy.random.RandomState(0)
+    paths = 10 + rng.randn(20000, 3) * [1.0, 2.0, 3.0]
+    qf = quantile.QuantileForecast.from_paths(paths)
+    self.assertTrue(numpy.allclose(qf.se, [1.0, 2.0, 3.0], rtol=0.05))
+    q = qf.quantiles([0.5, 0.975])
+    self.assertTrue(numpy.allclose(q[:, 0], 10, atol=0.1))
+    self.assertTrue(numpy.allclose(q[:, 1] - q[:, 0],
+                                   1.96 * numpy.array([1.0, 2.0, 3.0]),
+                                   rtol=0.05))
+
+  def test_pinball_loss(self):
+    q = numpy.array([[1.0, 2.0], [1.0, 2.0]])
+    loss = quantile.pinball_loss(q, [2.0, 0.0], [0.1, 0.9])
+    self.assertTrue(numpy.allclose(loss, [(0.1 + 0.9) / 2, (0.0 + 0.2) / 2]))
@@ -0,0 +1,114 @@
+import unittest
+import numpy
+from rforecast import search
+from rforecast import ts_io
+from rpy2.robjects.packages import importr
+
+
+class SearchTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.oil, self.aus = ts_io.read_ts_many(['oil', 'austourists'], 'fpp')
+
+  def test_arima_candidates(self):
+    orders = search._arima_candidates(1, 2, 2, 2, 2, 3)
+    self.assertEqual(orders[0], (0, 0, 0, 0))
+    self.assertTrue(all(P == 0 and Q == 0 for (p, q, P, Q) in orders))
+    self.assertEqual(len(orders), 8)
+    orders = search._arima_candidates(4, 1, 1, 1, 1, 5)
+    self.assertEqual(len(orders), 16)
+
+  def test_arima_nonseasonal(self):
+    out, table = search.arima(self.oil, d=1, max_p=2, max_q=2, processes=2)
+    self.assertEqual(out.shape, (10, 5))
+    self.assertEqual(len(table), 18)
+    self.assertEqual(list(table.columns), 
+                     ['p', 'd', 'q', 'P', 'D', 'Q', 'constant', 'aicc',
+                      'seconds'])
+    self.assertEqual(table.constant.sum(), 9)
+    self.assertTrue(numpy.all(numpy.diff(table.aicc) >= 0))
+
+  def test_arima_seasonal(self):
+    out, table = search.arima(self.aus, d=1, D=1, max_p=1, max_q=1,
+                              max_P=1, max_Q=1, ic='bic', processes=2)
+    self.assertEqual(out.shape, (8, 5))
+    self.assertEqual(len(table), 16)
+    self.assertTrue((table.D == 1).all())
+    self.assertFalse(table.constant.any())
+
+  def test_arima_budget(self):
+    out, table = search.arima(self.aus, processes=2, time_budget=3)
+    self.assertTrue(len(table) <= 2 * len(search._arima_candidates(4, 5, 5,
+                                                                    2, 2, 5)))
+    self.assertTrue(numpy.isfinite(table.aicc[0]))
+
+  def test_arima_raises(self):
+    self.assertRaises(ValueError, search.arima, self.oil, ic='mse')
+
+  def test_ets_candidates(self):
+    self.assertEqual(len(search._ets_candidates('ZZZ', search.NULL, 4, 
+                                                False, False, True)), 15)
+    self.assertEqual(len(search._ets_candidates('ZZZ', search.NULL, 1, 
+                                                False, False, True)), 6)
+    models = search._ets_candidates('ZZZ', search.NULL, 4, False, False, 
+                                    False)
+    self.assertTrue(all('M' not in model for (model, damped) in models))
+    self.assertEqual(search._ets_candidates('MAN', True, 4, False, False, 
+                                            True), [('MAN', True)])
+    self.assertEqual(search._ets_candidates('AAZ', False, 1, False, False,
+                                            True), [('AAN', False)])
+    self.assertRaises(ValueError, search._ets_candidates, 'AAA',
+                      search.NULL, 1, False, False, True)
+    self.assertRaises(ValueError, search.ets, self.oil, model_spec='MNM')
+
+  def test_ets(self):
+    out, table, spec = search.ets(self.aus, processes=2)
+    self.assertEqual(out.shape, (8, 5))
+    self.assertEqual(len(table), 15)
+    self.assertEqual(list(table.columns), 
+                     ['model', 'damped', 'aicc', 'aic', 'bic', 'seconds'])
+    aus_r = ts_io.read_ts('austourists', 'fpp', as_pandas=False)
+    model = importr('forecast').ets(aus_r)
+    self.assertAlmostEqual(table.aicc[0], model.rx2('aicc')[0], places=4)
+    self.assertEqual(spec['model'], table.model[0])
+    self.assertEqual(spec['damped'], table.damped[0])
+    self.assertEqual(spec['ic'], 'aicc')
+    self.assertAlmostEqual(spec['ic_value'], table.aicc[0])
+    r_spec = search.ets_spec(model)
+    self.assertEqual((spec['model'], spec['damped']),
+                     (r_spec['model'], r_spec['damped']))
+
+  def test_ets_raises(self):
+    self.assertRaises(ValueError, search.ets, self.aus, model_spec='NNN')
+    self.assertRaises(ValueError, search.ets, self.aus, ic='mse')
+
+  def test_arima_spec(self):
+    aus_r = ts_io.read_ts('austourists', 'fpp', as_pandas=False)
+    fc = importr('forecast')
+    model = fc.auto_arima(aus_r)
+    spec = search.arima_spec(fc.forecast(model))
+    arma = list(model.rx2('arma'))
+    self.assertEqual(spec['order'], (arma[0], arma[5], arma[1]))
+    self.assertEqual(spec['seasonal'], (arma[2], arma[6], arma[3]))
+    self.assertEqual(spec['nobs'], model.rx2('nobs')[0])
+    self.assertAlmostEqual(spec['ic_value'], model.rx2('aicc')[0])
+
+  def test_warm_arima(self):
+    out, spec = search.warm_arima(self.aus[:-4])
+    self.assertEqual(spec['selection'], 'full')
+    out, spec2 = search.warm_arima(self.aus, previous=spec)
+    self.assertEqual(out.shape, (8, 5))
+    self.assertTrue(spec2['selection'] in ('reused', 'local'))
+    if spec2['selection'] == 'reused':
+      self.assertEqual(spec2['order'], spec['order'])
+      self.assertEqual(spec2['seasonal'], spec['seasonal'])
+    out, spec3 = search.warm_arima(self.aus, previous=spec, tolerance=-1e9)
+    self.assertEqual(spec3['selection'], 'local')
+
+  def test_warm_arima_diffs(self):
+    out, spec = search.warm_arima(self.aus[:-4], d=1, D=1)
+    self.assertEqual((spec['order'][1], spec['seasonal'][1]), (1, 1))
+    out, spec2 = search.warm_arima(self.aus, previous=spec, d=1, D=1,
+                                   tolerance=-1e9)
+    self.assertEqual(spec2['selection'], 'local')
+    self.assertEqual((spec2['order'][1], spec2['seasonal'][1]), (1, 1))
@@ -0,0 +1,60 @@
+import unittest
+import os
+import shutil
+import tempfile
+from rforecast import simulation
+from rforecast import wrappers
+from rforecast import ts_io
+import numpy
+
+
+class SimulationTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.oil = ts_io.read_ts('oil', 'fpp')
+    self.model = simulation.fit(self.oil)
+    self.dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.dir)
+
+  def test_paths(self):
+    p = simulation.paths(self.model, h=5, npaths=250, chunk_size=100, seed=1)
+    self.assertEqual(p.shape, (250, 5))
+    self.assertEqual(p.dtype, numpy.float32)
+    p2 = simulation.paths(self.model, h=5, npaths=250, chunk_size=100,
+                          seed=1)
+    self.assertTrue((p == p2).all())
+    fname = os.path.join(self.dir, 'paths.dat')
+    m = simulation.paths(self.model, h=5, npaths=250, chunk_size=100,
+                         seed=1, file=fname)
+    self.assertTrue(isinstance(m, numpy.memmap))
+    self.assertTrue((m == p).all())
+
+  def test_quantiles(self):
+    p = simulation.paths(self.oil, h=3, npaths=2000, seed=1)
+    q = simulation.quantiles(p, [0.1, 0.5, 0.9])
+    self.assertEqual(q.shape, (3, 3))
+    self.assertTrue((q[:, 0] < q[:, 1]).all() and (q[:, 1] < q[:, 2]).all())
+    fc = wrappers.ets(self.oil, h=3, level=80)
+    self.assertAlmostEqual(q[0, 1], fc.point_fc.iloc[0],
+                           delta=0.05 * abs(fc.point_fc.iloc[0]))
+    self.assertEqual(simulation.aggregate(p).shape, (2000,))
+    self.assertRaises(ValueError, simulation.aggregate, p, 'median')
+
+  def test_summarize(self):
+    probs = [0.1, 0.5, 0.9]
+    out = simulation.summarize(self.model, h=4, npaths=2000, probs=probs,
+                               aggregates=['sum', 'max'], chunk_size=500,
+                               seed=2)
+    p = simulation.paths(self.model, h=4, npaths=2000, chunk_size=500,
+                         seed=2, dtype=float)
+    self.assertTrue(numpy.allclose(out['mean'].values, p.mean(axis=0)))
+    exact = simulation.quantiles(p, probs)
+    spread = exact[:, 2] - exact[:, 0]
+    self.assertTrue((numpy.abs(out['quantiles'].values - exact) <
+                     0.01 * spread[:, None]).all())
+    total = numpy.percentile(p.sum(axis=1), [10, 50, 90])
+    self.assertTrue(numpy.allclose(out['aggregates'].loc['sum'].values,
+                                   total))
+    self.assertEqual(list(out['aggregates'].index), ['sum', 'max'])
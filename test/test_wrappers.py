@@ -84,9 +84,18 @@ class WrappersTestCase(unittest.TestCase):
     self.assertEqual(wrappers.nsdiffs(self.aus), 1)
     self.assertEqual(wrappers.nsdiffs(self.rnd), 0)
 
-
-
-
-
-
-
+  def test_msts(self):
+    t = numpy.arange(96)
+    x = 10 + numpy.sin(2 * numpy.pi * t / 4) + numpy.cos(2 * numpy.pi * t / 12)
+    x = converters.sequence_as_series(x, freq=12)
+    fc = wrappers.tbats(x, seasonal_periods=(4, 12), use_parallel=False)
+    self.assertEqual(fc.shape, (24, 5))
+    self.assertEqual(fc.index[0], (9, 1))
+    fc = wrappers.bats(x, h=6, seasonal_periods=(4, 12), use_parallel=False)
+    self.assertEqual(fc.shape, (6, 5))
+    fc = wrappers.stlm(x, seasonal_periods=(4, 12), s_window='periodic')
+    self.assertEqual(fc.shape, (24, 5))
+    self.assertTrue(numpy.allclose(fc.point_fc.values[:4], 
+                                   x.values[-12:-8], atol=0.5))
+    fc = wrappers.tbats(self.aus, h=4, use_parallel=False)
+    self.assertEqual(len(fc), 4)